@@ -3,6 +3,8 @@ from research_town.dbs import LogDB, PaperDB, ProfileDB, ProgressDB
 
 config_file_path = 'configs'
 config = Config(config_file_path)
+# stream completions so that their tokens reach the client as they are generated
+config.param.stream = True
 
 profile_db = ProfileDB(config.database)
 paper_db = PaperDB(config.database)
@@ -4,6 +4,7 @@ from research_town.agents import Agent
 from research_town.data import Progress
 from research_town.engines import Engine
 from research_town.utils.paper_collector import get_paper_introduction
+from research_town.utils.usage_tracker import track_usage, usage_scope
 
 from .extensions import config, log_db, paper_db, profile_db, progress_db
 
@@ -26,17 +27,14 @@ def run_engine(
             config=config,
         )
 
-        engine.start(contexts=[intro])
-
-        while engine.curr_env.name != 'end':
-            run_result = engine.curr_env.run()
-
-            if run_result:
-                for progress, agent in run_result:
-                    yield progress, agent
-                    engine.time_step += 1
-
-            engine.transition()
+        with (
+            track_usage(engine.usage_tracker),
+            usage_scope(project_name=engine.project_name),
+        ):
+            engine.start(contexts=[intro])
+            for progress, agent in engine.run_envs():
+                yield progress, agent
+                engine.time_step += 1
     except Exception as e:
         print(f'Error occurred during engine execution: {e}')
 
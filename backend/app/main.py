@@ -1,6 +1,7 @@
 import asyncio
 import json
 import multiprocessing
+import threading
 import uuid
 from typing import AsyncGenerator, Generator, Optional, Tuple
 
@@ -18,6 +19,8 @@ from research_town.data import (
     Rebuttal,
     Review,
 )
+from research_town.utils.model_prompting import stream_tokens
+from research_town.utils.usage_tracker import get_usage_scope
 
 from .generator_func import run_engine
 
@@ -46,11 +49,33 @@ def stop_process(user_id: str) -> None:
 def background_task(
     url: str, child_conn: multiprocessing.connection.Connection
 ) -> None:
+    # tokens are sent from the worker threads of the envs, and a Connection
+    # may interleave the parts of large messages sent from several threads
+    send_lock = threading.Lock()
+
+    def send(message: object) -> None:
+        with send_lock:
+            child_conn.send(message)
+
+    def send_token(stream_id: str, delta: str) -> None:
+        # the id of the completion tells apart the ones written in parallel,
+        # and an empty delta ends it
+        send(
+            {
+                'type': 'token' if delta else 'token_end',
+                'id': stream_id,
+                'profile_pk': get_usage_scope().get('profile_pk'),
+                'content': delta,
+            }
+        )
+
     generator = run_engine(url)
     try:
-        # Generate and send results to the parent process
-        for progress, agent in generator:
-            child_conn.send((progress, agent))
+        # Generate and send results to the parent process, together with the
+        # tokens of the completions they are written from as they arrive
+        with stream_tokens(send_token):
+            for progress, agent in generator:
+                send((progress, agent))
 
         while True:
             if child_conn.poll():
@@ -59,10 +84,10 @@ def background_task(
                     break
 
     except Exception as e:
-        child_conn.send({'type': 'error', 'content': str(e)})
+        send({'type': 'error', 'content': str(e)})
 
     finally:
-        child_conn.send(None)
+        send(None)
         child_conn.close()
 
 
@@ -186,6 +211,11 @@ async def process_url(request: Request) -> StreamingResponse:
                         print(f'No more data for user {user_id}. Stopping task.')
                         break
 
+                    # Token and error events are sent already formatted
+                    if isinstance(result, dict):
+                        yield json.dumps(result) + '\n'
+                        continue
+
                     # Stream the formatted output to the client
                     for formatted_output in format_response(generator_wrapper(result)):
                         yield formatted_output
@@ -7,12 +7,14 @@ import Image from "react-bootstrap/Image";
 function Home() {
   const [url, setUrl] = useState("");
   const [output, setOutput] = useState([]);
+  const [drafts, setDrafts] = useState({});
   const [isProcessing, setIsProcessing] = useState(false);
 
   const handleSubmit = async (e) => {
     e.preventDefault();
 
     setOutput([]);
+    setDrafts({});
     setIsProcessing(true);
 
     try {
@@ -30,6 +32,24 @@ function Home() {
       const decoder = new TextDecoder("utf-8");
       let buffer = "";
 
+      // Tokens are shown as a draft per completion until it is done, as
+      // completions are written in parallel
+      const handleData = (data) => {
+        if (data.type === "token") {
+          setDrafts((prevDrafts) => ({
+            ...prevDrafts,
+            [data.id]: (prevDrafts[data.id] || "") + data.content,
+          }));
+        } else if (data.type === "token_end") {
+          setDrafts((prevDrafts) => {
+            const { [data.id]: _, ...rest } = prevDrafts;
+            return rest;
+          });
+        } else {
+          setOutput((prevOutput) => [...prevOutput, data]);
+        }
+      };
+
       while (true) {
         const { value, done } = await reader.read();
         if (done) break;
@@ -41,22 +61,21 @@ function Home() {
 
         for (const part of parts) {
           if (part.trim()) {
-            const data = JSON.parse(part);
-            setOutput((prevOutput) => [...prevOutput, data]);
+            handleData(JSON.parse(part));
           }
         }
       }
 
       // Handle any remaining data in the buffer
       if (buffer.trim()) {
-        const data = JSON.parse(buffer);
-        setOutput((prevOutput) => [...prevOutput, data]);
+        handleData(JSON.parse(buffer));
       }
     } catch (error) {
       setOutput([
         { type: "error", content: `An error occurred: ${error.message}` },
       ]);
     } finally {
+      setDrafts({});
       setIsProcessing(false);
     }
   };
@@ -80,6 +99,12 @@ function Home() {
       <div style={{ marginTop: "4em", marginBottom: "4em" }}> </div>
       <InputForm url={url} setUrl={setUrl} handleSubmit={handleSubmit} />
       {isProcessing && <p>Current status: {currentStatusMessage}</p>}
+      {isProcessing &&
+        Object.entries(drafts).map(([id, draft]) => (
+          <p key={id} style={{ whiteSpace: "pre-wrap", opacity: 0.6 }}>
+            {draft}
+          </p>
+        ))}
       <div style={{ marginTop: "4em", marginBottom: "4em" }}> </div>
       <OutputDisplay output={output} />
     </div>
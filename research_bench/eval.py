@@ -9,6 +9,7 @@ from nltk.translate.bleu_score import SmoothingFunction, sentence_bleu
 from rouge_score import rouge_scorer
 from voyageai.client import Client
 
+from research_town.utils.embedding_cache import cached_embed
 from research_town.utils.model_prompting import model_prompting
 
 # Initialize NLTK resources
@@ -82,16 +83,36 @@ def compute_review_gpt_metric(reference: str, generation: str) -> float:
     return 0
 
 
-def compute_openai_embedding_similarity(reference: str, hypothesis: str) -> float:
-    try:
-        response_ref = embedding(model='text-embedding-3-large', input=[reference])
-        response_hyp = embedding(model='text-embedding-3-large', input=[hypothesis])
+def embed_openai(texts: List[str]) -> List[Any]:
+    if not texts:
+        return []
+    return cached_embed(
+        'text-embedding-3-large',
+        texts,
+        lambda missing: [
+            data['embedding']
+            for data in embedding(model='text-embedding-3-large', input=missing)['data']
+        ],
+    )
 
-        embedding_ref = response_ref['data'][0]['embedding']
-        embedding_hyp = response_hyp['data'][0]['embedding']
 
-        vec_ref = np.array(embedding_ref)
-        vec_hyp = np.array(embedding_hyp)
+def embed_voyageai(texts: List[str]) -> List[Any]:
+    if not texts:
+        return []
+    return cached_embed(
+        'voyage-3',
+        texts,
+        lambda missing: (
+            Client()
+            .embed(model='voyage-3', texts=missing, input_type='document')
+            .embeddings
+        ),
+    )
+
+
+def compute_openai_embedding_similarity(reference: str, hypothesis: str) -> float:
+    try:
+        vec_ref, vec_hyp = embed_openai([reference, hypothesis])
 
         cosine_sim = np.dot(vec_ref, vec_hyp) / (
             np.linalg.norm(vec_ref) * np.linalg.norm(vec_hyp)
@@ -104,20 +125,8 @@ def compute_openai_embedding_similarity(reference: str, hypothesis: str) -> floa
 
 
 def compute_voyageai_embedding_similarity(reference: str, hypothesis: str) -> float:
-    vo = Client()
     try:
-        response_ref = vo.embed(
-            model='voyage-3', texts=[reference], input_type='document'
-        )
-        response_hyp = vo.embed(
-            model='voyage-3', texts=[hypothesis], input_type='document'
-        )
-
-        embedding_ref = response_ref.embeddings[0]
-        embedding_hyp = response_hyp.embeddings[0]
-
-        vec_ref = np.array(embedding_ref)
-        vec_hyp = np.array(embedding_hyp)
+        vec_ref, vec_hyp = embed_voyageai([reference, hypothesis])
 
         cosine_sim = np.dot(vec_ref, vec_hyp) / (
             np.linalg.norm(vec_ref) * np.linalg.norm(vec_hyp)
@@ -334,8 +343,6 @@ def compute_review_metrics(
         'gt_weakness_matchings_voyageai': [],
     }
 
-    vo = Client()
-
     # Clean out empty strings
     strengths = [s for s in strengths if s]
     weaknesses = [w for w in weaknesses if w]
@@ -345,41 +352,14 @@ def compute_review_metrics(
     gen_weaknesses = [w for w in generated_weakness.split('\n') if w]
 
     # Embed all ground-truth and generated items once
-    # -- ground-truth strengths
-    gt_str_openai_embs = []
-    gt_str_voy_embs = []
-    for s in strengths:
-        resp = embedding(model='text-embedding-3-large', input=[s])
-        gt_str_openai_embs.append(resp['data'][0]['embedding'])
-        resp = vo.embed(model='voyage-3', texts=[s], input_type='document')
-        gt_str_voy_embs.append(resp.embeddings[0])
-
-    # -- generated strengths
-    gen_str_openai_embs = []
-    gen_str_voy_embs = []
-    for s in gen_strengths:
-        resp = embedding(model='text-embedding-3-large', input=[s])
-        gen_str_openai_embs.append(resp['data'][0]['embedding'])
-        resp = vo.embed(model='voyage-3', texts=[s], input_type='document')
-        gen_str_voy_embs.append(resp.embeddings[0])
-
-    # -- ground-truth weaknesses
-    gt_wk_openai_embs = []
-    gt_wk_voy_embs = []
-    for w in weaknesses:
-        resp = embedding(model='text-embedding-3-large', input=[w])
-        gt_wk_openai_embs.append(resp['data'][0]['embedding'])
-        resp = vo.embed(model='voyage-3', texts=[w], input_type='document')
-        gt_wk_voy_embs.append(resp.embeddings[0])
-
-    # -- generated weaknesses
-    gen_wk_openai_embs = []
-    gen_wk_voy_embs = []
-    for w in gen_weaknesses:
-        resp = embedding(model='text-embedding-3-large', input=[w])
-        gen_wk_openai_embs.append(resp['data'][0]['embedding'])
-        resp = vo.embed(model='voyage-3', texts=[w], input_type='document')
-        gen_wk_voy_embs.append(resp.embeddings[0])
+    gt_str_openai_embs = embed_openai(strengths)
+    gt_str_voy_embs = embed_voyageai(strengths)
+    gen_str_openai_embs = embed_openai(gen_strengths)
+    gen_str_voy_embs = embed_voyageai(gen_strengths)
+    gt_wk_openai_embs = embed_openai(weaknesses)
+    gt_wk_voy_embs = embed_voyageai(weaknesses)
+    gen_wk_openai_embs = embed_openai(gen_weaknesses)
+    gen_wk_voy_embs = embed_voyageai(gen_weaknesses)
 
     # Now: for each GT strength, find best generated strength
     for i, gt_emb in enumerate(gt_str_openai_embs):
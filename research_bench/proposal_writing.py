@@ -1,9 +1,9 @@
 from typing import List
 
+from research_bench.utils import get_dbs
 from research_town.agents import AgentManager
 from research_town.configs import Config
 from research_town.data import Profile
-from research_town.dbs import LogDB, PaperDB, ProfileDB, ProgressDB
 from research_town.envs import ProposalWritingwithoutRAGEnv as ProposalWritingEnv
 from research_town.utils.model_prompting import model_prompting
 
@@ -13,10 +13,7 @@ def write_proposal_researchtown(
     ref_contents: List[str],
     config: Config,
 ) -> str:
-    log_db = LogDB(config=config.database)
-    progress_db = ProgressDB(config=config.database)
-    paper_db = PaperDB(config=config.database)
-    profile_db = ProfileDB(config=config.database)
+    log_db, progress_db, paper_db, profile_db = get_dbs(config)
     agent_manager = AgentManager(config=config.param, profile_db=profile_db)
 
     env = ProposalWritingEnv(
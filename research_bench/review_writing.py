@@ -10,10 +10,10 @@ from typing import Any, Dict, List, Tuple
 
 from litellm.utils import token_counter
 
+from research_bench.utils import get_dbs
 from research_town.agents import AgentManager
 from research_town.configs import Config
 from research_town.data import Profile, Proposal, Review
-from research_town.dbs import LogDB, PaperDB, ProfileDB, ProgressDB
 from research_town.envs import ReviewWritingEnv
 from research_town.utils.model_prompting import model_prompting
 
@@ -24,10 +24,7 @@ def write_review_research_town(
     ref_contents: List[str],
     config: Config,
 ) -> Tuple[str, str, List[int], Dict[str, Dict[str, Any]]]:
-    log_db = LogDB(config=config.database)
-    progress_db = ProgressDB(config=config.database)
-    paper_db = PaperDB(config=config.database)
-    profile_db = ProfileDB(config=config.database)
+    log_db, progress_db, paper_db, profile_db = get_dbs(config)
     agent_manager = AgentManager(config=config.param, profile_db=profile_db)
 
     env = ReviewWritingEnv(
@@ -8,10 +8,11 @@ from tqdm import tqdm
 
 from research_bench.eval import compute_proposal_metrics
 from research_bench.proposal_writing import write_proposal
-from research_bench.utils import load_benchmark
+from research_bench.utils import load_benchmark, print_response_cache_stats
 from research_town.configs import Config
-from research_town.data import Profile
+from research_town.data import LLMCallLog, Profile
 from research_town.utils.logger import logger
+from research_town.utils.usage_tracker import UsageTracker, track_usage, usage_scope
 
 
 def inference(
@@ -77,7 +78,7 @@ def process_task(
         Any,
         Dict[str, List[float]],
     ],
-) -> None:
+) -> List[LLMCallLog]:
     (
         paper_id,
         paper_data,
@@ -89,10 +90,14 @@ def process_task(
         lock,
         metrics_summary,
     ) = task
-    results, metrics = inference(
-        paper_id, paper_data, author_data, ref_proposal, mode, config
-    )
+    # meter the model calls of this paper, to be summed up by the parent
+    usage_tracker = UsageTracker()
+    with track_usage(usage_tracker), usage_scope(project_name=paper_id):
+        results, metrics = inference(
+            paper_id, paper_data, author_data, ref_proposal, mode, config
+        )
     save_results(results, metrics, output_path, lock, metrics_summary)
+    return usage_tracker.records
 
 
 def main() -> None:
@@ -129,7 +134,17 @@ def main() -> None:
         default=8,
         help='Number of parallel processes to use',
     )
+    parser.add_argument(
+        '--cache_namespace',
+        type=str,
+        default=None,
+        help='Namespace tagging the LLM responses cached by this run '
+        '(the cache itself is enabled by LLM_CACHE_PATH)',
+    )
     args = parser.parse_args()
+    if args.cache_namespace:
+        # inherited by the worker processes
+        os.environ['LLM_CACHE_NAMESPACE'] = args.cache_namespace
 
     config = Config(args.config_path)
     dataset = load_papers(args.input_path, args.output_path)
@@ -168,15 +183,15 @@ def main() -> None:
     ]
 
     # Process tasks in parallel
+    usage_tracker = UsageTracker()
     with Pool(processes=args.num_processes) as pool:
         # Using tqdm for progress bar
-        list(
-            tqdm(
-                pool.imap_unordered(process_task, tasks),
-                total=len(tasks),
-                desc='Processing papers',
-            )
-        )
+        for records in tqdm(
+            pool.imap_unordered(process_task, tasks),
+            total=len(tasks),
+            desc='Processing papers',
+        ):
+            usage_tracker.extend(records)
 
     # Convert managed lists to regular lists for reporting
     local_metrics_summary = {
@@ -189,6 +204,9 @@ def main() -> None:
             average = sum(scores) / len(scores)
             logger.info(f"Average {metric.replace('_', ' ').upper()}: {average:.4f}")
 
+    logger.info(usage_tracker.report())
+    print_response_cache_stats()
+
 
 if __name__ == '__main__':
     main()
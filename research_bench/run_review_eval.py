@@ -8,10 +8,11 @@ from tqdm import tqdm
 
 from research_bench.eval import compute_review_metrics
 from research_bench.review_writing import write_review
-from research_bench.utils import load_benchmark
+from research_bench.utils import load_benchmark, print_response_cache_stats
 from research_town.configs import Config
-from research_town.data import Profile
+from research_town.data import LLMCallLog, Profile
 from research_town.utils.logger import logger
+from research_town.utils.usage_tracker import UsageTracker, track_usage, usage_scope
 
 
 def inference(
@@ -95,7 +96,7 @@ def process_task(
         str,  # output_path
         Any,  # lock
     ],
-) -> None:
+) -> List[LLMCallLog]:
     (
         paper_id,
         paper_data,
@@ -111,19 +112,23 @@ def process_task(
         lock,
     ) = args_tuple
 
-    results, metrics = inference(
-        paper_id,
-        paper_data,
-        author_data,
-        reviewer_data,
-        full_content,
-        strengths_bp_flatten,
-        weaknesses_bp_flatten,
-        human_scores,
-        mode,
-        config,
-    )
+    # meter the model calls of this paper, to be summed up by the parent
+    usage_tracker = UsageTracker()
+    with track_usage(usage_tracker), usage_scope(project_name=paper_id):
+        results, metrics = inference(
+            paper_id,
+            paper_data,
+            author_data,
+            reviewer_data,
+            full_content,
+            strengths_bp_flatten,
+            weaknesses_bp_flatten,
+            human_scores,
+            mode,
+            config,
+        )
     save_results(results, metrics, output_path, lock)
+    return usage_tracker.records
 
 
 def main() -> None:
@@ -161,7 +166,17 @@ def main() -> None:
         default=8,  # Set default to 8 processes as requested
         help='Number of parallel processes to use',
     )
+    parser.add_argument(
+        '--cache_namespace',
+        type=str,
+        default=None,
+        help='Namespace tagging the LLM responses cached by this run '
+        '(the cache itself is enabled by LLM_CACHE_PATH)',
+    )
     args = parser.parse_args()
+    if args.cache_namespace:
+        # inherited by the worker processes
+        os.environ['LLM_CACHE_NAMESPACE'] = args.cache_namespace
 
     config = Config(args.config_path)
     dataset = load_papers(args.input_path, args.output_path)
@@ -209,15 +224,18 @@ def main() -> None:
         )
 
     # Process tasks in parallel
+    usage_tracker = UsageTracker()
     with Pool(processes=args.num_processes) as pool:
         # Using tqdm for progress bar
-        list(
-            tqdm(
-                pool.imap_unordered(process_task, tasks),
-                total=len(tasks),
-                desc='Processing papers',
-            )
-        )
+        for records in tqdm(
+            pool.imap_unordered(process_task, tasks),
+            total=len(tasks),
+            desc='Processing papers',
+        ):
+            usage_tracker.extend(records)
+
+    logger.info(usage_tracker.report())
+    print_response_cache_stats()
 
 
 if __name__ == '__main__':
@@ -1,14 +1,14 @@
 import json
 import os
 import re
-from functools import wraps
+from functools import lru_cache, wraps
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Optional, Set
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 
 import openreview
 
-from research_town.configs import Config
-from research_town.dbs import ProfileDB
+from research_town.configs import Config, DatabaseConfig
+from research_town.dbs import LogDB, PaperDB, ProfileDB, ProgressDB
 from research_town.utils.model_prompting import model_prompting
 from research_town.utils.paper_collector import (
     get_paper_by_arxiv_id,
@@ -17,6 +17,10 @@ from research_town.utils.paper_collector import (
     get_paper_introduction,
     get_references,
 )
+from research_town.utils.response_cache import (
+    get_response_cache,
+    get_response_cache_namespace,
+)
 
 
 def save_benchmark(benchmark: Dict[str, Any], output_path: str) -> None:
@@ -26,11 +30,34 @@ def save_benchmark(benchmark: Dict[str, Any], output_path: str) -> None:
     print(f'Benchmark saved to {output_path}')
 
 
+def print_response_cache_stats() -> None:
+    cache = get_response_cache()
+    if cache is not None:
+        namespace = get_response_cache_namespace()
+        print(f"LLM response cache '{namespace}': {cache.stats(namespace)}")
+
+
 def load_benchmark(input_path: str) -> Any:
     with open(input_path, 'r', encoding='utf-8') as file:
         return json.load(file)
 
 
+@lru_cache(maxsize=None)
+def load_dbs(database_config: str) -> Tuple[LogDB, ProgressDB, PaperDB, ProfileDB]:
+    config = DatabaseConfig.model_validate_json(database_config)
+    return (
+        LogDB(config=config),
+        ProgressDB(config=config),
+        PaperDB(config=config),
+        ProfileDB(config=config),
+    )
+
+
+def get_dbs(config: Config) -> Tuple[LogDB, ProgressDB, PaperDB, ProfileDB]:
+    """The DBs of the benchmark, created once per process and shared by all papers."""
+    return load_dbs(config.database.model_dump_json())
+
+
 def with_cache(
     cache_dir: Optional[str] = None,
 ) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
@@ -144,7 +171,7 @@ def get_proposal_from_paper(arxiv_id: str, intro: str, config: Config) -> str:
 def get_author_data(
     arxiv_id: str, authors: List[str], title: str, config: Config
 ) -> Dict[str, Any]:
-    profile_db = ProfileDB(config.database)
+    profile_db = get_dbs(config)[3]
     profile_pks = profile_db.pull_profiles(
         names=authors, config=config, known_paper_titles=[title]
     )
@@ -3,6 +3,7 @@ from beartype.typing import Dict, List, Literal, Optional, Tuple
 
 from ..configs import Config
 from ..data import Idea, Insight, MetaReview, Paper, Profile, Proposal, Rebuttal, Review
+from ..utils.action_journal import journaled
 from ..utils.agent_prompter import (
     brainstorm_idea_prompting,
     review_literature_prompting,
@@ -19,6 +20,7 @@ from ..utils.role_verifier import (
     reviewer_required,
 )
 from ..utils.serializer import Serializer
+from ..utils.usage_tracker import agent_usage
 
 Role = Literal['reviewer', 'leader', 'member', 'chair'] | None
 
@@ -42,6 +44,8 @@ class Agent(object):
 
     @beartype
     @member_required
+    @agent_usage
+    @journaled
     def review_literature(
         self,
         contexts: List[str],
@@ -75,6 +79,19 @@ class Agent(object):
         config: Config,
         papers: Optional[List[Paper]] = None,
     ) -> Idea:
+        return self.brainstorm_ideas(insights=insights, config=config, papers=papers)[0]
+
+    @beartype
+    @member_required
+    @agent_usage
+    @journaled
+    def brainstorm_ideas(
+        self,
+        insights: List[Insight],
+        config: Config,
+        papers: Optional[List[Paper]] = None,
+    ) -> List[Idea]:
+        # every one of the return_num choices of the single call becomes an idea
         serialized_insights = self.serializer.serialize(insights)
         serialized_papers = self.serializer.serialize(papers)
         idea_content_list, prompt_messages = brainstorm_idea_prompting(
@@ -89,12 +106,15 @@ class Agent(object):
             top_p=config.param.top_p,
             stream=config.param.stream,
         )
-        idea_content = idea_content_list[0]
-        idea = Idea(content=idea_content, prompt_messages=prompt_messages)
-        return idea
+        return [
+            Idea(content=idea_content, prompt_messages=prompt_messages)
+            for idea_content in idea_content_list
+        ]
 
     @beartype
     @member_required
+    @agent_usage
+    @journaled
     def summarize_idea(
         self, ideas: List[Idea], contexts: List[str], config: Config
     ) -> Idea:
@@ -116,6 +136,8 @@ class Agent(object):
 
     @beartype
     @member_required
+    @agent_usage
+    @journaled
     def write_proposal(
         self, idea: Idea, config: Config, papers: Optional[List[Paper]] = None
     ) -> Proposal:
@@ -161,6 +183,8 @@ class Agent(object):
 
     @beartype
     @reviewer_required
+    @agent_usage
+    @journaled
     def write_review(
         self, profile: Profile, proposal: Proposal, config: Config
     ) -> Review:
@@ -205,6 +229,8 @@ class Agent(object):
 
     @beartype
     @chair_required
+    @agent_usage
+    @journaled
     def write_metareview(
         self,
         proposal: Proposal,
@@ -254,6 +280,8 @@ class Agent(object):
 
     @beartype
     @leader_required
+    @agent_usage
+    @journaled
     def write_rebuttal(
         self,
         proposal: Proposal,
@@ -1,5 +1,6 @@
 from .config import (
     AgentPromptTemplate,
+    AnnIndexConfig,
     Config,
     DatabaseConfig,
     DatabaseProvider,
@@ -12,6 +13,7 @@ __all__ = [
     'AgentPromptTemplate',
     'EvalPromptTemplate',
     'DatabaseConfig',
+    'AnnIndexConfig',
     'ParamConfig',
     'DatabaseProvider',
 ]
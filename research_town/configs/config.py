@@ -5,6 +5,8 @@ from typing import Any, Dict, List, Optional, Union
 import yaml
 from pydantic import BaseModel, root_validator
 
+from ..utils.prompt_constructor import compile_prompt_template
+
 
 # ParamConfig definition for handling parameters
 class ParamConfig(BaseModel):
@@ -21,6 +23,8 @@ class ParamConfig(BaseModel):
     temperature: Optional[float] = None
     top_p: Optional[float] = None
     stream: Optional[bool] = None
+    # researchers, idea combos or reviews an env works on at the same time
+    max_workers: int = 4
 
 
 # EvalPromptTemplate for validation of eval-related prompts
@@ -125,11 +129,21 @@ class AgentPromptTemplate(BaseModel):
 
 class DatabaseProvider(Enum):
     LOCAL = 'local'
+    SQLITE = 'sqlite'
     REDIS = 'redis'
 
 
+class AnnIndexConfig(BaseModel):
+    nlist: int = 256
+    nprobe: int = 8
+    min_train_size: int = 10000
+
+
 class DatabaseConfig(BaseModel):
     provider: str
+    journal: bool = False
+    journal_compaction_threshold: int = 1000
+    ann_indexes: Dict[str, AnnIndexConfig] = {}
 
 
 class Config(BaseModel):
@@ -143,6 +157,13 @@ class Config(BaseModel):
             yaml_data = self._load_from_yaml(yaml_config_path)
             kwargs.update(yaml_data)
         super().__init__(**kwargs)
+        self.compile_prompt_templates()
+
+    def compile_prompt_templates(self) -> None:
+        # compiled once here, prompts are only formatted when they are built
+        for prompt_templates in (self.agent_prompt_template, self.eval_prompt_template):
+            for template in prompt_templates.model_dump().values():
+                compile_prompt_template(template)
 
     def _load_from_yaml(self, yaml_config_path: str) -> Dict[str, Any]:
         return {
@@ -199,6 +220,7 @@ class Config(BaseModel):
     def load_all(self, yaml_config_path: str) -> None:
         loaded_data = self._load_from_yaml(yaml_config_path)
         self.__dict__.update(loaded_data)
+        self.compile_prompt_templates()
 
     def save_prompt_configs(self, directory: str, prompt_data: BaseModel) -> None:
         os.makedirs(directory, exist_ok=True)
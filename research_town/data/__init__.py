@@ -1,8 +1,11 @@
 from ..data.data import (
+    AgentActionLog,
+    Checkpoint,
     Idea,
     IdeaBrainstormLog,
     Insight,
     LiteratureReviewLog,
+    LLMCallLog,
     Log,
     MetaReview,
     MetaReviewWritingLog,
@@ -26,6 +29,9 @@ __all__ = [
     'MetaReviewWritingLog',
     'RebuttalWritingLog',
     'ReviewWritingLog',
+    'LLMCallLog',
+    'AgentActionLog',
+    'Checkpoint',
     'ExperimentLog',
     'Progress',
     'Prompt',
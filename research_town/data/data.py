@@ -77,6 +77,37 @@ class MetaReviewWritingLog(Log):
     metareview_pk: str
 
 
+class LLMCallLog(Data):
+    profile_pk: Optional[str] = Field(default=None)
+    env_name: Optional[str] = Field(default=None)
+    model_name: str
+    prompt_tokens: int = Field(default=0)
+    completion_tokens: int = Field(default=0)
+    latency: float = Field(default=0.0)
+    cost: float = Field(default=0.0)
+    cached: bool = Field(default=False)
+
+    model_config = ConfigDict(protected_namespaces=())
+
+
+class AgentActionLog(Data):
+    key: str
+    profile_pk: Optional[str] = Field(default=None)
+    action: str
+    result: Any = Field(default=None)
+
+
+class Checkpoint(Data):
+    time_step: int = Field(default=0)
+    env_name: str  # the env the run continues from
+    env_run_nums: Dict[str, int] = Field(default={})
+    # what the envs of the pipeline starting with env_name were entered with
+    env_contexts: Dict[str, Dict[str, Any]] = Field(default={})
+    rng_states: Dict[str, List[Any]] = Field(default={})
+    # progress of the pipeline recorded so far
+    recorded_pks: List[str] = Field(default=[])
+
+
 class Progress(Data):
     content: str = Field(default='')
     prompt_messages: Optional[List[Dict[str, str]]] = Field(default=[])
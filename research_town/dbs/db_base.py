@@ -1,4 +1,6 @@
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+import copy
+from contextlib import contextmanager
+from typing import Any, Dict, Generic, Iterator, List, Optional, Type, TypeVar, Union
 
 from ..configs import DatabaseConfig
 from ..data.data import Data
@@ -10,36 +12,59 @@ T = TypeVar('T', bound=Data)
 
 class BaseDB(Generic[T]):
     def __init__(
-        self, data_class: Type[T], config: DatabaseConfig, with_embeddings: bool = False
+        self,
+        data_class: Type[T],
+        config: DatabaseConfig,
+        with_embeddings: bool = False,
+        index_fields: Optional[List[str]] = None,
     ) -> None:
         self.project_name: Optional[str] = None
         self.data_class = data_class
         self.database_client = DatabaseClientHandler.get_client_instance(config)
         self.database_client.register_namespace(
-            self.data_class.__name__, with_embeddings=with_embeddings
+            self.data_class.__name__,
+            with_embeddings=with_embeddings,
+            index_fields=index_fields,
         )
 
     def set_project_name(self, project_name: str) -> None:
         self.project_name = project_name
 
+    def for_project(self, project_name: str) -> 'BaseDB[T]':
+        """A view of the DB adding data to ``project_name``, sharing its client."""
+        view = copy.copy(self)
+        view.set_project_name(project_name)
+        return view
+
     def count(self, **conditions: Union[str, int, float]) -> int:
         num = self.database_client.count(self.data_class.__name__, **conditions)
         return num
 
     def add(self, data: T) -> None:
-        if self.project_name is not None:
-            data.project_name = self.project_name
-        if hasattr(data, 'embed') and getattr(data, 'embed') is not None:
-            embeddings = [getattr(data, 'embed').numpy(force=True).squeeze()]
-            data.embed = None
-        else:
-            embeddings = []
+        self.add_many([data])
+
+    def add_many(self, data: List[T]) -> None:
+        if not data:
+            return
+        embeddings = []
+        for item in data:
+            if self.project_name is not None:
+                item.project_name = self.project_name
+            if hasattr(item, 'embed') and getattr(item, 'embed') is not None:
+                embeddings.append(getattr(item, 'embed').numpy(force=True).squeeze())
+                item.embed = None
         self.database_client.add(
-            self.data_class.__name__, [data.model_dump(exclude_none=True)], embeddings
-        )
-        logger.info(
-            f"Creating instance of '{data.__class__.__name__}'"  # : '{data.model_dump()}'"
+            self.data_class.__name__,
+            [item.model_dump(exclude_none=True) for item in data],
+            embeddings,
         )
+        logger.info(f"Creating {len(data)} instance(s) of '{self.data_class.__name__}'")
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """Persist everything added, updated or deleted in the block at once."""
+        with self.database_client.batch():
+            yield
 
     def update(self, pk: str, updates: Dict[str, Any]) -> bool:
         return self.database_client.update(self.data_class.__name__, pk, updates)
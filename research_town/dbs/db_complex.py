@@ -1,10 +1,13 @@
-from typing import Any, Dict, List, Type, TypeVar, Union
+import copy
+from contextlib import ExitStack, contextmanager
+from typing import Any, Dict, Iterator, List, Type, TypeVar, Union
 
 from ..configs import DatabaseConfig
 from ..data.data import Data
 from .db_base import BaseDB
 
 T = TypeVar('T', bound=Data)
+C = TypeVar('C', bound='ComplexDB')
 
 
 class ComplexDB:
@@ -15,13 +18,29 @@ class ComplexDB:
 
     def register_class(self, data_class: Any, config: DatabaseConfig) -> None:
         class_name = data_class.__name__
-        db = BaseDB(data_class, config)
+        # records are looked up by project and by the pks linking them together
+        index_fields = ['project_name'] + [
+            field for field in data_class.model_fields if field.endswith('_pk')
+        ]
+        db = BaseDB(data_class, config, index_fields=index_fields)
         self.dbs[class_name] = db
 
     def set_project_name(self, project_name: str) -> None:
         for db in self.dbs.values():
             db.set_project_name(project_name)
 
+    def for_project(self: C, project_name: str) -> C:
+        """
+        A view of the DB adding data to ``project_name``, for engines of
+        different projects to share a DB without registering its classes again.
+        """
+        view = copy.copy(self)
+        view.dbs = {
+            class_name: db.for_project(project_name)
+            for class_name, db in self.dbs.items()
+        }
+        return view
+
     def count(self, data_class: Type[T], **conditions: Union[str, int, float]) -> int:
         class_name = data_class.__name__
         if class_name in self.dbs:
@@ -36,6 +55,24 @@ class ComplexDB:
         else:
             raise ValueError(f'Unsupported type: {class_name}')
 
+    def add_many(self, data: List[T]) -> None:
+        grouped: Dict[str, List[T]] = {}
+        for item in data:
+            class_name = item.__class__.__name__
+            if class_name not in self.dbs:
+                raise ValueError(f'Unsupported type: {class_name}')
+            grouped.setdefault(class_name, []).append(item)
+        with self.batch():
+            for class_name, items in grouped.items():
+                self.dbs[class_name].add_many(items)
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        with ExitStack() as stack:
+            for db in self.dbs.values():
+                stack.enter_context(db.batch())
+            yield
+
     def update(
         self,
         data_class: Type[T],
@@ -46,9 +83,10 @@ class ComplexDB:
         class_name = data_class.__name__
         if class_name in self.dbs:
             pks = [data.pk for data in self.get(data_class, **conditions)]
-            for pk in pks:
-                if self.dbs[class_name].update(pk, updates):
-                    update_count += 1
+            with self.dbs[class_name].batch():
+                for pk in pks:
+                    if self.dbs[class_name].update(pk, updates):
+                        update_count += 1
             return update_count
         else:
             raise ValueError(f'Unsupported type: {class_name}')
@@ -58,9 +96,10 @@ class ComplexDB:
         class_name = data_class.__name__
         if class_name in self.dbs:
             pks = [data.pk for data in self.get(data_class, **conditions)]
-            for pk in pks:
-                if self.dbs[class_name].delete(pk):
-                    delete_count += 1
+            with self.dbs[class_name].batch():
+                for pk in pks:
+                    if self.dbs[class_name].delete(pk):
+                        delete_count += 1
             return delete_count
         else:
             raise ValueError(f'Unsupported type: {class_name}')
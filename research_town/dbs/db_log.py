@@ -1,7 +1,10 @@
 from ..configs import DatabaseConfig
 from ..data.data import (
+    AgentActionLog,
+    Checkpoint,
     IdeaBrainstormLog,
     LiteratureReviewLog,
+    LLMCallLog,
     MetaReviewWritingLog,
     ProposalWritingLog,
     RebuttalWritingLog,
@@ -20,6 +23,9 @@ class LogDB(ComplexDB):
                 ReviewWritingLog,
                 RebuttalWritingLog,
                 MetaReviewWritingLog,
+                LLMCallLog,
+                AgentActionLog,
+                Checkpoint,
             ],
             config=config,
         )
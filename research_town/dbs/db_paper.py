@@ -1,8 +1,6 @@
 import random
 from typing import Any, List, Optional, TypeVar
 
-from transformers import BertModel, BertTokenizer
-
 from ..configs import DatabaseConfig
 from ..data.data import Data, Paper
 from ..utils.logger import logger
@@ -16,20 +14,10 @@ T = TypeVar('T', bound=Data)
 class PaperDB(BaseDB[Paper]):
     def __init__(self, config: DatabaseConfig) -> None:
         super().__init__(Paper, config=config, with_embeddings=True)
-        self.retriever_tokenizer: Optional[BertTokenizer] = None
-        self.retriever_model: Optional[BertModel] = None
-
-    def _initialize_retriever(self) -> None:
-        if self.retriever_tokenizer is None or self.retriever_model is None:
-            self.retriever_tokenizer = BertTokenizer.from_pretrained(
-                'facebook/contriever'
-            )
-            self.retriever_model = BertModel.from_pretrained('facebook/contriever')
 
     def pull_papers(self, num: int, domain: Optional[str] = None) -> List[Paper]:
         papers = get_recent_papers(domain=domain, max_results=num)
-        for paper in papers:
-            self.add(paper)
+        self.add_many(papers)
         logger.info(f'Pulled {num} papers')
         return papers
 
@@ -43,25 +31,26 @@ class PaperDB(BaseDB[Paper]):
         papers = get_related_papers(
             query=query, domain=domain, author=author, num_results=num
         )
-        for paper in papers:
-            self.add(paper)
+        self.add_many(papers)
         logger.info(f'Searched {num} papers')
         return papers
 
     def match(self, query: str, num: int = 1, **conditions: Any) -> List[Paper]:
-        self._initialize_retriever()
+        return self.match_many([query], num=num, **conditions)[0]
 
-        query_embed = get_embed(
-            instructions=[query],
-            retriever_tokenizer=self.retriever_tokenizer,
-            retriever_model=self.retriever_model,
-        )
-        query_embeddings = [t.numpy(force=True).squeeze() for t in query_embed]
+    def match_many(
+        self, queries: List[str], num: int = 1, **conditions: Any
+    ) -> List[List[Paper]]:
+        query_embed = get_embed(instructions=queries)
+        query_embeddings = [t.numpy(force=True).squeeze(0) for t in query_embed]
 
         match_papers_data = self.database_client.search(
             self.data_class.__name__, query_embeddings, num=num, **conditions
-        )[0]
-        match_papers = [self.data_class(**d) for d in match_papers_data]
+        )
+        match_papers = [
+            [self.data_class(**d) for d in papers_data]
+            for papers_data in match_papers_data
+        ]
 
         logger.info(f'Matched papers: {match_papers}')
         return match_papers
@@ -71,10 +60,10 @@ class PaperDB(BaseDB[Paper]):
         random.shuffle(papers)
         return papers[:num]
 
-    def add(self, data: Paper) -> None:
-        self._initialize_retriever()
-        if data.embed is None:
-            data.embed = get_embed(
-                [data.abstract], self.retriever_tokenizer, self.retriever_model
-            )[0]
-        super().add(data)
+    def add_many(self, data: List[Paper]) -> None:
+        missing = [paper for paper in data if paper.embed is None]
+        if missing:
+            embeddings = get_embed([paper.abstract for paper in missing])
+            for paper, embed in zip(missing, embeddings):
+                paper.embed = embed
+        super().add_many(data)
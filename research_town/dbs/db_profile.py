@@ -1,8 +1,6 @@
 import random
 from typing import List, Literal, Optional, TypeVar
 
-from transformers import BertModel, BertTokenizer
-
 from ..configs import Config, DatabaseConfig
 from ..data.data import Data, Profile
 from ..utils.logger import logger
@@ -21,16 +19,19 @@ Role = Literal['reviewer', 'leader', 'member', 'chair'] | None
 
 class ProfileDB(BaseDB[Profile]):
     def __init__(self, config: DatabaseConfig) -> None:
-        super().__init__(Profile, config=config, with_embeddings=True)
-        self.retriever_tokenizer: Optional[BertTokenizer] = None
-        self.retriever_model: Optional[BertModel] = None
-
-    def _initialize_retriever(self) -> None:
-        if not self.retriever_tokenizer or not self.retriever_model:
-            self.retriever_tokenizer = BertTokenizer.from_pretrained(
-                'facebook/contriever'
-            )
-            self.retriever_model = BertModel.from_pretrained('facebook/contriever')
+        super().__init__(
+            Profile,
+            config=config,
+            with_embeddings=True,
+            index_fields=[
+                'name',
+                'project_name',
+                'is_leader_candidate',
+                'is_member_candidate',
+                'is_reviewer_candidate',
+                'is_chair_candidate',
+            ],
+        )
 
     def pull_profiles(
         self,
@@ -72,35 +73,29 @@ class ProfileDB(BaseDB[Profile]):
                 pub_abstracts=pub_abstracts,
             )
             profiles.append(profile)
-        self._initialize_retriever()
-        embeddings = get_embed(
-            [profile.bio for profile in profiles],
-            self.retriever_tokenizer,
-            self.retriever_model,
-        )
-        for profile, emb in zip(profiles, embeddings):
-            profile.embed = emb
-            self.add(profile)
+        self.add_many(profiles)
 
         return [profile.pk for profile in profiles]
 
     def match(self, query: str, role: Role, num: int = 1) -> List[Profile]:
-        self._initialize_retriever()
+        return self.match_many([query], role=role, num=num)[0]
 
-        query_embed = get_embed(
-            instructions=[query],
-            retriever_tokenizer=self.retriever_tokenizer,
-            retriever_model=self.retriever_model,
-        )
-        query_embeddings = [t.numpy(force=True).squeeze() for t in query_embed]
+    def match_many(
+        self, queries: List[str], role: Role, num: int = 1
+    ) -> List[List[Profile]]:
+        query_embed = get_embed(instructions=queries)
+        query_embeddings = [t.numpy(force=True).squeeze(0) for t in query_embed]
 
         match_profile_data = self.database_client.search(
             self.data_class.__name__,
             query_embeddings,
             num=num,
             **{f'is_{role}_candidate': True},
-        )[0]
-        matched_profiles = [self.data_class(**d) for d in match_profile_data]
+        )
+        matched_profiles = [
+            [self.data_class(**d) for d in profiles_data]
+            for profiles_data in match_profile_data
+        ]
 
         logger.info(f'Matched profiles for role {role}: {matched_profiles}')
         return matched_profiles
@@ -113,17 +108,26 @@ class ProfileDB(BaseDB[Profile]):
 
     def reset_role_availability(self) -> None:
         profiles = self.get()
-        for profile in profiles:
-            profile.is_leader_candidate = True
-            profile.is_member_candidate = True
-            profile.is_reviewer_candidate = True
-            profile.is_chair_candidate = True
-            self.update(pk=profile.pk, updates=profile.model_dump())
-
-    def add(self, data: Profile) -> None:
-        self._initialize_retriever()
-        if data.embed is None:
-            data.embed = get_embed(
-                [data.bio], self.retriever_tokenizer, self.retriever_model
-            )[0]
-        super().add(data)
+        with self.batch():
+            for profile in profiles:
+                if (
+                    profile.is_leader_candidate
+                    and profile.is_member_candidate
+                    and profile.is_reviewer_candidate
+                    and profile.is_chair_candidate
+                ):
+                    # engines sharing the DB reset it on every start
+                    continue
+                profile.is_leader_candidate = True
+                profile.is_member_candidate = True
+                profile.is_reviewer_candidate = True
+                profile.is_chair_candidate = True
+                self.update(pk=profile.pk, updates=profile.model_dump())
+
+    def add_many(self, data: List[Profile]) -> None:
+        missing = [profile for profile in data if profile.embed is None]
+        if missing:
+            embeddings = get_embed([profile.bio for profile in missing])
+            for profile, embed in zip(missing, embeddings):
+                profile.embed = embed
+        super().add_many(data)
@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Union
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Union
 
 import numpy as np
 import numpy.typing as npt
@@ -7,13 +8,20 @@ import numpy.typing as npt
 
 class DatabaseClient(ABC):
     @abstractmethod
-    def register_namespace(self, namespace: str, with_embeddings: bool) -> None:
+    def register_namespace(
+        self,
+        namespace: str,
+        with_embeddings: bool,
+        index_fields: Optional[List[str]] = None,
+    ) -> None:
         """
         Register a namespace in the database.
 
         :param namespace: The namespace to register.
         :param with_embeddings: Whether to store embeddings in the namespace
                                 and perform search operations.
+        :param index_fields: Fields to maintain hash indexes on so that equality
+                             conditions on them do not scan the whole namespace.
         """
 
     @abstractmethod
@@ -40,7 +48,20 @@ class DatabaseClient(ABC):
         :param data: list of data to add.
         :param embeddings: The embeddings of the data. It should be in the same order as data.
         In case of no embeddings, pass an empty list.
+
+        All records of one call are persisted together, so bulk inserts should
+        pass the whole list at once rather than call this once per record.
+        """
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """
+        Defer persisting mutations until the outermost batch exits.
+
+        Clients that persist every mutation on its own override this to write
+        everything changed inside the block once; by default it does nothing.
         """
+        yield
 
     @abstractmethod
     def update(self, namespace: str, pk: str, updates: Dict[str, Any]) -> bool:
@@ -17,7 +17,7 @@ class DatabaseClientHandler:
                 raise ValueError(
                     f'Database provider: {database_provider_type} not found'
                 )
-            cls.__client__ = database_provider()
+            cls.__client__ = database_provider(config)
         return cls.__client__
 
     @classmethod
@@ -0,0 +1,164 @@
+import os
+from typing import Callable, List, Optional
+
+import numpy as np
+import numpy.typing as npt
+
+from ....configs import AnnIndexConfig
+
+
+class IVFFlatIndex:
+    """
+    Inverted-file approximate nearest neighbour index over the rows of an
+    embedding matrix.
+
+    Vectors are partitioned by their closest of ``nlist`` k-means centroids. A
+    query only scores the rows of its ``nprobe`` closest lists exactly, so
+    ``nprobe`` trades recall against latency. The index is trained once enough
+    rows exist and is then maintained incrementally; only the centroids and the
+    list assignment of every row are persisted, in ``{namespace}.ivf.npz``.
+    """
+
+    def __init__(self, folder_path: str, namespace: str, config: AnnIndexConfig):
+        self.path = os.path.join(folder_path, f'{namespace}.ivf.npz')
+        self.nlist = config.nlist
+        self.nprobe = config.nprobe
+        self.min_train_size = max(config.min_train_size, config.nlist)
+        self.centroids: Optional[npt.NDArray[np.float32]] = None
+        self.assignments: npt.NDArray[np.int32] = np.full(0, -1, dtype=np.int32)
+        # rows are appended to their list and only dropped from it lazily, when
+        # the list is next materialized for a search
+        self.lists: List[List[int]] = []
+        self.list_rows: List[Optional[npt.NDArray[np.int64]]] = []
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def expected_candidates(self, num_rows: int) -> int:
+        return num_rows * min(self.nprobe, self.nlist) // self.nlist
+
+    def train(self, vectors: npt.NDArray[np.float32], num_iters: int = 10) -> None:
+        """Spherical k-means over (a sample of) the normalized vectors."""
+        rng = np.random.default_rng(0)
+        if len(vectors) > self.nlist * 256:
+            vectors = vectors[rng.choice(len(vectors), self.nlist * 256, replace=False)]
+        nlist = min(self.nlist, len(vectors))
+        centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+        for _ in range(num_iters):
+            labels = np.argmax(vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, vectors)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # keep the previous centroid for lists that ended up empty
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+        self.centroids = centroids.astype(np.float32)
+        self.nlist = nlist
+        self.reset()
+
+    def reset(self) -> None:
+        self.assignments = np.full(len(self.assignments), -1, dtype=np.int32)
+        self.lists = [[] for _ in range(self.nlist)]
+        self.list_rows = [None] * self.nlist
+
+    def add(
+        self, rows: npt.NDArray[np.int64], vectors: npt.NDArray[np.float32]
+    ) -> None:
+        if self.centroids is None or len(rows) == 0:
+            return
+        if rows.max() >= len(self.assignments):
+            self.assignments = np.concatenate(
+                [
+                    self.assignments,
+                    np.full(
+                        max(rows.max() + 1, 2 * len(self.assignments))
+                        - len(self.assignments),
+                        -1,
+                        dtype=np.int32,
+                    ),
+                ]
+            )
+        labels = np.argmax(vectors @ self.centroids.T, axis=1)
+        for row, label in zip(rows.tolist(), labels.tolist()):
+            previous = self.assignments[row]
+            if previous == label:
+                continue
+            if previous >= 0:
+                self.list_rows[previous] = None
+            self.assignments[row] = label
+            self.lists[label].append(row)
+            self.list_rows[label] = None
+
+    def remove(self, row: int) -> None:
+        if row < len(self.assignments) and self.assignments[row] >= 0:
+            self.list_rows[self.assignments[row]] = None
+            self.assignments[row] = -1
+
+    def rows_of_list(self, list_id: int) -> npt.NDArray[np.int64]:
+        cached = self.list_rows[list_id]
+        if cached is not None:
+            return cached
+        rows: npt.NDArray[np.int64] = np.unique(
+            np.asarray(self.lists[list_id], dtype=np.int64)
+        )
+        rows = rows[self.assignments[rows] == list_id]
+        self.lists[list_id] = rows.tolist()
+        self.list_rows[list_id] = rows
+        return rows
+
+    def probe(
+        self, query_embeddings: npt.NDArray[np.float32]
+    ) -> List[npt.NDArray[np.int64]]:
+        """Candidate rows of the ``nprobe`` closest lists of every query."""
+        assert self.centroids is not None
+        nprobe = min(self.nprobe, self.nlist)
+        centroid_similarities = query_embeddings @ self.centroids.T
+        probed = np.argpartition(-centroid_similarities, nprobe - 1, axis=1)
+        return [
+            np.concatenate([self.rows_of_list(int(i)) for i in lists[:nprobe]])
+            for lists in probed
+        ]
+
+    def snapshot(self) -> Callable[[], None]:
+        """Copy the current state and return a function persisting the copy."""
+        if self.centroids is None:
+            return lambda: None
+        centroids = self.centroids
+        assignments = self.assignments.copy()
+
+        def save() -> None:
+            temp_path = f'{self.path}.tmp.npz'
+            np.savez(temp_path, centroids=centroids, assignments=assignments)
+            os.replace(temp_path, self.path)
+
+        return save
+
+    def delete_saved(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def load(self, dim: int) -> bool:
+        """Restore a persisted index trained on vectors of the given dimension."""
+        if not os.path.exists(self.path):
+            return False
+        with np.load(self.path) as stored:
+            centroids = stored['centroids']
+            assignments = stored['assignments']
+        if centroids.shape[1] != dim:
+            return False
+        self.centroids = centroids
+        self.nlist = len(centroids)
+        self.reset()
+        self.assignments = assignments.astype(np.int32)
+        order = np.argsort(self.assignments, kind='stable')
+        counts = np.bincount(self.assignments + 1, minlength=self.nlist + 1)
+        # the first group holds the unassigned rows
+        for label, rows in enumerate(np.split(order, np.cumsum(counts)[:-1])[1:]):
+            self.lists[label] = rows.tolist()
+        return True
+
+    def unassigned(self, rows: npt.NDArray[np.int64]) -> npt.NDArray[np.int64]:
+        assigned = np.zeros(len(rows), dtype=bool)
+        known = rows < len(self.assignments)
+        assigned[known] = self.assignments[rows[known]] >= 0
+        return rows[~assigned]
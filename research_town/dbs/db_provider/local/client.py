@@ -1,14 +1,30 @@
+import copy
 import json
 import os
-import pickle
-from typing import Any, Dict, List, Set, TypeVar, Union
+import threading
+from contextlib import contextmanager
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    TypeVar,
+    Union,
+)
 
 import numpy as np
 import numpy.typing as npt
 from dotenv import load_dotenv
 
+from ....configs import DatabaseConfig
 from ....data.data import Data
 from ..client import DatabaseClient
+from .embedding_store import EmbeddingMatrix
+from .field_index import FieldIndex
+from .journal import NamespaceJournal
 
 load_dotenv()
 
@@ -16,10 +32,11 @@ T = TypeVar('T', bound=Data)
 
 
 class LocalDatabaseClient(DatabaseClient):
-    def __init__(self) -> None:
+    def __init__(self, config: Optional[DatabaseConfig] = None) -> None:
         self.data: Dict[str, Dict[str, Any]] = {}
-        self.data_embed: Dict[str, Dict[str, npt.NDArray[np.float32]]] = {}
+        self.data_embed: Dict[str, EmbeddingMatrix] = {}
         self.registered_namespaces: Set[str] = set()
+        self.indexes: Dict[str, FieldIndex] = {}
 
         folder_path = os.getenv('DATABASE_FOLDER_PATH')
         if folder_path is None:
@@ -30,24 +47,67 @@ class LocalDatabaseClient(DatabaseClient):
         if not os.path.exists(folder_path):
             os.makedirs(folder_path)
         self.folder_path = folder_path
+
+        # In journal mode mutations are appended to a per-namespace write-ahead
+        # log and the full snapshot is only rewritten during compaction.
+        self.journal_enabled = config.journal if config is not None else False
+        self.compaction_threshold = (
+            config.journal_compaction_threshold if config is not None else 1000
+        )
+        self.journals: Dict[str, NamespaceJournal] = {}
+        self.compactions: Dict[str, threading.Thread] = {}
+        # namespaces listed here are searched through an approximate index
+        self.ann_configs = config.ann_indexes if config is not None else {}
+        # namespaces changed inside a batch, mapped to whether their embeddings
+        # changed too; they are saved once the outermost batch exits
+        self.batch_depth = 0
+        self.deferred_saves: Dict[str, bool] = {}
+        self.lock = threading.RLock()
         self.load()
 
-    def register_namespace(self, namespace: str, with_embeddings: bool) -> None:
-        if namespace not in self.registered_namespaces:
-            self.registered_namespaces.add(namespace)
-            self.data[namespace] = {}
-            if with_embeddings:
-                self.data_embed[namespace] = {}
-            self.save_manifest()
+    def register_namespace(
+        self,
+        namespace: str,
+        with_embeddings: bool,
+        index_fields: Optional[List[str]] = None,
+    ) -> None:
+        with self.lock:
+            if namespace not in self.registered_namespaces:
+                self.registered_namespaces.add(namespace)
+                self.data[namespace] = {}
+                if with_embeddings:
+                    self.data_embed[namespace] = EmbeddingMatrix(
+                        self.folder_path, namespace, self.ann_configs.get(namespace)
+                    )
+                self.save_manifest()
+            # indexes only live in memory and are built from the loaded records
+            index = self.indexes.setdefault(namespace, FieldIndex())
+            for field in index_fields or []:
+                index.create(field, self.data[namespace])
 
     def count(self, namespace: str, **conditions: Union[str, int, float]) -> int:
         if conditions is None or not conditions:
             return len(self.data[namespace])
-        result = 0
-        for data in self.data[namespace].values():
+        return sum(1 for _ in self.select(namespace, conditions))
+
+    def select(
+        self, namespace: str, conditions: Dict[str, Any]
+    ) -> Iterator[Dict[str, Any]]:
+        records = self.data[namespace]
+        if 'pk' in conditions:
+            candidates: Iterable[Dict[str, Any]] = (
+                [records[conditions['pk']]] if conditions['pk'] in records else []
+            )
+        else:
+            pks = None
+            if namespace in self.indexes:
+                pks = self.indexes[namespace].candidates(conditions)
+            candidates = (
+                records.values() if pks is None else (records[pk] for pk in pks)
+            )
+        for data in candidates:
             if all(data[key] == value for key, value in conditions.items()):
-                result += 1
-        return result
+                yield data
 
     def add(
         self,
@@ -63,52 +123,81 @@ class LocalDatabaseClient(DatabaseClient):
         if all('pk' not in data_item for data_item in data):
             raise ValueError("Primary key 'pk' is required in data")
 
-        if with_embed:
-            for data_item, embedding in zip(data, embeddings, strict=True):
-                self.data_embed[namespace][data_item['pk']] = embedding
-                self.data[namespace][data_item['pk']] = data_item
-        else:
-            for data_item in data:
+        with self.lock:
+            entries: List[Dict[str, Any]] = []
+            index = self.indexes.get(namespace)
+            for i, data_item in enumerate(data):
+                if index is not None:
+                    if data_item['pk'] in self.data[namespace]:
+                        index.remove(
+                            data_item['pk'], self.data[namespace][data_item['pk']]
+                        )
+                    index.add(data_item['pk'], data_item)
                 self.data[namespace][data_item['pk']] = data_item
-
-        self.save_namespace(namespace, with_embed=with_embed)
+                entry: Dict[str, Any] = {'op': 'add', 'data': data_item}
+                if with_embed:
+                    # the vector itself lives in the memory-mapped matrix, the
+                    # log only needs to know which row it was written to
+                    entry['row'] = self.data_embed[namespace].set(
+                        data_item['pk'], embeddings[i]
+                    )
+                entries.append(entry)
+
+            if self.journal_enabled:
+                self.write_journal(namespace, entries)
+            else:
+                self.persist(namespace, with_embed=with_embed)
 
     def update(self, namespace: str, pk: str, updates: Dict[str, Any]) -> bool:
-        if namespace in self.data and pk in self.data[namespace]:
-            with_embed = False
-            for key, value in updates.items():
-                if value is not None:
-                    if key == 'embedding' and namespace in self.data_embed:
-                        self.data_embed[namespace][pk] = value
-                        with_embed = True
-                    else:
-                        self.data[namespace][pk][key] = value
-            self.save_namespace(namespace, with_embed=with_embed)
-            return True
-        return False
+        with self.lock:
+            if namespace in self.data and pk in self.data[namespace]:
+                with_embed = False
+                entry: Dict[str, Any] = {'op': 'update', 'pk': pk, 'updates': {}}
+                index = self.indexes.get(namespace)
+                if index is not None:
+                    index.remove(pk, self.data[namespace][pk])
+                for key, value in updates.items():
+                    if value is not None:
+                        if key == 'embedding' and namespace in self.data_embed:
+                            entry['row'] = self.data_embed[namespace].set(pk, value)
+                            with_embed = True
+                        else:
+                            self.data[namespace][pk][key] = value
+                            entry['updates'][key] = value
+                if index is not None:
+                    index.add(pk, self.data[namespace][pk])
+
+                if self.journal_enabled:
+                    self.write_journal(namespace, [entry])
+                else:
+                    self.persist(namespace, with_embed=with_embed)
+                return True
+            return False
 
     def delete(self, namespace: str, pk: str) -> bool:
-        if namespace in self.data and pk in self.data[namespace]:
-            self.data[namespace].pop(pk)
-            if namespace in self.data_embed and pk in self.data_embed[namespace]:
-                self.data_embed[namespace].pop(pk)
-                with_embed = True
-            else:
-                with_embed = False
-            self.save_namespace(namespace, with_embed=with_embed)
-            return True
-        return False
+        with self.lock:
+            if namespace in self.data and pk in self.data[namespace]:
+                data = self.data[namespace].pop(pk)
+                if namespace in self.indexes:
+                    self.indexes[namespace].remove(pk, data)
+                if namespace in self.data_embed:
+                    with_embed = self.data_embed[namespace].remove(pk)
+                else:
+                    with_embed = False
+
+                if self.journal_enabled:
+                    self.write_journal(namespace, [{'op': 'delete', 'pk': pk}])
+                else:
+                    self.persist(namespace, with_embed=with_embed)
+                return True
+            return False
 
     def get(
         self, namespace: str, **conditions: Union[str, int, float, List[int], None]
     ) -> List[Dict[str, Any]]:
         if conditions is None or not conditions:
             return list(self.data[namespace].values())
-        result = []
-        for data in self.data[namespace].values():
-            if all(data[key] == value for key, value in conditions.items()):
-                result.append(data)
-        return result
+        return list(self.select(namespace, conditions))
 
     def search(
         self,
@@ -121,39 +210,121 @@ class LocalDatabaseClient(DatabaseClient):
             raise ValueError(
                 f'Embedding search not available for namespace: {namespace}'
             )
-        # Filter candidates based on conditions
-        candidates = self.get(namespace, **conditions)
-        if not candidates:
+        embedding_matrix = self.data_embed[namespace]
+        if not query_embeddings:
+            return []
+
+        # Filter candidate rows based on conditions
+        rows = None
+        if conditions:
+            candidates = self.get(namespace, **conditions)
+            rows = embedding_matrix.rows_of([data['pk'] for data in candidates])
+        if len(embedding_matrix) == 0 or (rows is not None and len(rows) == 0):
             return [[] for _ in range(len(query_embeddings))]
 
-        # Fetch embeddings for candidates
-        pks = [data['pk'] for data in candidates]
-        candidate_embeddings = np.asarray(
-            [self.data_embed[namespace][pk] for pk in pks], dtype=np.float32
-        )
-        candidate_embeddings = candidate_embeddings / np.linalg.norm(
-            candidate_embeddings, axis=1, keepdims=True
-        )
-
         q_embeddings = np.asarray(query_embeddings, dtype=np.float32)
         q_embeddings = q_embeddings / np.linalg.norm(
             q_embeddings, axis=1, keepdims=True
         )
 
-        # Calculate cosine similarity
-        similarities = q_embeddings @ candidate_embeddings.T
+        # Cosine similarity against the pre-normalized matrix, exact or through
+        # the namespace's ANN index
+        return [
+            [self.data[namespace][embedding_matrix.pks[row]] for row in top_rows]
+            for top_rows in embedding_matrix.search(q_embeddings, num, rows)
+        ]
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        with self.lock:
+            self.batch_depth += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.batch_depth -= 1
+                if self.batch_depth == 0:
+                    deferred, self.deferred_saves = self.deferred_saves, {}
+                    for namespace, with_embed in deferred.items():
+                        self.save_namespace(namespace, with_embed=with_embed)
+
+    def persist(self, namespace: str, with_embed: bool) -> None:
+        if self.batch_depth > 0:
+            self.deferred_saves[namespace] = (
+                self.deferred_saves.get(namespace, False) or with_embed
+            )
+        else:
+            self.save_namespace(namespace, with_embed=with_embed)
+
+    def write_journal(self, namespace: str, entries: List[Dict[str, Any]]) -> None:
+        journal = self.journals.setdefault(
+            namespace, NamespaceJournal(self.folder_path, namespace)
+        )
+        journal.append(entries)
+        if journal.num_entries >= self.compaction_threshold:
+            self.compact(namespace, background=True)
+
+    def compact(self, namespace: str, background: bool = False) -> None:
+        """
+        Fold the write-ahead log of a namespace into its snapshot files.
+
+        The snapshot is taken and the log segment rotated while holding the lock;
+        serializing and writing the snapshot can then happen in a background
+        thread while new mutations keep being appended to a fresh segment.
+        """
+        with self.lock:
+            pending = self.compactions.get(namespace)
+            if pending is not None and pending.is_alive():
+                if background:
+                    return
+                pending.join()
+
+            journal = self.journals.get(namespace)
+            if journal is None or not journal.rotate():
+                # a rotated segment left over from an interrupted compaction is
+                # already replayed in memory, so a full synchronous save covers it
+                self.save_namespace(namespace, with_embed=True)
+                if journal is not None:
+                    journal.reset()
+                return
+
+            data_snapshot = copy.deepcopy(self.data[namespace])
+            write_embeddings = (
+                self.data_embed[namespace].snapshot()
+                if namespace in self.data_embed
+                else None
+            )
 
-        # Get top matches
-        matches = []
-        for sorted_indices in np.argsort(similarities, axis=1):
-            sorted_indices = sorted_indices[::-1][:num]
-            matches.append([candidates[i] for i in sorted_indices])
-        return matches
+            def write_snapshot() -> None:
+                if write_embeddings is not None:
+                    write_embeddings()
+                self.write_namespace_file(namespace, data_snapshot)
+                journal.discard_rotated()
+
+            if background:
+                thread = threading.Thread(target=write_snapshot, daemon=True)
+                self.compactions[namespace] = thread
+                thread.start()
+            else:
+                write_snapshot()
+
+    def close(self) -> None:
+        with self.lock:
+            for thread in self.compactions.values():
+                thread.join()
+            for journal in self.journals.values():
+                journal.close()
 
     def save(self, with_embed: bool = False) -> None:
-        for namespace in self.data:
-            self.save_namespace(namespace, with_embed=with_embed)
-        self.save_manifest()
+        with self.lock:
+            for namespace in self.data:
+                if self.journal_enabled:
+                    self.compact(namespace)
+                if namespace in self.data_embed:
+                    # rows are only renumbered once no log entry refers to them
+                    self.data_embed[namespace].vacuum()
+                self.save_namespace(namespace, with_embed=True)
+            self.save_manifest()
 
     def save_manifest(self) -> None:
         manifest = {
@@ -166,26 +337,15 @@ class LocalDatabaseClient(DatabaseClient):
             json.dump(manifest, f, indent=2)
 
     def save_namespace(self, namespace: str, with_embed: bool = False) -> None:
-        file_name = f'{namespace}.json'
-
         if with_embed and namespace in self.data_embed:
-            self.save_embeddings(namespace=namespace)
+            self.data_embed[namespace].save()
+        self.write_namespace_file(namespace, self.data[namespace])
 
-        with open(
-            os.path.join(self.folder_path, file_name), 'w', encoding='utf-8'
-        ) as f:
-            json.dump(
-                self.data[namespace],
-                f,
-                indent=2,
-            )
-
-    def save_embeddings(self, namespace: str) -> None:
-        if namespace not in self.data_embed:
-            return
-        file_name = f'{namespace}.pkl'
-        with open(os.path.join(self.folder_path, file_name), 'wb') as pkl_file:
-            pickle.dump(self.data_embed[namespace], pkl_file)
+    def write_namespace_file(self, namespace: str, data: Dict[str, Any]) -> None:
+        file_path = os.path.join(self.folder_path, f'{namespace}.json')
+        with open(f'{file_path}.tmp', 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        os.replace(f'{file_path}.tmp', file_path)
 
     def load(self) -> None:
         if not os.path.exists(os.path.join(self.folder_path, 'manifest.json')):
@@ -212,11 +372,36 @@ class LocalDatabaseClient(DatabaseClient):
             with open(os.path.join(self.folder_path, file_name), encoding='utf-8') as f:
                 data = json.load(f)
         self.data[namespace] = data
+        self.replay_journal(namespace)
+
+    def replay_journal(self, namespace: str) -> None:
+        journal = NamespaceJournal(self.folder_path, namespace)
+        data = self.data[namespace]
+        data_embed = self.data_embed.get(namespace)
+        for entry in journal.replay():
+            if entry['op'] == 'add':
+                pk = entry['data']['pk']
+                data[pk] = entry['data']
+            elif entry['op'] == 'update':
+                pk = entry['pk']
+                if pk not in data:
+                    continue
+                data[pk].update(entry['updates'])
+            elif entry['op'] == 'delete':
+                pk = entry['pk']
+                data.pop(pk, None)
+                if data_embed is not None:
+                    data_embed.remove(pk)
+            if data_embed is not None and 'row' in entry:
+                data_embed.assign(pk, entry['row'])
+        self.journals[namespace] = journal
+        if not self.journal_enabled and journal.exists():
+            # later non-journaled saves would otherwise be shadowed by the log
+            self.save_namespace(namespace, with_embed=True)
+            journal.reset()
 
     def load_embeddings(self, namespace: str) -> None:
-        file_name = f'{namespace}.pkl'
-        if not os.path.exists(os.path.join(self.folder_path, file_name)):
-            self.data_embed[namespace] = {}
-        else:
-            with open(os.path.join(self.folder_path, file_name), 'rb') as pkl_file:
-                self.data_embed[namespace] = pickle.load(pkl_file)
+        self.data_embed[namespace] = EmbeddingMatrix(
+            self.folder_path, namespace, self.ann_configs.get(namespace)
+        )
+        self.data_embed[namespace].load()
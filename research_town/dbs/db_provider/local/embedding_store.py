@@ -0,0 +1,321 @@
+import json
+import os
+import pickle
+from typing import Any, Callable, Dict, List, Optional, Sequence, cast
+
+import numpy as np
+import numpy.typing as npt
+
+from ....configs import AnnIndexConfig
+from .ann import IVFFlatIndex
+
+Matrix = np.memmap[Any, np.dtype[np.float32]]
+
+
+def top_k(similarities: npt.NDArray[np.float32], num: int) -> npt.NDArray[np.int64]:
+    """
+    Column indices of the ``num`` largest values of every row, largest first.
+
+    Only the selected columns are sorted, after an O(n) partition.
+    """
+    num = min(num, similarities.shape[1])
+    if num == 0:
+        return np.zeros((similarities.shape[0], 0), dtype=np.int64)
+    top = np.argpartition(-similarities, num - 1, axis=1)[:, :num]
+    order = np.argsort(-np.take_along_axis(similarities, top, axis=1), axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+class EmbeddingMatrix:
+    """
+    Pre-normalized float32 embeddings of a namespace in one contiguous matrix.
+
+    Rows live in ``{namespace}.npy`` and are accessed through ``np.memmap``, so
+    loading a namespace does not deserialize its vectors and a search is a single
+    matrix multiply over the mapped buffer. ``{namespace}.emb.json`` stores the
+    primary key of every row and the name of the matrix file; deleted rows
+    become tombstones (``None``) until the matrix is vacuumed into
+    ``{namespace}.vacuumed.npy``, and back on the next vacuum. With an ANN
+    config, an :class:`IVFFlatIndex` over the rows is kept in sync and used to
+    answer searches.
+    """
+
+    initial_capacity = 1024
+
+    def __init__(
+        self,
+        folder_path: str,
+        namespace: str,
+        ann_config: Optional[AnnIndexConfig] = None,
+    ) -> None:
+        self.folder_path = folder_path
+        # vacuuming alternates between the two, see ``vacuum``
+        self.matrix_names = [f'{namespace}.npy', f'{namespace}.vacuumed.npy']
+        self.matrix_path = os.path.join(folder_path, self.matrix_names[0])
+        self.index_path = os.path.join(folder_path, f'{namespace}.emb.json')
+        self.legacy_path = os.path.join(folder_path, f'{namespace}.pkl')
+        self._matrix: Optional[Matrix] = None
+        self.pks: List[Optional[str]] = []
+        self.rows: Dict[str, int] = {}
+        self.ann = (
+            IVFFlatIndex(folder_path, namespace, ann_config)
+            if ann_config is not None
+            else None
+        )
+
+    def __contains__(self, pk: str) -> bool:
+        return pk in self.rows
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @property
+    def matrix(self) -> Matrix:
+        assert self._matrix is not None, 'the embedding matrix is not loaded'
+        return self._matrix
+
+    @property
+    def size(self) -> int:
+        return len(self.pks)
+
+    def load(self) -> None:
+        index = None
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding='utf-8') as f:
+                index = json.load(f)
+            self.matrix_path = os.path.join(
+                self.folder_path, index.get('matrix', self.matrix_names[0])
+            )
+        if os.path.exists(self.matrix_path):
+            self._matrix = cast(Matrix, np.load(self.matrix_path, mmap_mode='r+'))
+            if index is not None:
+                self.pks = index['pks']
+            self.rows = {pk: row for row, pk in enumerate(self.pks) if pk is not None}
+            if self.ann is not None and self.ann.load(self.matrix.shape[1]):
+                # rows written after the index was last persisted
+                unassigned = self.ann.unassigned(self.rows_of(list(self.rows)))
+                self.ann.add(unassigned, self.matrix[unassigned])
+            else:
+                self.index_rows()
+        elif os.path.exists(self.legacy_path):
+            # migrate embeddings pickled by earlier versions
+            with open(self.legacy_path, 'rb') as pkl_file:
+                legacy: Dict[str, npt.NDArray[np.float32]] = pickle.load(pkl_file)
+            for pk, embedding in legacy.items():
+                self.set(pk, embedding)
+            self.save()
+
+    def set(self, pk: str, embedding: npt.ArrayLike) -> int:
+        vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector = vector / norm
+        row = self.rows.get(pk)
+        if row is None:
+            row = self.size
+            self.ensure_capacity(row + 1, vector.shape[0])
+            self.pks.append(pk)
+            self.rows[pk] = row
+        self.matrix[row] = vector
+        self.index_rows(np.array([row]))
+        return row
+
+    def assign(self, pk: str, row: int) -> None:
+        """Point a primary key at a row that was already written to the matrix."""
+        self.remove(pk)
+        if row >= self.size:
+            self.pks.extend([None] * (row + 1 - self.size))
+        self.pks[row] = pk
+        self.rows[pk] = row
+        self.index_rows(np.array([row]))
+
+    def remove(self, pk: str) -> bool:
+        row = self.rows.pop(pk, None)
+        if row is None:
+            return False
+        self.pks[row] = None
+        if self.ann is not None:
+            self.ann.remove(row)
+        return True
+
+    def index_rows(self, rows: Optional[npt.NDArray[np.int64]] = None) -> None:
+        """Add rows (all live rows by default) to the ANN index."""
+        if self.ann is None or self._matrix is None:
+            return
+        if not self.ann.trained:
+            if len(self) < self.ann.min_train_size:
+                return
+            all_rows = self.rows_of(list(self.rows))
+            self.ann.train(np.asarray(self.matrix[all_rows]))
+            rows = None
+        if rows is None:
+            rows = self.rows_of(list(self.rows))
+        self.ann.add(rows, np.asarray(self.matrix[rows]))
+
+    def get(self, pk: str) -> npt.NDArray[np.float32]:
+        return np.array(self.matrix[self.rows[pk]])
+
+    def rows_of(self, pks: Sequence[str]) -> npt.NDArray[np.int64]:
+        return np.fromiter(
+            (self.rows[pk] for pk in pks if pk in self.rows), dtype=np.int64
+        )
+
+    def live_rows(self) -> Optional[npt.NDArray[np.int64]]:
+        """Rows holding a vector, or None when there are no tombstones."""
+        if len(self.rows) == self.size:
+            return None
+        return np.fromiter(sorted(self.rows.values()), dtype=np.int64)
+
+    def search(
+        self,
+        query_embeddings: npt.NDArray[np.float32],
+        num: int,
+        rows: Optional[npt.NDArray[np.int64]] = None,
+    ) -> List[npt.NDArray[np.int64]]:
+        """
+        Rows closest to each of the normalized queries, best match first.
+
+        The ANN index is used once trained, unless the allowed rows are so few
+        that scoring them exactly is cheaper than probing; queries for which
+        probing finds fewer than ``num`` allowed rows fall back to exact search.
+
+        :param rows: Rows allowed in the result, all live rows when None.
+        """
+        if (
+            self.ann is None
+            or not self.ann.trained
+            or (
+                rows is not None
+                and len(rows) <= self.ann.expected_candidates(len(self))
+            )
+        ):
+            return self.exact_search(query_embeddings, num, rows)
+
+        allowed = None
+        if rows is not None:
+            allowed = np.zeros(self.size, dtype=bool)
+            allowed[rows] = True
+        results = []
+        for query, candidates in zip(
+            query_embeddings, self.ann.probe(query_embeddings)
+        ):
+            if allowed is not None:
+                candidates = candidates[allowed[candidates]]
+            if len(candidates) < num:
+                results.append(self.exact_search(query[None], num, rows)[0])
+                continue
+            similarities = self.matrix[candidates] @ query
+            results.append(candidates[top_k(similarities[None], num)[0]])
+        return results
+
+    def exact_search(
+        self,
+        query_embeddings: npt.NDArray[np.float32],
+        num: int,
+        rows: Optional[npt.NDArray[np.int64]] = None,
+    ) -> List[npt.NDArray[np.int64]]:
+        if rows is None:
+            rows = self.live_rows()
+        top = top_k(self.similarities(query_embeddings, rows), num)
+        return list(top if rows is None else rows[top])
+
+    def similarities(
+        self,
+        query_embeddings: npt.NDArray[np.float32],
+        rows: Optional[npt.NDArray[np.int64]] = None,
+    ) -> npt.NDArray[np.float32]:
+        """
+        Cosine similarities between the queries and the given rows.
+
+        :param query_embeddings: Normalized queries of shape (num_queries, dim).
+        :param rows: Rows to compare against, all rows when None.
+        """
+        if self._matrix is None or self.size == 0:
+            return np.zeros((query_embeddings.shape[0], 0), dtype=np.float32)
+        if rows is None:
+            return query_embeddings @ self.matrix[: self.size].T
+        return query_embeddings @ self.matrix[rows].T
+
+    def ensure_capacity(self, num_rows: int, dim: int) -> None:
+        if self._matrix is not None and num_rows <= self._matrix.shape[0]:
+            return
+        capacity = self.initial_capacity
+        if self._matrix is not None:
+            capacity = 2 * self.matrix.shape[0]
+        self.resize(max(capacity, num_rows), dim, list(range(self.size)))
+
+    def resize(self, capacity: int, dim: int, rows: List[int]) -> None:
+        temp_path = f'{self.matrix_path}.tmp'
+        open_memmap = cast(Callable[..., Matrix], np.lib.format.open_memmap)
+        matrix = open_memmap(
+            temp_path, mode='w+', dtype=np.float32, shape=(capacity, dim)
+        )
+        if self._matrix is not None and rows:
+            matrix[: len(rows)] = self._matrix[rows]
+        matrix.flush()
+        del matrix
+        os.replace(temp_path, self.matrix_path)
+        self._matrix = cast(Matrix, np.load(self.matrix_path, mmap_mode='r+'))
+
+    def vacuum(self) -> None:
+        """
+        Drop tombstoned rows by rewriting the matrix.
+
+        The renumbered rows are written to the other matrix file, which only
+        takes the place of the current one once the row index naming it has
+        replaced the old index, so a crash leaves either the old or the new
+        matrix together with its own row index.
+        """
+        if self._matrix is None or len(self.rows) == self.size:
+            return
+        live_rows = sorted(self.rows.values())
+        old_path = self.matrix_path
+        self.matrix_path = os.path.join(
+            self.folder_path,
+            next(
+                name
+                for name in self.matrix_names
+                if os.path.join(self.folder_path, name) != old_path
+            ),
+        )
+        self.resize(
+            max(len(live_rows), self.initial_capacity),
+            self.matrix.shape[1],
+            live_rows,
+        )
+        self.pks = [self.pks[row] for row in live_rows]
+        self.rows = {pk: row for row, pk in enumerate(self.pks) if pk is not None}
+        if self.ann is not None:
+            # the persisted lists refer to the old rows; without them the index
+            # is trained again when loaded
+            self.ann.delete_saved()
+        self.save_index(self.pks, self.matrix_path)
+        os.remove(old_path)
+        if self.ann is not None and self.ann.trained:
+            self.ann.reset()
+            self.index_rows()
+            self.ann.snapshot()()
+
+    def save_index(self, pks: List[Optional[str]], matrix_path: str) -> None:
+        temp_path = f'{self.index_path}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'pks': pks, 'matrix': os.path.basename(matrix_path)}, f)
+        os.replace(temp_path, self.index_path)
+
+    def snapshot(self) -> Callable[[], None]:
+        """Copy the row index and return a function persisting the copy."""
+        pks = list(self.pks)
+        matrix_path = self.matrix_path
+        save_ann = self.ann.snapshot() if self.ann is not None else None
+
+        def save() -> None:
+            if self._matrix is not None:
+                self._matrix.flush()
+            self.save_index(pks, matrix_path)
+            if save_ann is not None:
+                save_ann()
+
+        return save
+
+    def save(self) -> None:
+        self.snapshot()()
@@ -0,0 +1,81 @@
+from collections import defaultdict
+from typing import Any, Dict, List, Mapping, Optional, Set
+
+
+class FieldIndex:
+    """
+    In-memory hash indexes over selected fields of a namespace.
+
+    Every indexed field maps each value to the primary keys of the records
+    holding it. Records whose value is missing are not indexed for that field,
+    matching the linear scan in which such records never satisfy a condition;
+    unhashable values (lists, dicts) are tracked separately and always handed
+    back as candidates so that the caller's equality check stays authoritative.
+    Buckets are insertion-ordered so lookups keep the order records were added.
+    """
+
+    def __init__(self) -> None:
+        self.fields: Set[str] = set()
+        self.buckets: Dict[str, Dict[Any, Dict[str, None]]] = {}
+        self.unhashable: Dict[str, Dict[str, None]] = {}
+
+    def create(self, field: str, records: Mapping[str, Dict[str, Any]]) -> None:
+        if field in self.fields:
+            return
+        self.fields.add(field)
+        self.buckets[field] = defaultdict(dict)
+        self.unhashable[field] = {}
+        for pk, record in records.items():
+            self.add_field(field, pk, record)
+
+    def add(self, pk: str, record: Dict[str, Any]) -> None:
+        for field in self.fields:
+            self.add_field(field, pk, record)
+
+    def remove(self, pk: str, record: Dict[str, Any]) -> None:
+        for field in self.fields:
+            self.remove_field(field, pk, record)
+
+    def add_field(self, field: str, pk: str, record: Dict[str, Any]) -> None:
+        if field not in record:
+            return
+        try:
+            self.buckets[field][record[field]][pk] = None
+        except TypeError:
+            self.unhashable[field][pk] = None
+
+    def remove_field(self, field: str, pk: str, record: Dict[str, Any]) -> None:
+        if field not in record:
+            return
+        self.unhashable[field].pop(pk, None)
+        try:
+            bucket = self.buckets[field].get(record[field])
+        except TypeError:
+            return
+        if bucket is not None:
+            bucket.pop(pk, None)
+            if not bucket:
+                del self.buckets[field][record[field]]
+
+    def candidates(self, conditions: Mapping[str, Any]) -> Optional[List[str]]:
+        """
+        Primary keys that may satisfy the conditions, taken from the most
+        selective usable index.
+
+        :return: None if no condition can be answered from an index.
+        """
+        best: Optional[Dict[str, None]] = None
+        best_field = ''
+        for field, value in conditions.items():
+            if field not in self.fields:
+                continue
+            try:
+                bucket = self.buckets[field].get(value, {})
+            except TypeError:
+                continue
+            size = len(bucket) + len(self.unhashable[field])
+            if best is None or size < len(best) + len(self.unhashable[best_field]):
+                best, best_field = bucket, field
+        if best is None:
+            return None
+        return [*best, *self.unhashable[best_field]]
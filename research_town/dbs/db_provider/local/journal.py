@@ -0,0 +1,86 @@
+import json
+import os
+from typing import IO, Any, Dict, Iterator, List, Optional
+
+
+class NamespaceJournal:
+    """
+    Append-only write-ahead log for a single namespace.
+
+    Every mutation is written as one JSON line to ``{namespace}.wal``. When the
+    namespace is compacted the active segment is rotated to ``{namespace}.wal.old``
+    so that new mutations can keep being appended while the snapshot is written.
+    Replaying ``.wal.old`` followed by ``.wal`` on top of the last snapshot
+    restores the namespace; every entry is an absolute assignment, so replaying
+    entries that already made it into the snapshot is harmless.
+    """
+
+    def __init__(self, folder_path: str, namespace: str) -> None:
+        self.path = os.path.join(folder_path, f'{namespace}.wal')
+        self.rotated_path = f'{self.path}.old'
+        self.num_entries = 0
+        self.file: Optional[IO[str]] = None
+
+    def append(self, entries: List[Dict[str, Any]]) -> None:
+        if self.file is None:
+            self.file = open(self.path, 'a', encoding='utf-8')
+        self.file.write(''.join(json.dumps(entry) + '\n' for entry in entries))
+        self.file.flush()
+        self.num_entries += len(entries)
+
+    def rotate(self) -> bool:
+        """
+        Move the active segment aside before compaction.
+
+        :return: False if a previous rotated segment has not been compacted yet.
+        """
+        if os.path.exists(self.rotated_path):
+            return False
+        self.close()
+        if os.path.exists(self.path):
+            os.replace(self.path, self.rotated_path)
+        self.num_entries = 0
+        return True
+
+    def discard_rotated(self) -> None:
+        if os.path.exists(self.rotated_path):
+            os.remove(self.rotated_path)
+
+    def reset(self) -> None:
+        """Drop both segments once their entries are part of the snapshot."""
+        self.close()
+        self.discard_rotated()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.num_entries = 0
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path) or os.path.exists(self.rotated_path)
+
+    def replay(self) -> Iterator[Dict[str, Any]]:
+        for path in (self.rotated_path, self.path):
+            if not os.path.exists(path):
+                continue
+            valid_size = 0
+            with open(path, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # a torn write from a crash can only be the last line
+                        break
+                    valid_size += len(line)
+                    if path == self.path:
+                        self.num_entries += 1
+                    yield entry
+            if os.path.getsize(path) != valid_size:
+                # drop the torn tail so that new appends start on a clean line
+                with open(path, 'r+b') as f:
+                    f.truncate(valid_size)
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
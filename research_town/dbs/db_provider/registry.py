@@ -1,5 +1,7 @@
 from .local import LocalDatabaseClient
+from .sqlite import SQLiteDatabaseClient
 
 DATABASE_REGISTRY = {
     'local': LocalDatabaseClient,
+    'sqlite': SQLiteDatabaseClient,
 }
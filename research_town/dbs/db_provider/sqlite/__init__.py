@@ -0,0 +1,3 @@
+from .client import SQLiteDatabaseClient
+
+__all__ = ['SQLiteDatabaseClient']
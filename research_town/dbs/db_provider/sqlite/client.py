@@ -0,0 +1,344 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple, Union
+
+import numpy as np
+import numpy.typing as npt
+from dotenv import load_dotenv
+
+from ....configs import DatabaseConfig
+from ..client import DatabaseClient
+from ..local.embedding_store import top_k
+
+load_dotenv()
+
+
+def quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+class SQLiteDatabaseClient(DatabaseClient):
+    """
+    Database client storing every namespace as a table of one sqlite file.
+
+    Records are kept as JSON in a ``data`` column and their embeddings as
+    pre-normalized float32 BLOBs, so opening the database loads nothing into
+    memory. Index fields become virtual generated columns over the JSON with a
+    regular index on top, which conditions on those fields then use. The file
+    is opened in WAL mode: several processes can read while one writes, and
+    every thread gets its own connection.
+    """
+
+    search_chunk_size = 4096
+
+    def __init__(self, config: Optional[DatabaseConfig] = None) -> None:
+        folder_path = os.getenv('DATABASE_FOLDER_PATH')
+        if folder_path is None:
+            raise ValueError(
+                'SQLiteDatabaseClient: env variable DATABASE_FOLDER_PATH is required'
+            )
+
+        if not os.path.exists(folder_path):
+            os.makedirs(folder_path)
+        self.path = os.path.join(folder_path, 'research_town.sqlite')
+
+        self.local = threading.local()
+        self.write_lock = threading.RLock()
+        # namespace -> fields backed by a generated column
+        self.indexed_fields: Dict[str, Set[str]] = {}
+        self.embedding_namespaces: Set[str] = set()
+        with self.write_lock, self.transaction() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS namespaces '
+                '(name TEXT PRIMARY KEY, with_embeddings INTEGER NOT NULL)'
+            )
+            for name, with_embeddings in conn.execute(
+                'SELECT name, with_embeddings FROM namespaces'
+            ):
+                self.load_namespace(conn, name, bool(with_embeddings))
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        conn: Optional[sqlite3.Connection] = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self.local.conn = conn
+        return conn
+
+    def transaction(self) -> 'Transaction':
+        return Transaction(self.conn)
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        # one transaction for the whole block, which the writes inside join
+        with self.write_lock, self.transaction():
+            yield
+
+    def load_namespace(
+        self, conn: sqlite3.Connection, namespace: str, with_embeddings: bool
+    ) -> None:
+        if with_embeddings:
+            self.embedding_namespaces.add(namespace)
+        self.indexed_fields[namespace] = {
+            row[1][len('idx_') :]
+            for row in conn.execute(f'PRAGMA table_xinfo({quote(namespace)})')
+            if row[1].startswith('idx_')
+        }
+
+    def register_namespace(
+        self,
+        namespace: str,
+        with_embeddings: bool,
+        index_fields: Optional[List[str]] = None,
+    ) -> None:
+        with self.write_lock, self.transaction() as conn:
+            conn.execute(
+                f'CREATE TABLE IF NOT EXISTS {quote(namespace)} ('
+                'pk TEXT PRIMARY KEY, data TEXT NOT NULL, embedding BLOB)'
+            )
+            conn.execute(
+                'INSERT OR IGNORE INTO namespaces (name, with_embeddings) '
+                'VALUES (?, ?)',
+                (namespace, int(with_embeddings)),
+            )
+            (stored,) = conn.execute(
+                'SELECT with_embeddings FROM namespaces WHERE name = ?', (namespace,)
+            ).fetchone()
+            self.load_namespace(conn, namespace, bool(stored))
+            for field in index_fields or []:
+                if field in self.indexed_fields[namespace]:
+                    continue
+                column = quote(f'idx_{field}')
+                conn.execute(
+                    f'ALTER TABLE {quote(namespace)} ADD COLUMN {column} '
+                    f'GENERATED ALWAYS AS ({self.json_path(field)}) VIRTUAL'
+                )
+                conn.execute(
+                    f'CREATE INDEX IF NOT EXISTS {quote(f"{namespace}_{field}")} '
+                    f'ON {quote(namespace)} ({column})'
+                )
+                self.indexed_fields[namespace].add(field)
+
+    @staticmethod
+    def json_path(field: str) -> str:
+        return f"json_extract(data, '$.{quote(field)}')"
+
+    def where(
+        self, namespace: str, conditions: Dict[str, Any]
+    ) -> Tuple[str, List[Any]]:
+        """Translate equality conditions into a WHERE clause and its parameters."""
+        clauses: List[str] = []
+        params: List[Any] = []
+        for key, value in conditions.items():
+            if key == 'pk':
+                column = 'pk'
+            elif key in self.indexed_fields.get(namespace, set()):
+                column = quote(f'idx_{key}')
+            else:
+                column = self.json_path(key)
+            if value is None:
+                clauses.append(f'{column} IS NULL')
+            elif isinstance(value, (list, dict)):
+                # json_extract returns nested values as minified JSON text
+                clauses.append(f'{column} = json(?)')
+                params.append(json.dumps(value))
+            else:
+                clauses.append(f'{column} = ?')
+                params.append(value)
+        if not clauses:
+            return '', params
+        return ' WHERE ' + ' AND '.join(clauses), params
+
+    def count(self, namespace: str, **conditions: Union[str, int, float]) -> int:
+        where, params = self.where(namespace, conditions)
+        (num,) = self.conn.execute(
+            f'SELECT COUNT(*) FROM {quote(namespace)}{where}', params
+        ).fetchone()
+        return int(num)
+
+    def add(
+        self,
+        namespace: str,
+        data: List[Dict[str, Any]],
+        embeddings: List[npt.NDArray[np.float32]],
+    ) -> None:
+        with_embed = namespace in self.embedding_namespaces
+        if with_embed and len(data) != len(embeddings):
+            raise ValueError(
+                f'Length of data and embedding should match for namespace: {namespace}'
+            )
+        if all('pk' not in data_item for data_item in data):
+            raise ValueError("Primary key 'pk' is required in data")
+
+        rows = [
+            (
+                data_item['pk'],
+                json.dumps(data_item),
+                self.encode(embeddings[i]) if with_embed else None,
+            )
+            for i, data_item in enumerate(data)
+        ]
+        with self.write_lock, self.transaction() as conn:
+            # an upsert keeps the rowid, and thereby the position, of a replaced pk
+            conn.executemany(
+                f'INSERT INTO {quote(namespace)} (pk, data, embedding) '
+                'VALUES (?, ?, ?) ON CONFLICT (pk) DO UPDATE SET '
+                'data = excluded.data, embedding = excluded.embedding',
+                rows,
+            )
+
+    @staticmethod
+    def encode(embedding: npt.ArrayLike) -> bytes:
+        vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector = vector / norm
+        return vector.tobytes()
+
+    def update(self, namespace: str, pk: str, updates: Dict[str, Any]) -> bool:
+        with self.write_lock, self.transaction() as conn:
+            row = conn.execute(
+                f'SELECT data FROM {quote(namespace)} WHERE pk = ?', (pk,)
+            ).fetchone()
+            if row is None:
+                return False
+            data = json.loads(row[0])
+            embedding = None
+            for key, value in updates.items():
+                if value is not None:
+                    if key == 'embedding' and namespace in self.embedding_namespaces:
+                        embedding = self.encode(value)
+                    else:
+                        data[key] = value
+            conn.execute(
+                f'UPDATE {quote(namespace)} SET data = ?, '
+                'embedding = COALESCE(?, embedding) WHERE pk = ?',
+                (json.dumps(data), embedding, pk),
+            )
+            return True
+
+    def delete(self, namespace: str, pk: str) -> bool:
+        with self.write_lock, self.transaction() as conn:
+            cursor = conn.execute(f'DELETE FROM {quote(namespace)} WHERE pk = ?', (pk,))
+            return cursor.rowcount > 0
+
+    def get(
+        self, namespace: str, **conditions: Union[str, int, float, List[int], None]
+    ) -> List[Dict[str, Any]]:
+        where, params = self.where(namespace, conditions)
+        return [
+            json.loads(data)
+            for (data,) in self.conn.execute(
+                f'SELECT data FROM {quote(namespace)}{where} ORDER BY rowid', params
+            )
+        ]
+
+    def search(
+        self,
+        namespace: str,
+        query_embeddings: List[npt.NDArray[np.float32]],
+        num: int = 1,
+        **conditions: Union[str, int, float, List[int], None],
+    ) -> List[List[Dict[str, Any]]]:
+        if namespace not in self.embedding_namespaces:
+            raise ValueError(
+                f'Embedding search not available for namespace: {namespace}'
+            )
+        if not query_embeddings:
+            return []
+
+        q_embeddings = np.asarray(query_embeddings, dtype=np.float32)
+        q_embeddings = q_embeddings / np.linalg.norm(
+            q_embeddings, axis=1, keepdims=True
+        )
+
+        # Stream the stored vectors in chunks, keeping the running top ``num``
+        # rowids of every query, so memory stays bounded by the chunk size
+        best_similarities = np.zeros((len(q_embeddings), 0), dtype=np.float32)
+        best_rowids = np.zeros((len(q_embeddings), 0), dtype=np.int64)
+        for rowids, matrix in self.iter_embeddings(namespace, conditions):
+            similarities = np.hstack([best_similarities, q_embeddings @ matrix.T])
+            candidates = np.hstack(
+                [best_rowids, np.broadcast_to(rowids, (len(q_embeddings), len(rowids)))]
+            )
+            top = top_k(similarities, num)
+            best_similarities = np.take_along_axis(similarities, top, axis=1)
+            best_rowids = np.take_along_axis(candidates, top, axis=1)
+
+        records = self.get_by_rowids(namespace, np.unique(best_rowids).tolist())
+        # rows deleted by another connection since the scan are left out
+        return [
+            [records[rowid] for rowid in rowids if rowid in records]
+            for rowids in best_rowids.tolist()
+        ]
+
+    def iter_embeddings(
+        self, namespace: str, conditions: Dict[str, Any]
+    ) -> Iterator[Tuple[npt.NDArray[np.int64], npt.NDArray[np.float32]]]:
+        where, params = self.where(namespace, conditions)
+        where = (where + ' AND' if where else ' WHERE') + ' embedding IS NOT NULL'
+        cursor = self.conn.execute(
+            f'SELECT rowid, embedding FROM {quote(namespace)}{where} ORDER BY rowid',
+            params,
+        )
+        while True:
+            rows = cursor.fetchmany(self.search_chunk_size)
+            if not rows:
+                return
+            rowids = np.fromiter((row[0] for row in rows), dtype=np.int64)
+            matrix = np.frombuffer(
+                b''.join(row[1] for row in rows), dtype=np.float32
+            ).reshape(len(rows), -1)
+            yield rowids, matrix
+
+    def get_by_rowids(
+        self, namespace: str, rowids: List[int]
+    ) -> Dict[int, Dict[str, Any]]:
+        records: Dict[int, Dict[str, Any]] = {}
+        for start in range(0, len(rowids), 500):
+            chunk = rowids[start : start + 500]
+            for rowid, data in self.conn.execute(
+                f'SELECT rowid, data FROM {quote(namespace)} WHERE rowid IN '
+                f'({", ".join("?" * len(chunk))})',
+                chunk,
+            ):
+                records[rowid] = json.loads(data)
+        return records
+
+    def close(self) -> None:
+        conn: Optional[sqlite3.Connection] = getattr(self.local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self.local.conn = None
+
+
+class Transaction:
+    """
+    Run the enclosed statements in an immediate transaction, or as part of the
+    transaction the connection is already in.
+    """
+
+    def __init__(self, conn: sqlite3.Connection) -> None:
+        self.conn = conn
+        self.nested = False
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.nested = self.conn.in_transaction
+        if not self.nested:
+            # taking the write lock up front avoids deadlocking against another
+            # process that upgrades from a read to a write transaction
+            self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        if self.nested:
+            return
+        if exc_type is None:
+            self.conn.execute('COMMIT')
+        else:
+            self.conn.execute('ROLLBACK')
@@ -1,7 +1,9 @@
 from .engine import Engine
 from .engine_base import BaseEngine
+from .engine_batch import BatchEngine
 
 __all__ = [
     'BaseEngine',
+    'BatchEngine',
     'Engine',
 ]
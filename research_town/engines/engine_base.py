@@ -1,8 +1,13 @@
-from typing import Dict, List, Tuple, Type
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Generator, Iterator, List, Optional, Tuple, Type
 
 from ..agents import Agent, AgentManager
 from ..configs import Config
 from ..data.data import (
+    AgentActionLog,
+    Checkpoint,
     Idea,
     IdeaBrainstormLog,
     Insight,
@@ -20,6 +25,13 @@ from ..data.data import (
 )
 from ..dbs import LogDB, PaperDB, ProfileDB, ProgressDB
 from ..envs.env_base import BaseEnv
+from ..utils.action_journal import ActionJournal, dump_value, journal_scope, load_value
+from ..utils.concurrency import Channel, submit_in_context
+from ..utils.logger import logger
+from ..utils.usage_tracker import UsageTracker, track_usage, usage_scope
+
+# env attributes holding the agents an env was assigned when entered
+AGENT_ROLES = ['leader', 'members', 'chair', 'reviewers']
 
 
 class BaseEngine:
@@ -41,6 +53,14 @@ class BaseEngine:
         self.config = config
         self.agent_manager = AgentManager(config=config.param, profile_db=profile_db)
         self.time_step = time_step
+        self.usage_tracker = UsageTracker()
+        self.journal: Optional[ActionJournal] = None
+        self.checkpoint: Optional[Checkpoint] = None
+        # what the envs of the current pipeline were entered with, by env name
+        self.env_contexts: Dict[str, Dict[str, Any]] = {}
+        # the same for the pipeline a resumed run restarts
+        self.restored_contexts: Dict[str, Dict[str, Any]] = {}
+        self.resuming = False
 
         self.envs: Dict[str, BaseEnv] = {}
         self.transitions: Dict[Tuple[BaseEnv, str], BaseEnv] = {}
@@ -67,23 +87,270 @@ class BaseEngine:
             self.transitions[self.envs[src], trigger] = self.envs[dst]
 
     def start(self, contexts: List[str]) -> None:
+        # a new run of the project replaces the checkpoint of the previous one
+        self.log_db.delete(Checkpoint, project_name=self.project_name)
+        self.log_db.delete(AgentActionLog, project_name=self.project_name)
+        self.checkpoint = None
+        self.journal = ActionJournal(save=self.log_db.add)
+        self.env_contexts = {}
         self.curr_env = self.envs['start']
-        self.curr_env.on_enter(contexts=contexts)
+        self.enter(self.curr_env, contexts=contexts)
 
     def transition(self) -> None:
         trigger, exit_data = self.curr_env.on_exit()
         self.curr_env = self.transitions[(self.curr_env, trigger)]
-        self.curr_env.on_enter(**exit_data)
+        self.env_contexts = {}
+        self.enter(self.curr_env, **exit_data)
+
+    def enter(self, env: BaseEnv, **context: Any) -> None:
+        """Enter an env, with the agents it was assigned before when resuming."""
+        context.update(self.restored_contexts.pop(env.name, {}))
+        env.on_enter(**context)
+        self.env_contexts[env.name] = {
+            **{
+                key: value
+                for key, value in context.items()
+                if not isinstance(value, Channel)
+            },
+            **{role: getattr(env, role) for role in AGENT_ROLES if hasattr(env, role)},
+        }
 
     def run(self, contexts: List[str]) -> None:
-        self.start(contexts=contexts)
+        with self.run_scope():
+            self.start(contexts=contexts)
+            self.record_envs()
+
+    def resume(self, project_name: Optional[str] = None) -> None:
+        """
+        Continue the run of ``project_name``, the engine's project by default,
+        from its last checkpoint. The pipeline the run stopped in is started
+        again with the same agents and random state, the agent actions it
+        finished are replayed from the journal instead of being made again,
+        and the progress it recorded is not recorded twice.
+        """
+        if project_name is not None:
+            self.project_name = project_name
+            self._setup_dbs()
+        checkpoints = self.log_db.get(Checkpoint, project_name=self.project_name)
+        if not checkpoints:
+            raise ValueError(f"No checkpoint to resume project '{self.project_name}'")
+        with self.run_scope():
+            self.restore(checkpoints[-1])
+            self.record_envs()
+
+    def restore(self, checkpoint: Checkpoint) -> None:
+        self.checkpoint = checkpoint
+        self.time_step = checkpoint.time_step
+        for name, env_run_num in checkpoint.env_run_nums.items():
+            self.envs[name].env_run_num = env_run_num
+        self.journal = ActionJournal(
+            logs=self.log_db.get(AgentActionLog, project_name=self.project_name),
+            save=self.log_db.add,
+        )
+        self.restored_contexts = {
+            name: self.load_context(context)
+            for name, context in checkpoint.env_contexts.items()
+        }
+        for name, rng_state in checkpoint.rng_states.items():
+            version, internal_state, gauss_next = rng_state
+            self.envs[name].rng.setstate((version, tuple(internal_state), gauss_next))
+        self.resuming = True
+        self.env_contexts = {}
+        self.curr_env = self.envs[checkpoint.env_name]
+        self.enter(self.curr_env)
+
+    @contextmanager
+    def run_scope(self) -> Iterator[None]:
+        with (
+            track_usage(self.usage_tracker),
+            usage_scope(project_name=self.project_name),
+        ):
+            yield
+        logger.info(self.usage_tracker.report())
+
+    @contextmanager
+    def env_scope(self, env: BaseEnv) -> Iterator[None]:
+        with (
+            usage_scope(env_name=env.name),
+            journal_scope(self.journal, f'{env.name}:{env.env_run_num}'),
+        ):
+            yield
+
+    def record_envs(self) -> None:
+        """Run the envs and record their progress, with a checkpoint per record."""
+        for progress, agent in self.run_envs():
+            assert self.checkpoint is not None
+            if progress.pk in self.checkpoint.recorded_pks:
+                # replayed, it was recorded before the run was resumed
+                continue
+            with self.progress_db.batch(), self.log_db.batch():
+                self.record(progress, agent)
+                self.time_step += 1
+                self.checkpoint.time_step = self.time_step
+                self.checkpoint.recorded_pks.append(progress.pk)
+                self.save_checkpoint()
+
+    def run_envs(self) -> Generator[Tuple[Progress, Agent], None, None]:
+        """Run the envs from the current one to 'end' and yield their progress."""
         while self.curr_env.name != 'end':
-            run_result = self.curr_env.run()
-            if run_result is not None:
-                for progress, agent in run_result:
-                    self.record(progress, agent)
-                    self.time_step += 1
+            yield from self.run_pipeline()
+            self.record_usage()
             self.transition()
+        # a finished run is resumed to nothing
+        self.checkpoint_pipeline()
+
+    def plan_pipeline(self) -> List[Tuple[BaseEnv, Dict[str, Channel[Progress]]]]:
+        """
+        The current env followed by the envs that can run alongside it. While
+        the trigger an env is going to exit with (see ``BaseEnv.on_stream``)
+        leads to an env whose inputs it outputs, that env is entered right
+        away, with channels in place of the inputs, which are put into them as
+        they are produced.
+        """
+        stages: List[Tuple[BaseEnv, Dict[str, Channel[Progress]]]] = [
+            (self.curr_env, {})
+        ]
+        while True:
+            env = stages[-1][0]
+            stream = env.on_stream()
+            if stream is None:
+                break
+            trigger, context = stream
+            next_env = self.transitions.get((env, trigger))
+            if next_env is None or any(next_env is stage for stage, _ in stages):
+                break
+            channels: Dict[str, Channel[Progress]] = {
+                key: Channel()
+                for key, progress_type in next_env.inputs.items()
+                if env.outputs.get(key) is progress_type
+            }
+            if not channels:
+                break
+            self.enter(next_env, **context, **channels)
+            stages.append((next_env, channels))
+        return stages
+
+    def run_pipeline(self) -> Generator[Tuple[Progress, Agent], None, None]:
+        """
+        Run the current env and the envs planned to run alongside it, each on
+        its own thread, and yield their progress in the order it is made.
+        The last env of the pipeline becomes the current env.
+        """
+        stages = self.plan_pipeline()
+        self.checkpoint_pipeline()
+        if len(stages) == 1:
+            with self.env_scope(self.curr_env):
+                run_result = self.curr_env.run()
+                if run_result is not None:
+                    yield from run_result
+            return
+
+        events: queue.Queue[Optional[Tuple[Progress, Agent]]] = queue.Queue()
+
+        def run_stage(env: BaseEnv, outputs: Dict[str, Channel[Progress]]) -> None:
+            try:
+                with self.env_scope(env):
+                    for progress, agent in env.run() or []:
+                        for key, channel in outputs.items():
+                            if isinstance(progress, env.outputs[key]):
+                                channel.put(progress)
+                        events.put((progress, agent))
+            finally:
+                # the next env finishes with the outputs it got, also on errors
+                for channel in outputs.values():
+                    channel.close()
+
+        executor = ThreadPoolExecutor(max_workers=len(stages))
+        try:
+            futures = [
+                submit_in_context(
+                    executor,
+                    run_stage,
+                    env,
+                    stages[index + 1][1] if index + 1 < len(stages) else {},
+                )
+                for index, (env, _) in enumerate(stages)
+            ]
+            for future in futures:
+                future.add_done_callback(lambda _: events.put(None))
+            for _ in futures:
+                while (event := events.get()) is not None:
+                    yield event
+        finally:
+            for _, channels in stages:
+                for channel in channels.values():
+                    channel.close()
+            executor.shutdown(wait=True)
+        for future in futures:
+            future.result()
+
+        for (env, _), (next_env, _) in zip(stages, stages[1:]):
+            trigger, _ = env.on_exit()
+            if self.transitions.get((env, trigger)) is not next_env:
+                logger.warning(
+                    f"Env '{env.name}' exited with '{trigger}' after "
+                    f"'{next_env.name}' was started with its outputs"
+                )
+        self.curr_env = stages[-1][0]
+
+    def checkpoint_pipeline(self) -> None:
+        """
+        Save the checkpoint of the pipeline about to run: the env it starts
+        with, what its envs were entered with and their random states. The
+        pipeline a resumed run restarts keeps the checkpoint it was resumed
+        from, which records the progress recorded before.
+        """
+        self.restored_contexts = {}
+        if self.resuming:
+            self.resuming = False
+            return
+        checkpoint = Checkpoint(
+            time_step=self.time_step,
+            env_name=self.curr_env.name,
+            env_run_nums={name: env.env_run_num for name, env in self.envs.items()},
+            env_contexts={
+                name: self.dump_context(context)
+                for name, context in self.env_contexts.items()
+            },
+            rng_states={
+                name: list(env.rng.getstate()) for name, env in self.envs.items()
+            },
+        )
+        if self.checkpoint is not None:
+            checkpoint.pk = self.checkpoint.pk
+        self.checkpoint = checkpoint
+        self.save_checkpoint()
+
+    def save_checkpoint(self) -> None:
+        assert self.checkpoint is not None
+        updates = self.checkpoint.model_dump(exclude={'pk', 'project_name'})
+        if not self.log_db.update(Checkpoint, updates, pk=self.checkpoint.pk):
+            self.log_db.add(self.checkpoint)
+
+    def dump_context(self, context: Dict[str, Any]) -> Dict[str, Any]:
+        # agents are saved as their profile and role
+        def dump(value: Any) -> Any:
+            if isinstance(value, Agent):
+                return {'__agent__': value.profile.pk, 'role': value.role}
+            if isinstance(value, list):
+                return [dump(item) for item in value]
+            return dump_value(value)
+
+        return {key: dump(value) for key, value in context.items()}
+
+    def load_context(self, context: Dict[str, Any]) -> Dict[str, Any]:
+        def load(value: Any) -> Any:
+            if isinstance(value, dict) and '__agent__' in value:
+                profile = self.profile_db.get(pk=value['__agent__'])[0]
+                return self.agent_manager.create_agent(profile, value['role'])
+            if isinstance(value, list):
+                return [load(item) for item in value]
+            return load_value(value)
+
+        return {key: load(value) for key, value in context.items()}
+
+    def record_usage(self) -> None:
+        self.log_db.add_many(self.usage_tracker.flush())
 
     def record(self, progress: Progress, agent: Agent) -> None:
         log_map: Dict[Type[Progress], Type[Log]] = {
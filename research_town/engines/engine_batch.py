@@ -0,0 +1,117 @@
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple, Type
+
+from ..configs import Config
+from ..dbs import LogDB, PaperDB, ProfileDB, ProgressDB
+from ..utils.concurrency import submit_in_context
+from ..utils.logger import logger
+from ..utils.model_prompting import set_max_concurrency
+from ..utils.usage_tracker import UsageTracker, track_usage
+from .engine import Engine
+from .engine_base import BaseEngine
+
+
+class BatchEngine:
+    """
+    Runs the engines of many projects in one process, sharing the DBs, and
+    with them the database client, the embedding model and the LLM clients.
+    Every project gets its own engine and views of the log and progress DBs,
+    so its data stays apart from the other projects' by its project name.
+    Up to ``max_projects`` projects run at once, admitted in the order they
+    were added, and with ``max_llm_calls`` set the LLM calls of the running
+    projects take turns for that many slots, so that no project starves the
+    others. A project that fails is logged and skipped; it can be continued
+    with ``Engine.resume`` later.
+    """
+
+    def __init__(
+        self,
+        profile_db: ProfileDB,
+        paper_db: PaperDB,
+        progress_db: ProgressDB,
+        log_db: LogDB,
+        config: Config,
+        engine_class: Type[BaseEngine] = Engine,
+        max_projects: int = 8,
+        max_llm_calls: Optional[int] = None,
+    ) -> None:
+        self.profile_db = profile_db
+        self.paper_db = paper_db
+        self.progress_db = progress_db
+        self.log_db = log_db
+        self.config = config
+        self.engine_class = engine_class
+        self.max_projects = max_projects
+        self.max_llm_calls = max_llm_calls
+        self.projects: List[Tuple[str, List[str]]] = []
+        self.engines: Dict[str, BaseEngine] = {}
+        self.durations: Dict[str, float] = {}
+        self.errors: Dict[str, BaseException] = {}
+        self.usage_tracker = UsageTracker()
+        self.elapsed = 0.0
+
+    def add_project(self, project_name: str, contexts: List[str]) -> None:
+        if any(name == project_name for name, _ in self.projects):
+            raise ValueError(f"Project '{project_name}' was added already")
+        self.projects.append((project_name, contexts))
+
+    def create_engine(self, project_name: str) -> BaseEngine:
+        return self.engine_class(
+            project_name=project_name,
+            profile_db=self.profile_db,
+            paper_db=self.paper_db,
+            progress_db=self.progress_db.for_project(project_name),
+            log_db=self.log_db.for_project(project_name),
+            config=self.config,
+        )
+
+    def run_project(self, project_name: str, contexts: List[str]) -> None:
+        start = time.time()
+        try:
+            engine = self.create_engine(project_name)
+            self.engines[project_name] = engine
+            engine.run(contexts=contexts)
+        except Exception as e:
+            logger.error(f"Project '{project_name}' failed: {e}")
+            self.errors[project_name] = e
+        finally:
+            self.durations[project_name] = time.time() - start
+
+    def run(self) -> None:
+        """Run all projects added, and log the throughput of the batch."""
+        if self.max_llm_calls is not None:
+            set_max_concurrency(self.config.param.base_llm, self.max_llm_calls)
+        start = time.time()
+        with (
+            track_usage(self.usage_tracker),
+            ThreadPoolExecutor(max_workers=self.max_projects) as executor,
+        ):
+            futures: List['Future[None]'] = [
+                submit_in_context(executor, self.run_project, project_name, contexts)
+                for project_name, contexts in self.projects
+            ]
+            for future in futures:
+                future.result()
+        self.elapsed += time.time() - start
+        logger.info(self.report())
+
+    def report(self) -> str:
+        usage = self.usage_tracker.summary().get('total', {})
+        elapsed = max(self.elapsed, 1e-9)
+        tokens = usage.get('prompt_tokens', 0) + usage.get('completion_tokens', 0)
+        durations = list(self.durations.values()) or [0.0]
+        num_done = len(self.durations) - len(self.errors)
+        return '\n'.join(
+            [
+                'Batch throughput',
+                f'    {num_done} projects done, {len(self.errors)} failed, '
+                f'in {self.elapsed:.1f}s',
+                f'    {num_done / elapsed * 60:.2f} projects/min, '
+                f'{usage.get("calls", 0) / elapsed:.2f} LLM calls/s, '
+                f'{tokens / elapsed:.1f} tokens/s, '
+                f'${usage.get("cost", 0.0):.4f}',
+                f'    {sum(durations) / len(durations):.1f}s per project on '
+                f'average, {max(durations):.1f}s at most',
+            ]
+        )
@@ -1,5 +1,6 @@
+import random
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Generator, Tuple
+from typing import Any, Dict, Generator, Optional, Tuple, Type
 
 from ..agents import Agent
 from ..configs import Config
@@ -7,10 +8,18 @@ from ..data import Progress
 
 
 class BaseEnv(ABC):
+    # progress an env takes from the env before it and hands to the env after
+    # it, by the context key it is passed under, e.g. {'proposals': Proposal}
+    inputs: Dict[str, Type[Progress]] = {}
+    outputs: Dict[str, Type[Progress]] = {}
+
     def __init__(self, name: str, config: Config) -> None:
         self.name = name
         self.config = config
         self.env_run_num = 0
+        # kept apart from the global random state, which beartype draws from on
+        # every thread, so that checkpoints can restore what the env samples
+        self.rng = random.Random(random.getrandbits(64))
 
     @abstractmethod
     def on_enter(self, **context: Any) -> None:
@@ -23,3 +32,11 @@ class BaseEnv(ABC):
     @abstractmethod
     def on_exit(self) -> Tuple[str, Dict[str, Any]]:
         pass
+
+    def on_stream(self) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        The trigger ``on_exit`` will return and the context, except for the
+        outputs, to enter the next env with, if the next env can start right
+        away and take the outputs as they are produced; None otherwise.
+        """
+        return None
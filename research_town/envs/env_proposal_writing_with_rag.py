@@ -1,15 +1,18 @@
 from beartype import beartype
-from beartype.typing import Any, Dict, Generator, List, Tuple
+from beartype.typing import Any, Dict, Generator, List, Optional, Tuple, Type
 
 from ..agents import Agent, AgentManager
 from ..configs import Config
 from ..data import Idea, Insight, Progress, Proposal
 from ..dbs import LogDB, PaperDB, ProgressDB
+from ..utils.concurrency import ordered_map
 from ..utils.sampler import sample_ideas
 from .env_base import BaseEnv
 
 
 class ProposalWritingwithRAGEnv(BaseEnv):
+    outputs: Dict[str, Type[Progress]] = {'proposals': Proposal}
+
     def __init__(
         self,
         name: str,
@@ -49,6 +52,14 @@ class ProposalWritingwithRAGEnv(BaseEnv):
             return 'error', {}  # Return error if max run limit exceeded
         return 'start_review', {'proposals': self.proposals, 'leader': self.leader}
 
+    @beartype
+    def on_stream(self) -> Optional[Tuple[str, Dict[str, Any]]]:
+        # proposals are reviewed while they are written, unless on_exit is
+        # going to end the run for exceeding the run limit
+        if self.env_run_num + 1 > self.config.param.max_env_run_num:
+            return None
+        return 'start_review', {'leader': self.leader}
+
     @beartype
     def run(self) -> Generator[Tuple[Progress, Agent], None, None]:
         insights: List[Insight] = []
@@ -56,19 +67,25 @@ class ProposalWritingwithRAGEnv(BaseEnv):
         ideas: List[Idea] = []
 
         researchers = self.members + [self.leader]
+        max_workers = self.config.param.max_workers
 
         # Step 1: Researchers review literature and gather insights
-        for researcher in researchers:
+        def review_literature(
+            researcher: Agent,
+        ) -> Tuple[str, List[str], Insight]:
             related_papers = self.paper_db.search_papers(
                 query=';'.join(self.contexts),
                 num=self.config.param.related_paper_num,
             )
-            summary, keywords, insight = researcher.review_literature(
+            return researcher.review_literature(
                 papers=related_papers,
                 contexts=self.contexts,
                 config=self.config,
             )
 
+        for researcher, (summary, keywords, insight) in zip(
+            researchers, ordered_map(review_literature, researchers, max_workers)
+        ):
             yield insight, researcher
             insights.append(insight)
             all_keywords.extend(keywords)
@@ -77,27 +94,29 @@ class ProposalWritingwithRAGEnv(BaseEnv):
         top_keyword = sorted(all_keywords, key=lambda x: x[1], reverse=True)[0]
 
         # Step 3: Researchers brainstorm ideas based on their insights and related papers
-        for researcher in researchers:
+        def brainstorm_ideas(researcher: Agent) -> List[Idea]:
             related_papers = self.paper_db.search_papers(
                 query=insight.content,
                 author=researcher.profile.name,
                 domain=top_keyword,
                 num=self.config.param.related_paper_num,
             )
-            idea = researcher.brainstorm_idea(
+            return researcher.brainstorm_ideas(
                 papers=related_papers, insights=insights, config=self.config
             )
-            yield idea, researcher
-            ideas.append(idea)
+
+        for researcher, researcher_ideas in zip(
+            researchers, ordered_map(brainstorm_ideas, researchers, max_workers)
+        ):
+            for idea in researcher_ideas:
+                yield idea, researcher
+            ideas.extend(researcher_ideas)
 
         # Step 4: Leader summarizes ideas and writes proposals
-        idea_combos = sample_ideas(ideas, self.config.param.proposal_num)
-        for idea_combo in idea_combos:
+        def write_proposal(idea_combo: List[Idea]) -> Tuple[Idea, Proposal]:
             summarized_idea = self.leader.summarize_idea(
                 ideas=idea_combo, contexts=self.contexts, config=self.config
             )
-            yield summarized_idea, self.leader
-
             related_papers = self.paper_db.search_papers(
                 query=summarized_idea.content,
                 num=self.config.param.related_paper_num,
@@ -107,5 +126,12 @@ class ProposalWritingwithRAGEnv(BaseEnv):
                 papers=related_papers,
                 config=self.config,
             )
+            return summarized_idea, proposal
+
+        idea_combos = sample_ideas(ideas, self.config.param.proposal_num, rng=self.rng)
+        for summarized_idea, proposal in ordered_map(
+            write_proposal, idea_combos, max_workers
+        ):
+            yield summarized_idea, self.leader
             yield proposal, self.leader
             self.proposals.append(proposal)
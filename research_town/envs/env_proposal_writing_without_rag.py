@@ -1,5 +1,5 @@
 from beartype import beartype
-from beartype.typing import Any, Dict, Generator, List, Tuple
+from beartype.typing import Any, Dict, Generator, List, Optional, Tuple, Type
 
 from ..agents import Agent, AgentManager
 from ..configs import Config
@@ -10,6 +10,8 @@ from .env_base import BaseEnv
 
 
 class ProposalWritingwithoutRAGEnv(BaseEnv):
+    outputs: Dict[str, Type[Progress]] = {'proposals': Proposal}
+
     def __init__(
         self,
         name: str,
@@ -49,6 +51,14 @@ class ProposalWritingwithoutRAGEnv(BaseEnv):
             return 'error', {}  # Return error if max run limit exceeded
         return 'start_review', {'proposals': self.proposals, 'leader': self.leader}
 
+    @beartype
+    def on_stream(self) -> Optional[Tuple[str, Dict[str, Any]]]:
+        # proposals are reviewed while they are written, unless on_exit is
+        # going to end the run for exceeding the run limit
+        if self.env_run_num + 1 > self.config.param.max_env_run_num:
+            return None
+        return 'start_review', {'leader': self.leader}
+
     @beartype
     def run(self) -> Generator[Tuple[Progress, Agent], None, None]:
         insights: List[Insight] = []
@@ -68,12 +78,15 @@ class ProposalWritingwithoutRAGEnv(BaseEnv):
 
         # Step 3: Researchers brainstorm ideas based on their insights
         for researcher in researchers:
-            idea = researcher.brainstorm_idea(insights=insights, config=self.config)
-            yield idea, researcher
-            ideas.append(idea)
+            researcher_ideas = researcher.brainstorm_ideas(
+                insights=insights, config=self.config
+            )
+            for idea in researcher_ideas:
+                yield idea, researcher
+            ideas.extend(researcher_ideas)
 
         # Step 4: Leader summarizes ideas and writes proposals
-        idea_combos = sample_ideas(ideas, self.config.param.proposal_num)
+        idea_combos = sample_ideas(ideas, self.config.param.proposal_num, rng=self.rng)
         for idea_combo in idea_combos:
             summarized_idea = self.leader.summarize_idea(
                 ideas=idea_combo, contexts=self.contexts, config=self.config
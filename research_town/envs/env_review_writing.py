@@ -1,14 +1,21 @@
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
 from beartype import beartype
-from beartype.typing import Any, Dict, Generator, List, Tuple
+from beartype.typing import Any, Deque, Dict, Generator, List, Tuple, Type
 
 from ..agents import Agent, AgentManager
 from ..configs import Config
-from ..data import MetaReview, Progress, Review
+from ..data import MetaReview, Progress, Proposal, Review
 from ..dbs import LogDB, PaperDB, ProgressDB
+from ..utils.concurrency import submit_after, submit_in_context
 from .env_base import BaseEnv
 
 
 class ReviewWritingEnv(BaseEnv):
+    inputs: Dict[str, Type[Progress]] = {'proposals': Proposal}
+    outputs: Dict[str, Type[Progress]] = {'metareviews': MetaReview}
+
     def __init__(
         self,
         name: str,
@@ -56,41 +63,81 @@ class ReviewWritingEnv(BaseEnv):
                 'leader': self.leader,
             }
 
+    def write_review(self, reviewer: Agent, proposal: Proposal) -> Review:
+        return reviewer.write_review(
+            profile=reviewer.profile,
+            proposal=proposal,
+            config=self.config,
+        )
+
+    def write_metareview(
+        self, proposal: Proposal, review_futures: List['Future[Review]']
+    ) -> MetaReview:
+        reviews = [future.result() for future in review_futures]
+        metareview: MetaReview = self.chair.write_metareview(
+            proposal=proposal,
+            reviews=reviews,
+            config=self.config,
+            scores=[review.score for review in reviews],
+        )
+        return metareview
+
+    def collect(
+        self,
+        review_futures: List['Future[Review]'],
+        metareview_future: 'Future[MetaReview]',
+    ) -> Generator[Tuple[Progress, Agent], None, None]:
+        # Review Writing
+        self.reviews: List[Review] = []
+        for reviewer, future in zip(self.reviewers, review_futures):
+            review = future.result()
+            self.reviews.append(review)
+            yield review, reviewer
+
+        # Rebuttal Submitting
+        # self.rebuttals: List[Rebuttal] = []
+        # for review in self.reviews:
+        #     rebuttal = self.leader.write_rebuttal(
+        #         proposal=proposal,
+        #         review=review,
+        #         config=self.config,
+        #     )
+        #     self.rebuttals.append(rebuttal)
+        #     yield rebuttal, self.leader
+
+        # Paper Meta Reviewing
+        metareview = metareview_future.result()
+        self.metareviews.append(metareview)
+        yield metareview, self.chair
+
     @beartype
     def run(self) -> Generator[Tuple[Progress, Agent], None, None]:
         self.metareviews: List[MetaReview] = []
-        for proposal in self.proposals:
-            # Review Writing
-            self.reviews: List[Review] = []
-            for reviewer in self.reviewers:
-                review = reviewer.write_review(
-                    profile=reviewer.profile,
-                    proposal=proposal,
-                    config=self.config,
+        # every review of every proposal is written concurrently, and the
+        # metareview of a proposal starts once its own reviews are done
+        executor = ThreadPoolExecutor(max_workers=self.config.param.max_workers)
+        pending: Deque[Tuple[List['Future[Review]'], 'Future[MetaReview]']] = deque()
+        try:
+            # proposals are a Channel if they are still being written
+            for proposal in self.proposals:
+                review_futures = [
+                    submit_in_context(executor, self.write_review, reviewer, proposal)
+                    for reviewer in self.reviewers
+                ]
+                metareview_future = submit_after(
+                    executor,
+                    review_futures,
+                    self.write_metareview,
+                    proposal,
+                    review_futures,
                 )
-                self.reviews.append(review)
-                yield review, reviewer
-
-            # Rebuttal Submitting
-            # self.rebuttals: List[Rebuttal] = []
-            # for review in self.reviews:
-            #     rebuttal = self.leader.write_rebuttal(
-            #         proposal=proposal,
-            #         review=review,
-            #         config=self.config,
-            #     )
-            #     self.rebuttals.append(rebuttal)
-            #     yield rebuttal, self.leader
-
-            # Paper Meta Reviewing
-            scores = [review.score for review in self.reviews]
-            metareview = self.chair.write_metareview(
-                proposal=proposal,
-                reviews=self.reviews,
-                config=self.config,
-                scores=scores,
-            )
-            self.metareviews.append(metareview)
-            yield metareview, self.chair
+                pending.append((review_futures, metareview_future))
+                # hand over finished proposals while waiting for the next ones
+                while pending and pending[0][1].done():
+                    yield from self.collect(*pending.popleft())
+            while pending:
+                yield from self.collect(*pending.popleft())
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
 
         return None
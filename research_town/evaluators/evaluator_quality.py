@@ -1,6 +1,7 @@
 import re
+from statistics import mean
 
-from beartype.typing import Any, Type, TypeVar
+from beartype.typing import Any, List, Type, TypeVar
 
 from ..configs import Config
 from ..utils.error_handler import parsing_error_exponential_backoff
@@ -76,6 +77,38 @@ class BaseQualityEvaluator:
             overall_score=overall_score, dimension_scores=dimension_scores
         )
 
+    def parse_samples(self, raw_outputs: List[str], output_model: Type[T]) -> T:
+        """
+        Combine the scores of all sampled completions of one evaluation prompt:
+        the overall and dimension scores are the rounded means over the samples
+        that parse. Samples whose dimension scores differ in number from the
+        first parsed sample only contribute to the overall score.
+        """
+        outputs: List[T] = []
+        errors: List[OutputFormatError] = []
+        for raw_output in raw_outputs:
+            try:
+                outputs.append(self.parse(raw_output, output_model))
+            except OutputFormatError as e:
+                errors.append(e)
+        if not outputs:
+            raise errors[0] if errors else OutputFormatError('No output to parse.')
+        if len(outputs) == 1:
+            return outputs[0]
+
+        num_dimensions = len(outputs[0].dimension_scores)
+        dimension_samples = [
+            output.dimension_scores
+            for output in outputs
+            if len(output.dimension_scores) == num_dimensions
+        ]
+        return output_model(
+            overall_score=round(mean(output.overall_score for output in outputs)),
+            dimension_scores=[
+                round(mean(scores)) for scores in zip(*dimension_samples)
+            ],
+        )
+
 
 class InsightQualityEvaluator(BaseQualityEvaluator):
     def __init__(
@@ -89,7 +122,7 @@ class InsightQualityEvaluator(BaseQualityEvaluator):
 
     @parsing_error_exponential_backoff(retries=5, base_wait_time=1)
     def eval(self, *args: Any, **kwargs: Any) -> InsightEvalOutput:
-        raw_output = research_insight_quality_eval_prompting(
+        raw_outputs = research_insight_quality_eval_prompting(
             model_name=self.model_name,
             insight=kwargs['insight'],
             return_num=self.config.param.return_num if self.config else 1,
@@ -99,7 +132,7 @@ class InsightQualityEvaluator(BaseQualityEvaluator):
             stream=self.config.param.stream if self.config else None,
             prompt_template=self.config.eval_prompt_template.insight_quality,
         )
-        self.parsed_output = self.parse(raw_output, InsightEvalOutput)
+        self.parsed_output = self.parse_samples(raw_outputs, InsightEvalOutput)
 
         for key, value in kwargs.items():
             setattr(self.parsed_output, key, value)
@@ -118,7 +151,7 @@ class IdeaQualityEvaluator(BaseQualityEvaluator):
 
     @parsing_error_exponential_backoff(retries=5, base_wait_time=1)
     def eval(self, *args: Any, **kwargs: Any) -> IdeaEvalOutput:
-        raw_output = research_idea_quality_eval_prompting(
+        raw_outputs = research_idea_quality_eval_prompting(
             model_name=self.model_name,
             insights=kwargs['insights'],
             idea=kwargs['idea'],
@@ -129,7 +162,7 @@ class IdeaQualityEvaluator(BaseQualityEvaluator):
             stream=self.config.param.stream if self.config else None,
             prompt_template=self.config.eval_prompt_template.idea_quality,
         )
-        self.parsed_output = self.parse(raw_output, IdeaEvalOutput)
+        self.parsed_output = self.parse_samples(raw_outputs, IdeaEvalOutput)
 
         for key, value in kwargs.items():
             setattr(self.parsed_output, key, value)
@@ -148,7 +181,7 @@ class ProposalQualityEvaluator(BaseQualityEvaluator):
 
     @parsing_error_exponential_backoff(retries=5, base_wait_time=1)
     def eval(self, *args: Any, **kwargs: Any) -> ProposalEvalOutput:
-        raw_output = research_proposal_quality_eval_prompting(
+        raw_outputs = research_proposal_quality_eval_prompting(
             model_name=self.model_name,
             insights=kwargs['insights'],
             idea=kwargs['idea'],
@@ -160,7 +193,7 @@ class ProposalQualityEvaluator(BaseQualityEvaluator):
             stream=self.config.param.stream if self.config else None,
             prompt_template=self.config.eval_prompt_template.proposal_quality,
         )
-        self.parsed_output = self.parse(raw_output, ProposalEvalOutput)
+        self.parsed_output = self.parse_samples(raw_outputs, ProposalEvalOutput)
 
         for key, value in kwargs.items():
             setattr(self.parsed_output, key, value)
@@ -179,7 +212,7 @@ class ReviewQualityEvaluator(BaseQualityEvaluator):
 
     @parsing_error_exponential_backoff(retries=5, base_wait_time=1)
     def eval(self, *args: Any, **kwargs: Any) -> ReviewEvalOutput:
-        raw_output = research_review_quality_eval_prompting(
+        raw_outputs = research_review_quality_eval_prompting(
             model_name=self.model_name,
             insights=kwargs['insights'],
             idea=kwargs['idea'],
@@ -192,7 +225,7 @@ class ReviewQualityEvaluator(BaseQualityEvaluator):
             stream=self.config.param.stream if self.config else None,
             prompt_template=self.config.eval_prompt_template.review_quality,
         )
-        self.parsed_output = self.parse(raw_output, ReviewEvalOutput)
+        self.parsed_output = self.parse_samples(raw_outputs, ReviewEvalOutput)
 
         for key, value in kwargs.items():
             setattr(self.parsed_output, key, value)
@@ -211,7 +244,7 @@ class RebuttalQualityEvaluator(BaseQualityEvaluator):
 
     @parsing_error_exponential_backoff(retries=5, base_wait_time=1)
     def eval(self, *args: Any, **kwargs: Any) -> RebuttalEvalOutput:
-        raw_output = research_rebuttal_quality_eval_prompting(
+        raw_outputs = research_rebuttal_quality_eval_prompting(
             model_name=self.model_name,
             insights=kwargs['insights'],
             idea=kwargs['idea'],
@@ -225,7 +258,7 @@ class RebuttalQualityEvaluator(BaseQualityEvaluator):
             stream=self.config.param.stream if self.config else None,
             prompt_template=self.config.eval_prompt_template.rebuttal_quality,
         )
-        self.parsed_output = self.parse(raw_output, RebuttalEvalOutput)
+        self.parsed_output = self.parse_samples(raw_outputs, RebuttalEvalOutput)
 
         for key, value in kwargs.items():
             setattr(self.parsed_output, key, value)
@@ -244,7 +277,7 @@ class MetaReviewQualityEvaluator(BaseQualityEvaluator):
 
     @parsing_error_exponential_backoff(retries=5, base_wait_time=1)
     def eval(self, *args: Any, **kwargs: Any) -> MetaReviewEvalOutput:
-        raw_output = research_metareview_quality_eval_prompting(
+        raw_outputs = research_metareview_quality_eval_prompting(
             model_name=self.model_name,
             insights=kwargs['insights'],
             idea=kwargs['idea'],
@@ -259,7 +292,7 @@ class MetaReviewQualityEvaluator(BaseQualityEvaluator):
             stream=self.config.param.stream if self.config else None,
             prompt_template=self.config.eval_prompt_template.metareview_quality,
         )
-        self.parsed_output = self.parse(raw_output, MetaReviewEvalOutput)
+        self.parsed_output = self.parse_samples(raw_outputs, MetaReviewEvalOutput)
 
         for key, value in kwargs.items():
             setattr(self.parsed_output, key, value)
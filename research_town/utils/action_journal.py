@@ -0,0 +1,160 @@
+import contextvars
+import hashlib
+import json
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from beartype.typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    cast,
+)
+from pydantic import BaseModel
+
+from ..data import data as data_module
+from ..data.data import AgentActionLog, Data
+
+F = TypeVar('F', bound=Callable[..., Any])
+
+_journal: contextvars.ContextVar[Optional[Tuple['ActionJournal', str]]] = (
+    contextvars.ContextVar('action_journal', default=None)
+)
+
+
+def dump_value(value: Any) -> Any:
+    """Turn data, possibly nested in lists, tuples and dicts, into JSON values."""
+    if isinstance(value, Data):
+        return {'__class__': type(value).__name__, **value.model_dump(mode='json')}
+    if isinstance(value, tuple):
+        return {'__tuple__': [dump_value(item) for item in value]}
+    if isinstance(value, list):
+        return [dump_value(item) for item in value]
+    if isinstance(value, dict):
+        return {key: dump_value(item) for key, item in value.items()}
+    return value
+
+
+def load_value(value: Any) -> Any:
+    """The inverse of ``dump_value``."""
+    if isinstance(value, list):
+        return [load_value(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if '__tuple__' in value:
+        return tuple(load_value(item) for item in value['__tuple__'])
+    if '__class__' in value:
+        fields = {key: item for key, item in value.items() if key != '__class__'}
+        return getattr(data_module, value['__class__']).model_validate(fields)
+    return {key: load_value(item) for key, item in value.items()}
+
+
+def fingerprint(value: Any) -> Any:
+    # what tells the inputs of an action apart; the project data is stored in
+    # and embeddings do not, and configs are the same throughout a run
+    if isinstance(value, Data):
+        return value.model_dump(mode='json', exclude={'project_name', 'embed'})
+    if isinstance(value, BaseModel):
+        return None
+    if isinstance(value, (list, tuple)):
+        return [fingerprint(item) for item in value]
+    if isinstance(value, dict):
+        return {key: fingerprint(item) for key, item in value.items()}
+    return value
+
+
+class ActionJournal:
+    """
+    The results of the agent actions of a run, saved as they are made, so
+    that a resumed run replays the actions finished before it stopped instead
+    of making them again. An action is identified by the scope it is made in,
+    e.g. a run of an env, the agent and its role, the action, its inputs, and
+    the number of times the same action was made with the same inputs before
+    in the scope.
+    """
+
+    def __init__(
+        self,
+        logs: Optional[List[AgentActionLog]] = None,
+        save: Optional[Callable[[AgentActionLog], None]] = None,
+    ) -> None:
+        self.results: Dict[str, Any] = {log.key: log.result for log in logs or []}
+        self.save = save
+        self.occurrences: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def key(
+        self,
+        scope: str,
+        profile_pk: str,
+        role: Optional[str],
+        action: str,
+        args: Tuple[Any, ...],
+        kwargs: Dict[str, Any],
+    ) -> str:
+        inputs = json.dumps(
+            [scope, profile_pk, role, action, fingerprint(args), fingerprint(kwargs)],
+            sort_keys=True,
+            default=str,
+        )
+        digest = hashlib.sha256(inputs.encode('utf-8')).hexdigest()
+        with self.lock:
+            occurrence = self.occurrences.get(digest, 0)
+            self.occurrences[digest] = occurrence + 1
+        return f'{digest}:{occurrence}'
+
+    def lookup(self, key: str) -> Tuple[bool, Any]:
+        with self.lock:
+            if key not in self.results:
+                return False, None
+            result = self.results[key]
+        return True, load_value(result)
+
+    def add(self, key: str, profile_pk: str, action: str, result: Any) -> None:
+        dumped = dump_value(result)
+        with self.lock:
+            self.results[key] = dumped
+        if self.save is not None:
+            self.save(
+                AgentActionLog(
+                    key=key, profile_pk=profile_pk, action=action, result=dumped
+                )
+            )
+
+
+@contextmanager
+def journal_scope(journal: Optional[ActionJournal], scope: str) -> Iterator[None]:
+    """Journal the agent actions made inside the block under ``scope``."""
+    token = _journal.set(None if journal is None else (journal, scope))
+    try:
+        yield
+    finally:
+        _journal.reset(token)
+
+
+def journaled(method: F) -> F:
+    """Replay an agent method from the journal of the enclosing journal_scope."""
+
+    @wraps(method)
+    def wrapper(self: Any, *args: Any, **kwargs: Any) -> Any:
+        current = _journal.get()
+        if current is None:
+            return method(self, *args, **kwargs)
+        journal, scope = current
+        key = journal.key(
+            scope, self.profile.pk, self.role, method.__name__, args, kwargs
+        )
+        found, result = journal.lookup(key)
+        if found:
+            return result
+        result = method(self, *args, **kwargs)
+        journal.add(key, self.profile.pk, method.__name__, result)
+        return result
+
+    return cast(F, wrapper)
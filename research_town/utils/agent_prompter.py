@@ -1,10 +1,13 @@
+import asyncio
 import re
+from functools import partial
 
 from beartype import beartype
 from beartype.typing import Dict, List, Optional, Tuple, Union
-from litellm.utils import token_counter
 
-from .model_prompting import model_prompting
+from .concurrency import ordered_map
+from .context_budget import fit_to_context
+from .model_prompting import amodel_prompting, model_prompting
 from .prompt_constructor import openai_format_prompt_construct
 from .string_mapper import (
     map_cited_abstracts_to_str,
@@ -18,6 +21,59 @@ from .string_mapper import (
 )
 
 
+def review_literature_messages(
+    profile: Dict[str, str],
+    contexts: List[str],
+    prompt_template: Dict[str, Union[str, List[str]]],
+    papers: Optional[List[Dict[str, str]]] = None,
+    model_name: Optional[str] = None,
+    max_token_num: Optional[int] = None,
+) -> List[Dict[str, str]]:
+    def build_messages(papers: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        papers_str = (
+            map_paper_list_to_str(papers) if papers else 'No papers provided.\n'
+        )
+        template_input = {
+            'bio': profile['bio'],
+            'contexts': contexts,
+            'papers': papers_str,
+        }
+        return openai_format_prompt_construct(prompt_template, template_input)
+
+    if papers and model_name is not None:
+        papers = fit_to_context(
+            model_name,
+            max_token_num,
+            build_messages,
+            papers,
+            query=' '.join(contexts),
+            name='papers',
+            text_key='abstract',
+        )
+    return build_messages(papers or [])
+
+
+def parse_literature_review(insight: str) -> Tuple[str, List[str], str]:
+    summary_pattern = r'Summary of Target Paper:(.*?)Keywords of Target Paper:'
+    keywords_pattern = (
+        r'Keywords of Target Paper:(.*?)Valuable Points from Target Paper:'
+    )
+    valuable_points_pattern = r'Valuable Points from Target Paper:(.*)'
+
+    summary_match = re.search(summary_pattern, insight, re.DOTALL)
+    keywords_match = re.search(keywords_pattern, insight, re.DOTALL)
+    valuable_points_match = re.search(valuable_points_pattern, insight, re.DOTALL)
+
+    summary = summary_match.group(1).strip() if summary_match else ''
+    keywords = keywords_match.group(1).strip() if keywords_match else ''
+    keywords = keywords.split(',')
+    keywords = [keyword.strip() for keyword in keywords]
+    valuable_points = (
+        valuable_points_match.group(1).strip() if valuable_points_match else ''
+    )
+    return summary, keywords, valuable_points
+
+
 @beartype
 def review_literature_prompting(
     profile: Dict[str, str],
@@ -31,14 +87,9 @@ def review_literature_prompting(
     top_p: Optional[float] = None,
     stream: Optional[bool] = None,
 ) -> Tuple[str, List[str], str, list[dict[str, str]]]:
-    papers_str = map_paper_list_to_str(papers) if papers else 'No papers provided.\n'
-    template_input = {
-        'bio': profile['bio'],
-        'contexts': contexts,
-        'papers': papers_str,
-    }
-    messages = openai_format_prompt_construct(prompt_template, template_input)
-
+    messages = review_literature_messages(
+        profile, contexts, prompt_template, papers, model_name, max_token_num
+    )
     insight = model_prompting(
         model_name,
         messages,
@@ -48,25 +99,80 @@ def review_literature_prompting(
         top_p,
         stream,
     )[0]
+    return *parse_literature_review(insight), messages
 
-    summary_pattern = r'Summary of Target Paper:(.*?)Keywords of Target Paper:'
-    keywords_pattern = (
-        r'Keywords of Target Paper:(.*?)Valuable Points from Target Paper:'
+
+@beartype
+async def areview_literature_prompting(
+    profile: Dict[str, str],
+    contexts: List[str],
+    model_name: str,
+    prompt_template: Dict[str, Union[str, List[str]]],
+    papers: Optional[List[Dict[str, str]]] = None,
+    return_num: Optional[int] = 1,
+    max_token_num: Optional[int] = 512,
+    temperature: Optional[float] = 0.0,
+    top_p: Optional[float] = None,
+    stream: Optional[bool] = None,
+) -> Tuple[str, List[str], str, list[dict[str, str]]]:
+    messages = review_literature_messages(
+        profile, contexts, prompt_template, papers, model_name, max_token_num
     )
-    valuable_points_pattern = r'Valuable Points from Target Paper:(.*)'
+    insight = (
+        await amodel_prompting(
+            model_name,
+            messages,
+            return_num,
+            max_token_num,
+            temperature,
+            top_p,
+            stream,
+        )
+    )[0]
+    return *parse_literature_review(insight), messages
 
-    summary_match = re.search(summary_pattern, insight, re.DOTALL)
-    keywords_match = re.search(keywords_pattern, insight, re.DOTALL)
-    valuable_points_match = re.search(valuable_points_pattern, insight, re.DOTALL)
 
-    summary = summary_match.group(1).strip() if summary_match else ''
-    keywords = keywords_match.group(1).strip() if keywords_match else ''
-    keywords = keywords.split(',')
-    keywords = [keyword.strip() for keyword in keywords]
-    valuable_points = (
-        valuable_points_match.group(1).strip() if valuable_points_match else ''
-    )
-    return summary, keywords, valuable_points, messages
+def brainstorm_idea_messages(
+    bio: str,
+    insights: List[Dict[str, str]],
+    prompt_template: Dict[str, Union[str, List[str]]],
+    papers: Optional[List[Dict[str, str]]] = None,
+    model_name: Optional[str] = None,
+    max_token_num: Optional[int] = None,
+) -> List[Dict[str, str]]:
+    def build_messages(
+        insights: List[Dict[str, str]], papers: List[Dict[str, str]]
+    ) -> List[Dict[str, str]]:
+        insights_str = map_insight_list_to_str(insights)
+        papers_str = (
+            map_paper_list_to_str(papers) if papers else 'No papers provided.\n'
+        )
+        template_input = {'bio': bio, 'insights': insights_str, 'papers': papers_str}
+        return openai_format_prompt_construct(prompt_template, template_input)
+
+    if model_name is not None:
+        # papers give way to the agent's own insights, which are trimmed last
+        insights_str = map_insight_list_to_str(insights)
+        if papers:
+            papers = fit_to_context(
+                model_name,
+                max_token_num,
+                lambda papers: build_messages(insights, papers),
+                papers,
+                query=insights_str or bio,
+                name='papers',
+                text_key='abstract',
+            )
+        insights = fit_to_context(
+            model_name,
+            max_token_num,
+            lambda insights: build_messages(insights, papers or []),
+            insights,
+            query=bio,
+            name='insights',
+            text_key='content',
+        )
+    return build_messages(insights, papers or [])
 
 
 @beartype
@@ -82,10 +188,9 @@ def brainstorm_idea_prompting(
     top_p: Optional[float] = None,
     stream: Optional[bool] = None,
 ) -> Tuple[List[str], List[Dict[str, str]]]:
-    insights_str = map_insight_list_to_str(insights)
-    papers_str = map_paper_list_to_str(papers) if papers else 'No papers provided.\n'
-    template_input = {'bio': bio, 'insights': insights_str, 'papers': papers_str}
-    messages = openai_format_prompt_construct(prompt_template, template_input)
+    messages = brainstorm_idea_messages(
+        bio, insights, prompt_template, papers, model_name, max_token_num
+    )
     return model_prompting(
         model_name,
         messages,
@@ -98,21 +203,55 @@ def brainstorm_idea_prompting(
 
 
 @beartype
-def summarize_idea_prompting(
-    contexts: List[str],
-    ideas: List[Dict[str, str]],
+async def abrainstorm_idea_prompting(
+    bio: str,
+    insights: List[Dict[str, str]],
     model_name: str,
     prompt_template: Dict[str, Union[str, List[str]]],
+    papers: Optional[List[Dict[str, str]]] = None,
     return_num: Optional[int] = 1,
     max_token_num: Optional[int] = 512,
     temperature: Optional[float] = 0.0,
     top_p: Optional[float] = None,
     stream: Optional[bool] = None,
 ) -> Tuple[List[str], List[Dict[str, str]]]:
+    messages = brainstorm_idea_messages(
+        bio, insights, prompt_template, papers, model_name, max_token_num
+    )
+    return await amodel_prompting(
+        model_name,
+        messages,
+        return_num=return_num,
+        max_token_num=max_token_num,
+        temperature=temperature,
+        top_p=top_p,
+        stream=stream,
+    ), messages
+
+
+def summarize_idea_messages(
+    contexts: List[str],
+    ideas: List[Dict[str, str]],
+    prompt_template: Dict[str, Union[str, List[str]]],
+) -> List[Dict[str, str]]:
     ideas_str = map_idea_list_to_str(ideas)
     template_input = {'ideas': ideas_str, 'contexts': contexts}
-    messages = openai_format_prompt_construct(prompt_template, template_input)
+    return openai_format_prompt_construct(prompt_template, template_input)
 
+
+@beartype
+def summarize_idea_prompting(
+    contexts: List[str],
+    ideas: List[Dict[str, str]],
+    model_name: str,
+    prompt_template: Dict[str, Union[str, List[str]]],
+    return_num: Optional[int] = 1,
+    max_token_num: Optional[int] = 512,
+    temperature: Optional[float] = 0.0,
+    top_p: Optional[float] = None,
+    stream: Optional[bool] = None,
+) -> Tuple[List[str], List[Dict[str, str]]]:
+    messages = summarize_idea_messages(contexts, ideas, prompt_template)
     return model_prompting(
         model_name,
         messages,
@@ -125,23 +264,19 @@ def summarize_idea_prompting(
 
 
 @beartype
-def write_proposal_prompting(
-    idea: Dict[str, str],
+async def asummarize_idea_prompting(
+    contexts: List[str],
+    ideas: List[Dict[str, str]],
     model_name: str,
     prompt_template: Dict[str, Union[str, List[str]]],
-    papers: Optional[List[Dict[str, str]]] = None,
     return_num: Optional[int] = 1,
     max_token_num: Optional[int] = 512,
     temperature: Optional[float] = 0.0,
     top_p: Optional[float] = None,
     stream: Optional[bool] = None,
-) -> Tuple[str, Dict[str, str], List[Dict[str, str]]]:
-    idea_str = map_idea_to_str(idea)
-    papers_str = map_paper_list_to_str(papers) if papers else 'No papers provided.\n'
-    template_input = {'idea': idea_str, 'papers': papers_str}
-    messages = openai_format_prompt_construct(prompt_template, template_input)
-
-    proposal = model_prompting(
+) -> Tuple[List[str], List[Dict[str, str]]]:
+    messages = summarize_idea_messages(contexts, ideas, prompt_template)
+    return await amodel_prompting(
         model_name,
         messages,
         return_num=return_num,
@@ -149,10 +284,12 @@ def write_proposal_prompting(
         temperature=temperature,
         top_p=top_p,
         stream=stream,
-    )[0]
+    ), messages
 
+
+def parse_questions(text: str) -> Dict[str, str]:
     pattern = r'\[Question (\d+)\](.*?)(?=\[Question \d+\]|\Z)'
-    matches = re.findall(pattern, proposal, re.DOTALL)
+    matches = re.findall(pattern, text, re.DOTALL)
     q5_result = {}
 
     for match in matches:
@@ -160,7 +297,152 @@ def write_proposal_prompting(
         answer = match[1].strip()
         q5_result[question_number] = answer
 
-    return proposal, q5_result, messages
+    return q5_result
+
+
+def write_proposal_messages(
+    idea: Dict[str, str],
+    prompt_template: Dict[str, Union[str, List[str]]],
+    papers: Optional[List[Dict[str, str]]] = None,
+    model_name: Optional[str] = None,
+    max_token_num: Optional[int] = None,
+) -> List[Dict[str, str]]:
+    idea_str = map_idea_to_str(idea)
+
+    def build_messages(papers: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        papers_str = (
+            map_paper_list_to_str(papers) if papers else 'No papers provided.\n'
+        )
+        template_input = {'idea': idea_str, 'papers': papers_str}
+        return openai_format_prompt_construct(prompt_template, template_input)
+
+    if papers and model_name is not None:
+        papers = fit_to_context(
+            model_name,
+            max_token_num,
+            build_messages,
+            papers,
+            query=idea_str,
+            name='papers',
+            text_key='abstract',
+        )
+    return build_messages(papers or [])
+
+
+@beartype
+def write_proposal_prompting(
+    idea: Dict[str, str],
+    model_name: str,
+    prompt_template: Dict[str, Union[str, List[str]]],
+    papers: Optional[List[Dict[str, str]]] = None,
+    return_num: Optional[int] = 1,
+    max_token_num: Optional[int] = 512,
+    temperature: Optional[float] = 0.0,
+    top_p: Optional[float] = None,
+    stream: Optional[bool] = None,
+) -> Tuple[str, Dict[str, str], List[Dict[str, str]]]:
+    messages = write_proposal_messages(
+        idea, prompt_template, papers, model_name, max_token_num
+    )
+    proposal = model_prompting(
+        model_name,
+        messages,
+        return_num=return_num,
+        max_token_num=max_token_num,
+        temperature=temperature,
+        top_p=top_p,
+        stream=stream,
+    )[0]
+    return proposal, parse_questions(proposal), messages
+
+
+@beartype
+async def awrite_proposal_prompting(
+    idea: Dict[str, str],
+    model_name: str,
+    prompt_template: Dict[str, Union[str, List[str]]],
+    papers: Optional[List[Dict[str, str]]] = None,
+    return_num: Optional[int] = 1,
+    max_token_num: Optional[int] = 512,
+    temperature: Optional[float] = 0.0,
+    top_p: Optional[float] = None,
+    stream: Optional[bool] = None,
+) -> Tuple[str, Dict[str, str], List[Dict[str, str]]]:
+    messages = write_proposal_messages(
+        idea, prompt_template, papers, model_name, max_token_num
+    )
+    proposal = (
+        await amodel_prompting(
+            model_name,
+            messages,
+            return_num=return_num,
+            max_token_num=max_token_num,
+            temperature=temperature,
+            top_p=top_p,
+            stream=stream,
+        )
+    )[0]
+    return proposal, parse_questions(proposal), messages
+
+
+def write_review_messages(
+    proposal: Dict[str, str],
+    profile: Dict[str, str],
+    strength_prompt_template: Dict[str, Union[str, List[str]]],
+    weakness_prompt_template: Dict[str, Union[str, List[str]]],
+    model_name: Optional[str] = None,
+    max_token_num: Optional[int] = None,
+) -> Tuple[List[Dict[str, str]], List[Dict[str, str]]]:
+    proposal_str = map_proposal_to_str(proposal)
+
+    citations: Union[str, List[str]] = proposal.get('citations', [])
+    assert isinstance(citations, list)
+
+    def build_messages(
+        prompt_template: Dict[str, Union[str, List[str]]], citations: List[str]
+    ) -> List[Dict[str, str]]:
+        template_input = {
+            'proposal': proposal_str,
+            'bio': profile['bio'],
+            'citations': map_cited_abstracts_to_str(citations),
+        }
+        return openai_format_prompt_construct(prompt_template, template_input)
+
+    if model_name is not None:
+        # the citations kept have to fit both prompts
+        for prompt_template in (strength_prompt_template, weakness_prompt_template):
+            citations = fit_to_context(
+                model_name,
+                max_token_num,
+                partial(build_messages, prompt_template),
+                citations,
+                query=proposal_str,
+                name='citations',
+            )
+    strength_messages = build_messages(strength_prompt_template, citations)
+    weakness_messages = build_messages(weakness_prompt_template, citations)
+    return strength_messages, weakness_messages
+
+
+def write_review_score_messages(
+    strength: str,
+    weakness: str,
+    profile: Dict[str, str],
+    score_prompt_template: Dict[str, Union[str, List[str]]],
+) -> List[Dict[str, str]]:
+    score_template_input = {
+        'strength': strength,
+        'weakness': weakness,
+        'bio': profile['bio'],
+    }
+    return openai_format_prompt_construct(score_prompt_template, score_template_input)
+
+
+def parse_score(score_response_str: str) -> int:
+    # find the first number in 10, 1, 2, 3, 4, 5, 6, 7, 8, 9
+    score_str = re.findall(r'\d+', score_response_str)
+    score_str_1st = score_str[0] if score_str else 0
+    return int(score_str_1st)
 
 
 @beartype
@@ -184,64 +466,32 @@ def write_review_prompting(
     List[Dict[str, str]],
     List[Dict[str, str]],
 ]:
-    token_input_count = 0
-    token_output_count = 0
-    proposal_str = map_proposal_to_str(proposal)
-
-    citations: Union[str, List[str]] = proposal.get('citations', [])
-    assert isinstance(citations, list)
-    citations_str = map_cited_abstracts_to_str(citations)
-
-    strength_template_input = {
-        'proposal': proposal_str,
-        'bio': profile['bio'],
-        'citations': citations_str,
-    }
-    strength_messages = openai_format_prompt_construct(
-        strength_prompt_template, strength_template_input
-    )
-    weakness_template_input = {
-        'proposal': proposal_str,
-        'bio': profile['bio'],
-        'citations': citations_str,
-    }
-    weakness_messages = openai_format_prompt_construct(
-        weakness_prompt_template, weakness_template_input
-    )
-
-    strength = model_prompting(
+    strength_messages, weakness_messages = write_review_messages(
+        proposal,
+        profile,
+        strength_prompt_template,
+        weakness_prompt_template,
         model_name,
-        strength_messages,
-        return_num,
-        max_token_num,
-        temperature,
-        top_p,
-        stream,
-    )[0]
-    weakness = model_prompting(
-        model_name,
-        weakness_messages,
-        return_num,
         max_token_num,
-        temperature,
-        top_p,
-        stream,
-    )[0]
-
-    token_input_count += token_counter(model=model_name, messages=strength_messages)
-    token_input_count += token_counter(model=model_name, messages=weakness_messages)
-    token_output_count += token_counter(model=model_name, text=strength)
-    token_output_count += token_counter(model=model_name, text=weakness)
-
-    score_template_input = {
-        'strength': strength,
-        'weakness': weakness,
-        'bio': profile['bio'],
-    }
-    score_messages = openai_format_prompt_construct(
-        score_prompt_template, score_template_input
+    )
+    # strength and weakness are independent, only the score needs both
+    strength, weakness = ordered_map(
+        lambda messages: model_prompting(
+            model_name,
+            messages,
+            return_num,
+            max_token_num,
+            temperature,
+            top_p,
+            stream,
+        )[0],
+        [strength_messages, weakness_messages],
+        max_workers=2,
     )
 
+    score_messages = write_review_score_messages(
+        strength, weakness, profile, score_prompt_template
+    )
     score_response_str = model_prompting(
         model_name,
         score_messages,
@@ -252,21 +502,10 @@ def write_review_prompting(
         stream,
     )[0]
 
-    token_input_count += token_counter(model=model_name, messages=score_messages)
-    token_output_count += token_counter(model=model_name, text=score_response_str)
-
-    # find the first number in 10, 1, 2, 3, 4, 5, 6, 7, 8, 9
-    score_str = re.findall(r'\d+', score_response_str)
-    score_str_1st = score_str[0] if score_str else 0
-    score = int(score_str_1st)
-
-    print(f'Token input count: {token_input_count}')
-    print(f'Token output count: {token_output_count}')
-
     return (
         strength,
         weakness,
-        score,
+        parse_score(score_response_str),
         strength_messages,
         weakness_messages,
         score_messages,
@@ -274,11 +513,13 @@ def write_review_prompting(
 
 
 @beartype
-def write_metareview_prompting(
-    reviews: List[Dict[str, Union[int, str]]],
+async def awrite_review_prompting(
+    proposal: Dict[str, str],
     model_name: str,
+    profile: Dict[str, str],
     strength_prompt_template: Dict[str, Union[str, List[str]]],
     weakness_prompt_template: Dict[str, Union[str, List[str]]],
+    score_prompt_template: Dict[str, Union[str, List[str]]],
     return_num: Optional[int] = 1,
     max_token_num: Optional[int] = 512,
     temperature: Optional[float] = 0.0,
@@ -287,12 +528,72 @@ def write_metareview_prompting(
 ) -> Tuple[
     str,
     str,
+    int,
+    List[Dict[str, str]],
     List[Dict[str, str]],
     List[Dict[str, str]],
 ]:
-    token_input_count = 0
-    token_output_count = 0
+    strength_messages, weakness_messages = write_review_messages(
+        proposal,
+        profile,
+        strength_prompt_template,
+        weakness_prompt_template,
+        model_name,
+        max_token_num,
+    )
+    # strength and weakness are independent, only the score needs both
+    strength_response, weakness_response = await asyncio.gather(
+        amodel_prompting(
+            model_name,
+            strength_messages,
+            return_num,
+            max_token_num,
+            temperature,
+            top_p,
+            stream,
+        ),
+        amodel_prompting(
+            model_name,
+            weakness_messages,
+            return_num,
+            max_token_num,
+            temperature,
+            top_p,
+            stream,
+        ),
+    )
+    strength, weakness = strength_response[0], weakness_response[0]
+
+    score_messages = write_review_score_messages(
+        strength, weakness, profile, score_prompt_template
+    )
+    score_response_str = (
+        await amodel_prompting(
+            model_name,
+            score_messages,
+            return_num,
+            max_token_num,
+            temperature,
+            top_p,
+            stream,
+        )
+    )[0]
+
+    return (
+        strength,
+        weakness,
+        parse_score(score_response_str),
+        strength_messages,
+        weakness_messages,
+        score_messages,
+    )
+
 
+def write_metareview_messages(
+    reviews: List[Dict[str, Union[int, str]]],
+    strength_prompt_template: Dict[str, Union[str, List[str]]],
+    weakness_prompt_template: Dict[str, Union[str, List[str]]],
+) -> Tuple[List[Dict[str, str]], List[Dict[str, str]]]:
     reviews_str = map_review_list_to_str(reviews)
     strength_template_input = {
         'reviews': reviews_str,
@@ -306,28 +607,42 @@ def write_metareview_prompting(
     weakness_messages = openai_format_prompt_construct(
         weakness_prompt_template, weakness_template_input
     )
-    strength = model_prompting(
-        model_name,
-        strength_messages,
-        return_num,
-        max_token_num,
-        temperature,
-        top_p,
-        stream,
-    )[0]
-    weakness = model_prompting(
-        model_name,
-        weakness_messages,
-        return_num,
-        max_token_num,
-        temperature,
-        top_p,
-        stream,
-    )[0]
-    token_input_count += token_counter(model=model_name, messages=strength_messages)
-    token_input_count += token_counter(model=model_name, messages=weakness_messages)
-    token_output_count += token_counter(model=model_name, text=strength)
-    token_output_count += token_counter(model=model_name, text=weakness)
+    return strength_messages, weakness_messages
+
+
+@beartype
+def write_metareview_prompting(
+    reviews: List[Dict[str, Union[int, str]]],
+    model_name: str,
+    strength_prompt_template: Dict[str, Union[str, List[str]]],
+    weakness_prompt_template: Dict[str, Union[str, List[str]]],
+    return_num: Optional[int] = 1,
+    max_token_num: Optional[int] = 512,
+    temperature: Optional[float] = 0.0,
+    top_p: Optional[float] = None,
+    stream: Optional[bool] = None,
+) -> Tuple[
+    str,
+    str,
+    List[Dict[str, str]],
+    List[Dict[str, str]],
+]:
+    strength_messages, weakness_messages = write_metareview_messages(
+        reviews, strength_prompt_template, weakness_prompt_template
+    )
+    strength, weakness = ordered_map(
+        lambda messages: model_prompting(
+            model_name,
+            messages,
+            return_num,
+            max_token_num,
+            temperature,
+            top_p,
+            stream,
+        )[0],
+        [strength_messages, weakness_messages],
+        max_workers=2,
+    )
 
     return (
         strength,
@@ -337,6 +652,66 @@ def write_metareview_prompting(
     )
 
 
+@beartype
+async def awrite_metareview_prompting(
+    reviews: List[Dict[str, Union[int, str]]],
+    model_name: str,
+    strength_prompt_template: Dict[str, Union[str, List[str]]],
+    weakness_prompt_template: Dict[str, Union[str, List[str]]],
+    return_num: Optional[int] = 1,
+    max_token_num: Optional[int] = 512,
+    temperature: Optional[float] = 0.0,
+    top_p: Optional[float] = None,
+    stream: Optional[bool] = None,
+) -> Tuple[
+    str,
+    str,
+    List[Dict[str, str]],
+    List[Dict[str, str]],
+]:
+    strength_messages, weakness_messages = write_metareview_messages(
+        reviews, strength_prompt_template, weakness_prompt_template
+    )
+    strength_response, weakness_response = await asyncio.gather(
+        amodel_prompting(
+            model_name,
+            strength_messages,
+            return_num,
+            max_token_num,
+            temperature,
+            top_p,
+            stream,
+        ),
+        amodel_prompting(
+            model_name,
+            weakness_messages,
+            return_num,
+            max_token_num,
+            temperature,
+            top_p,
+            stream,
+        ),
+    )
+
+    return (
+        strength_response[0],
+        weakness_response[0],
+        strength_messages,
+        weakness_messages,
+    )
+
+
+def write_rebuttal_messages(
+    proposal: Dict[str, str],
+    review: Dict[str, Union[int, str]],
+    prompt_template: Dict[str, Union[str, List[str]]],
+) -> List[Dict[str, str]]:
+    proposal_str = map_proposal_to_str(proposal)
+    review_str = map_review_to_str(review)
+    template_input = {'proposal': proposal_str, 'review': review_str}
+    return openai_format_prompt_construct(prompt_template, template_input)
+
+
 @beartype
 def write_rebuttal_prompting(
     proposal: Dict[str, str],
@@ -349,10 +724,7 @@ def write_rebuttal_prompting(
     top_p: Optional[float] = None,
     stream: Optional[bool] = None,
 ) -> Tuple[str, Dict[str, str], List[Dict[str, str]]]:
-    proposal_str = map_proposal_to_str(proposal)
-    review_str = map_review_to_str(review)
-    template_input = {'proposal': proposal_str, 'review': review_str}
-    messages = openai_format_prompt_construct(prompt_template, template_input)
+    messages = write_rebuttal_messages(proposal, review, prompt_template)
     rebuttal = model_prompting(
         model_name,
         messages,
@@ -362,14 +734,31 @@ def write_rebuttal_prompting(
         top_p=top_p,
         stream=stream,
     )[0]
+    return rebuttal, parse_questions(rebuttal), messages
 
-    pattern = r'\[Question (\d+)\](.*?)(?=\[Question \d+\]|\Z)'
-    matches = re.findall(pattern, rebuttal, re.DOTALL)
-    q5_result = {}
 
-    for match in matches:
-        question_number = f'q{match[0]}'
-        answer = match[1].strip()
-        q5_result[question_number] = answer
-
-    return rebuttal, q5_result, messages
+@beartype
+async def awrite_rebuttal_prompting(
+    proposal: Dict[str, str],
+    review: Dict[str, Union[int, str]],
+    model_name: str,
+    prompt_template: Dict[str, Union[str, List[str]]],
+    return_num: Optional[int] = 1,
+    max_token_num: Optional[int] = 512,
+    temperature: Optional[float] = 0.0,
+    top_p: Optional[float] = None,
+    stream: Optional[bool] = None,
+) -> Tuple[str, Dict[str, str], List[Dict[str, str]]]:
+    messages = write_rebuttal_messages(proposal, review, prompt_template)
+    rebuttal = (
+        await amodel_prompting(
+            model_name,
+            messages,
+            return_num=return_num,
+            max_token_num=max_token_num,
+            temperature=temperature,
+            top_p=top_p,
+            stream=stream,
+        )
+    )[0]
+    return rebuttal, parse_questions(rebuttal), messages
@@ -0,0 +1,192 @@
+import contextvars
+import threading
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from contextlib import contextmanager
+
+from beartype.typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Generic,
+    Iterable,
+    Iterator,
+    List,
+    TypeVar,
+)
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+class Channel(Generic[T]):
+    """
+    Items handed from a producing thread to consuming ones as they are made.
+    Iterating a channel yields all items put into it, in order, waiting for
+    more until the channel is closed; every iteration starts from the first
+    item, so the channel also serves as the list of all items once closed.
+    """
+
+    def __init__(self) -> None:
+        self.items: List[T] = []
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def put(self, item: T) -> None:
+        with self.condition:
+            if self.closed:
+                raise RuntimeError('Cannot put items into a closed channel')
+            self.items.append(item)
+            self.condition.notify_all()
+
+    def close(self) -> None:
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def __iter__(self) -> Iterator[T]:
+        index = 0
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: index < len(self.items) or self.closed)
+                if index >= len(self.items):
+                    return
+                item = self.items[index]
+            index += 1
+            yield item
+
+
+class FairSemaphore:
+    """
+    A semaphore that hands its slots out round-robin across keys, such as
+    projects, and in arrival order within a key, so that a key with many
+    waiting threads cannot starve the others.
+    """
+
+    def __init__(self, value: int) -> None:
+        self.free = value
+        # waiting threads by key, with the key to serve next first
+        self.waiting: Dict[str, Deque[object]] = {}
+        self.condition = threading.Condition()
+
+    def is_next(self, key: str, ticket: object) -> bool:
+        return (
+            self.free > 0
+            and next(iter(self.waiting)) == key
+            and self.waiting[key][0] is ticket
+        )
+
+    @contextmanager
+    def acquire(self, key: str) -> Iterator[None]:
+        ticket = object()
+        with self.condition:
+            self.waiting.setdefault(key, deque()).append(ticket)
+            self.condition.wait_for(lambda: self.is_next(key, ticket))
+            self.free -= 1
+            tickets = self.waiting.pop(key)
+            tickets.popleft()
+            if tickets:
+                # the key waits for its next turn behind the other keys
+                self.waiting[key] = tickets
+            self.condition.notify_all()
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.free += 1
+                self.condition.notify_all()
+
+
+def submit_in_context(
+    executor: Executor, func: Callable[..., R], *args: Any
+) -> 'Future[R]':
+    """Submit ``func`` to run in a copy of the caller's context."""
+    return executor.submit(contextvars.copy_context().run, func, *args)
+
+
+def copy_outcome(source: 'Future[R]', target: 'Future[R]') -> None:
+    if source.cancelled():
+        target.cancel()
+        return
+    error = source.exception()
+    if error is not None:
+        target.set_exception(error)
+    else:
+        target.set_result(source.result())
+
+
+def submit_after(
+    executor: Executor,
+    dependencies: List['Future[Any]'],
+    func: Callable[..., R],
+    *args: Any,
+) -> 'Future[R]':
+    """
+    Submit ``func`` once all ``dependencies`` are done, without holding a
+    worker while they run. The returned future fails with the error of the
+    first failed dependency instead of running ``func``, and ``func`` runs in
+    a copy of the context ``submit_after`` was called in.
+    """
+    context = contextvars.copy_context()
+    result: 'Future[R]' = Future()
+    remaining = len(dependencies)
+    lock = threading.Lock()
+
+    def start() -> None:
+        for dependency in dependencies:
+            if dependency.cancelled():
+                result.cancel()
+                return
+            error = dependency.exception()
+            if error is not None:
+                result.set_exception(error)
+                return
+        try:
+            future = executor.submit(context.run, func, *args)
+        except RuntimeError as e:
+            # the executor was shut down while the dependencies ran
+            result.set_exception(e)
+            return
+        future.add_done_callback(lambda future: copy_outcome(future, result))
+
+    def on_done(_: 'Future[Any]') -> None:
+        nonlocal remaining
+        with lock:
+            remaining -= 1
+            ready = remaining == 0
+        if ready:
+            start()
+
+    if not dependencies:
+        start()
+    for dependency in dependencies:
+        dependency.add_done_callback(on_done)
+    return result
+
+
+def ordered_map(
+    func: Callable[[T], R], items: Iterable[T], max_workers: int
+) -> Iterator[R]:
+    """
+    Apply ``func`` to every item on up to ``max_workers`` threads, and yield
+    the results in the order of the items, each as soon as it and all results
+    before it are done. Every call runs in a copy of the caller's context, so
+    that usage scopes, response cache namespaces and token callbacks set by
+    the caller still apply. With ``max_workers`` of 1 the items are processed
+    one after another in the calling thread.
+    """
+    items = list(items)
+    if max_workers <= 1 or len(items) <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(items)))
+    try:
+        futures = [submit_in_context(executor, func, item) for item in items]
+        for future in futures:
+            yield future.result()
+    finally:
+        # calls not started yet are dropped when the caller stops early or fails
+        executor.shutdown(wait=True, cancel_futures=True)
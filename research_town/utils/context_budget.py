@@ -0,0 +1,127 @@
+import litellm
+from beartype.typing import Callable, Dict, List, Optional, TypeVar, Union
+from litellm.utils import token_counter
+
+from .logger import logger
+
+DEFAULT_CONTEXT_WINDOW = 8192
+# tokens kept free for message framing that the token count misses
+CONTEXT_MARGIN = 64
+# tokens taken by the numbering and separators of each listed item
+ITEM_OVERHEAD = 8
+# a partial item shorter than this is dropped rather than truncated
+MIN_TRUNCATED_TOKENS = 64
+
+Item = TypeVar('Item', str, Dict[str, str])
+
+_context_windows: Dict[str, int] = {}
+
+
+def set_context_window(llm_model: str, num_tokens: Optional[int]) -> None:
+    """Override the context window of a model, e.g. of a self-hosted one."""
+    if num_tokens is None:
+        _context_windows.pop(llm_model, None)
+    else:
+        _context_windows[llm_model] = num_tokens
+
+
+def get_context_window(llm_model: str) -> int:
+    if llm_model in _context_windows:
+        return _context_windows[llm_model]
+    try:
+        max_input_tokens = litellm.get_model_info(llm_model).get('max_input_tokens')
+    except Exception:
+        # models missing from the litellm model list
+        max_input_tokens = None
+    return int(max_input_tokens or DEFAULT_CONTEXT_WINDOW)
+
+
+def count_message_tokens(llm_model: str, messages: List[Dict[str, str]]) -> int:
+    return int(token_counter(model=llm_model, messages=messages))
+
+
+def count_text_tokens(llm_model: str, text: str) -> int:
+    return int(token_counter(model=llm_model, text=text))
+
+
+def item_text(item: Union[str, Dict[str, str]], text_key: Optional[str]) -> str:
+    if isinstance(item, str):
+        return item
+    assert text_key is not None
+    return item[text_key]
+
+
+def truncate_item(
+    llm_model: str,
+    item: Item,
+    text_key: Optional[str],
+    num_tokens: int,
+) -> Item:
+    """Cut the text of an item down to at most ``num_tokens`` tokens."""
+    text = item_text(item, text_key)
+    total = count_text_tokens(llm_model, text)
+    while total > num_tokens and text:
+        text = text[: int(len(text) * num_tokens / total * 0.95)]
+        total = count_text_tokens(llm_model, text)
+    if isinstance(item, str):
+        return text
+    assert text_key is not None
+    return {**item, text_key: text}
+
+
+def rank_by_relevance(texts: List[str], query: Optional[str]) -> List[int]:
+    """Indices of ``texts``, most similar to ``query`` by embedding first."""
+    if not query:
+        return list(range(len(texts)))
+    from .retriever import get_embed, rank_topk
+
+    return rank_topk(get_embed([query]), get_embed(texts), len(texts))[0]
+
+
+def fit_to_context(
+    llm_model: str,
+    max_token_num: Optional[int],
+    build_messages: Callable[[List[Item]], List[Dict[str, str]]],
+    items: List[Item],
+    query: Optional[str] = None,
+    name: str = 'items',
+    text_key: Optional[str] = None,
+) -> List[Item]:
+    """
+    Select the items to list in a prompt so that the messages returned by
+    ``build_messages`` leave ``max_token_num`` completion tokens in the context
+    window of the model. If not all items fit, they are taken in order of their
+    embedding similarity to ``query`` (or in the given order without one),
+    the first item that does not fit is truncated to the remaining budget, and
+    the rest are dropped. The kept items are returned in their original order.
+    """
+    if not items:
+        return items
+    budget = get_context_window(llm_model) - (max_token_num or 0) - CONTEXT_MARGIN
+    if count_message_tokens(llm_model, build_messages(items)) <= budget:
+        return items
+
+    budget -= count_message_tokens(llm_model, build_messages([]))
+    texts = [item_text(item, text_key) for item in items]
+    kept: Dict[int, Item] = {}
+    truncated = []
+    for index in rank_by_relevance(texts, query):
+        num_tokens = count_text_tokens(llm_model, texts[index]) + ITEM_OVERHEAD
+        if num_tokens <= budget:
+            kept[index] = items[index]
+            budget -= num_tokens
+            continue
+        if budget - ITEM_OVERHEAD >= MIN_TRUNCATED_TOKENS:
+            kept[index] = truncate_item(
+                llm_model, items[index], text_key, budget - ITEM_OVERHEAD
+            )
+            truncated.append(index)
+        break
+
+    dropped = [index for index in range(len(items)) if index not in kept]
+    logger.warning(
+        f'{name.capitalize()} exceed the context window of {llm_model}: '
+        f'kept {len(kept)} of {len(items)}, truncated {truncated}, '
+        f'dropped {dropped} (indices in the given order)'
+    )
+    return [kept[index] for index in sorted(kept)]
@@ -0,0 +1,191 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import numpy.typing as npt
+from beartype.typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+EMBEDDING_CACHE_MAX_MB = 1024
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache in a sqlite file, keyed by model name and text.
+
+    Keys are the sha256 of the model name and the text, values the float32
+    embedding. Every hit refreshes the entry's access time, and once the stored
+    embeddings exceed ``max_bytes`` the least recently used entries are evicted.
+    Triggers keep the total size of the embeddings in the ``meta`` table, so
+    that the size is not summed up again on every write.
+    """
+
+    def __init__(self, path: str, max_bytes: int) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS embeddings ('
+            'key TEXT PRIMARY KEY, model TEXT, value BLOB, size INTEGER, '
+            'last_access REAL)'
+        )
+        self.conn.execute(
+            'CREATE INDEX IF NOT EXISTS embeddings_last_access '
+            'ON embeddings (last_access)'
+        )
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)'
+            )
+            # files written before the total was kept are summed up once
+            self.conn.execute(
+                'INSERT OR IGNORE INTO meta (name, value) '
+                "SELECT 'size', COALESCE(SUM(size), 0) FROM embeddings"
+            )
+            for name, event, change in [
+                ('insert', 'INSERT', 'new.size'),
+                ('update', 'UPDATE OF size', 'new.size - old.size'),
+                ('delete', 'DELETE', '-old.size'),
+            ]:
+                self.conn.execute(
+                    f'CREATE TRIGGER IF NOT EXISTS embeddings_{name} '
+                    f'AFTER {event} ON embeddings BEGIN UPDATE meta '
+                    f"SET value = value + {change} WHERE name = 'size'; END"
+                )
+        finally:
+            self.conn.commit()
+
+    @staticmethod
+    def key(model_name: str, text: str) -> str:
+        return hashlib.sha256(f'{model_name}\0{text}'.encode()).hexdigest()
+
+    def get_many(
+        self, model_name: str, texts: Sequence[str]
+    ) -> List[Optional[npt.NDArray[np.float32]]]:
+        keys = [self.key(model_name, text) for text in texts]
+        found: Dict[str, npt.NDArray[np.float32]] = {}
+        with self.lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start : start + 500]
+                rows = self.conn.execute(
+                    'SELECT key, value FROM embeddings WHERE key IN '
+                    f'({", ".join("?" * len(chunk))})',
+                    chunk,
+                ).fetchall()
+                for key, value in rows:
+                    found[key] = np.frombuffer(value, dtype=np.float32).copy()
+            if found:
+                self.conn.executemany(
+                    'UPDATE embeddings SET last_access = ? WHERE key = ?',
+                    [(time.time(), key) for key in found],
+                )
+                self.conn.commit()
+            results = [found.get(key) for key in keys]
+            self.hits += sum(result is not None for result in results)
+            self.misses += sum(result is None for result in results)
+        return results
+
+    def put_many(
+        self,
+        model_name: str,
+        texts: Sequence[str],
+        embeddings: Sequence[npt.ArrayLike],
+    ) -> None:
+        now = time.time()
+        rows = []
+        for text, embedding in zip(texts, embeddings, strict=True):
+            value = np.asarray(embedding, dtype=np.float32).tobytes()
+            rows.append(
+                (self.key(model_name, text), model_name, value, len(value), now)
+            )
+        with self.lock:
+            self.conn.executemany(
+                'INSERT INTO embeddings (key, model, value, size, last_access) '
+                'VALUES (?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET '
+                'model = excluded.model, value = excluded.value, '
+                'size = excluded.size, last_access = excluded.last_access',
+                rows,
+            )
+            self.evict()
+            self.conn.commit()
+
+    def evict(self) -> None:
+        (total,) = self.conn.execute(
+            "SELECT value FROM meta WHERE name = 'size'"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        for key, size in self.conn.execute(
+            'SELECT key, size FROM embeddings ORDER BY last_access'
+        ):
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        self.conn.executemany('DELETE FROM embeddings WHERE key = ?', evicted)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            (entries, total) = self.conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM embeddings'
+            ).fetchone()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': entries,
+            'bytes': total,
+        }
+
+
+_caches: Dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """
+    Return the cache configured by the ``EMBEDDING_CACHE_PATH`` environment
+    variable, or None if caching is disabled. ``EMBEDDING_CACHE_MAX_MB`` bounds
+    its size.
+    """
+    path = os.getenv('EMBEDDING_CACHE_PATH')
+    if not path:
+        return None
+    with _caches_lock:
+        if path not in _caches:
+            max_mb = float(os.getenv('EMBEDDING_CACHE_MAX_MB', EMBEDDING_CACHE_MAX_MB))
+            _caches[path] = EmbeddingCache(path, max_bytes=int(max_mb * 1024 * 1024))
+        return _caches[path]
+
+
+def cached_embed(
+    model_name: str,
+    texts: List[str],
+    embed_func: Callable[[List[str]], Union[npt.NDArray[Any], Sequence[npt.ArrayLike]]],
+) -> List[npt.NDArray[np.float32]]:
+    """
+    Embed texts with ``embed_func``, computing only the ones missing from the
+    embedding cache. Duplicate texts are embedded once.
+    """
+    cache = get_embedding_cache()
+    if cache is None:
+        return [np.asarray(e, dtype=np.float32) for e in embed_func(texts)]
+
+    embeddings = cache.get_many(model_name, texts)
+    missing = list(
+        dict.fromkeys(text for text, e in zip(texts, embeddings) if e is None)
+    )
+    computed: Dict[str, npt.NDArray[np.float32]] = {}
+    if missing:
+        computed = dict(
+            zip(missing, [np.asarray(e, dtype=np.float32) for e in embed_func(missing)])
+        )
+        cache.put_many(model_name, missing, list(computed.values()))
+    return [computed[text] if e is None else e for text, e in zip(texts, embeddings)]
@@ -1,8 +1,21 @@
+import asyncio
+import inspect
 import math
+import random
+import threading
 import time
+from collections import deque
 from functools import wraps
 
-from beartype.typing import Any, Callable, Optional, TypeVar, cast
+from beartype.roar import BeartypeException
+from beartype.typing import Any, Callable, Deque, Dict, Optional, Tuple, TypeVar, cast
+from litellm.exceptions import (
+    AuthenticationError,
+    BadRequestError,
+    NotFoundError,
+    PermissionDeniedError,
+    UnprocessableEntityError,
+)
 from pydantic import BaseModel
 
 INF = float(math.inf)
@@ -10,41 +23,294 @@ INF = float(math.inf)
 T = TypeVar('T', bound=Callable[..., Any])
 
 
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a provider whose circuit breaker is open."""
+
+
+# errors that fail the same way however often the call is repeated
+FATAL_ERRORS: Tuple[type, ...] = (
+    AuthenticationError,
+    PermissionDeniedError,
+    # includes context window exceeded and content policy violations
+    BadRequestError,
+    NotFoundError,
+    UnprocessableEntityError,
+    BeartypeException,
+    CircuitOpenError,
+)
+
+
+def is_retriable(error: BaseException) -> bool:
+    return isinstance(error, Exception) and not isinstance(error, FATAL_ERRORS)
+
+
+def decorrelated_jitter(
+    base_wait_time: float, previous_wait_time: float, max_wait_time: float
+) -> float:
+    """
+    Next wait of the "decorrelated jitter" backoff: uniformly random between
+    the base wait and three times the previous one, capped at the maximum.
+    Concurrent callers that failed together do not retry in lockstep.
+    """
+    upper = max(previous_wait_time, base_wait_time) * 3
+    return min(max_wait_time, random.uniform(base_wait_time, upper))
+
+
+class RetryBudget:
+    """
+    Limit the retries of all decorated calls of the process to a fraction of
+    the calls started in a sliding window, plus a small reserve. Once the
+    budget is spent, failures are raised at once instead of being retried, so
+    that an outage neither multiplies the load on the provider nor parks every
+    worker in backoff sleeps.
+    """
+
+    def __init__(
+        self, ratio: float = 0.2, min_retries: int = 10, window: float = 60.0
+    ) -> None:
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window = window
+        self.calls: Deque[float] = deque()
+        self.retries: Deque[float] = deque()
+        self.lock = threading.Lock()
+
+    def prune(self, now: float) -> None:
+        for timestamps in (self.calls, self.retries):
+            while timestamps and timestamps[0] < now - self.window:
+                timestamps.popleft()
+
+    def record_call(self) -> None:
+        with self.lock:
+            now = time.time()
+            self.prune(now)
+            self.calls.append(now)
+
+    def try_spend(self) -> bool:
+        with self.lock:
+            now = time.time()
+            self.prune(now)
+            if len(self.retries) >= self.min_retries + self.ratio * len(self.calls):
+                return False
+            self.retries.append(now)
+            return True
+
+
+class CircuitBreaker:
+    """
+    Stop calling a provider after ``failure_threshold`` consecutive retriable
+    failures. While open, calls fail with CircuitOpenError right away; after
+    ``reset_timeout`` seconds a single trial call is let through, and the
+    circuit closes again if it succeeds.
+    """
+
+    def __init__(
+        self, key: str, failure_threshold: int = 5, reset_timeout: float = 30.0
+    ) -> None:
+        self.key = key
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if self.trial_in_flight or (
+                time.time() - self.opened_at < self.reset_timeout
+            ):
+                return False
+            self.trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self.lock:
+            self.failures += 1
+            if self.trial_in_flight or self.failures >= self.failure_threshold:
+                self.opened_at = time.time()
+            self.trial_in_flight = False
+
+    def cancel_trial(self) -> None:
+        # a trial that was cancelled or interrupted tells nothing about the
+        # provider, so the next call after it becomes the trial instead
+        with self.lock:
+            self.trial_in_flight = False
+
+    def record(self, error: Optional[BaseException]) -> None:
+        # a fatal error is still an answer from a provider that is up
+        if error is not None and is_retriable(error):
+            self.record_failure()
+        else:
+            self.record_success()
+
+
+_retry_budget = RetryBudget()
+_circuit_breakers: Dict[str, CircuitBreaker] = {}
+_circuit_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(key: str) -> CircuitBreaker:
+    with _circuit_breakers_lock:
+        if key not in _circuit_breakers:
+            _circuit_breakers[key] = CircuitBreaker(key)
+        return _circuit_breakers[key]
+
+
 def api_calling_error_exponential_backoff(
-    retries: int = 5, base_wait_time: int = 1
+    retries: int = 5,
+    base_wait_time: int = 1,
+    max_wait_time: float = 16,
+    circuit_key: Optional[Callable[..., str]] = None,
+    retry_budget: Optional[RetryBudget] = None,
 ) -> Callable[[T], T]:
     """
-    Decorator for applying exponential backoff to a function.
-    :param retries: Maximum number of retries.
-    :param base_wait_time: Base wait time in seconds for the exponential backoff.
-    :return: The wrapped function with exponential backoff applied.
+    Decorator for retrying a function with decorrelated jitter backoff.
+    Fatal errors (authentication, bad requests such as an exceeded context
+    window) are raised at once; other errors are retried as long as attempts
+    and the process-wide retry budget remain, after which the last error is
+    raised. Coroutine functions back off with asyncio.sleep.
+    :param retries: Maximum number of attempts.
+    :param base_wait_time: Minimum wait time in seconds between attempts.
+    :param max_wait_time: Maximum wait time in seconds between attempts.
+    :param circuit_key: Maps the call arguments to the circuit breaker, e.g.
+        the provider, whose circuit is checked before every attempt.
+    :param retry_budget: Budget to draw retries from instead of the global one.
+    :return: The wrapped function with retry logic applied.
     """
 
     def decorator(func: T) -> T:
+        def retry_settings(kwargs: Dict[str, Any]) -> Tuple[int, int]:
+            if kwargs.get('mode', None) == 'TEST':
+                return 1, 1
+            return retries, base_wait_time
+
+        def start(
+            args: Tuple[Any, ...], kwargs: Dict[str, Any]
+        ) -> Tuple[RetryBudget, Optional[CircuitBreaker]]:
+            budget = retry_budget or _retry_budget
+            budget.record_call()
+            breaker = None
+            if circuit_key is not None:
+                breaker = get_circuit_breaker(circuit_key(*args, **kwargs))
+            return budget, breaker
+
+        def check_circuit(breaker: Optional[CircuitBreaker]) -> bool:
+            """Raise if the circuit is open, and tell whether the call is a trial."""
+            if breaker is None:
+                return False
+            if not breaker.allow():
+                raise CircuitOpenError(
+                    f"Circuit for '{breaker.key}' is open after repeated failures"
+                )
+            return breaker.opened_at is not None
+
+        def next_wait_time(
+            error: Exception,
+            attempts: int,
+            max_attempts: int,
+            wait_time: float,
+            min_wait_time: float,
+            budget: RetryBudget,
+            breaker: Optional[CircuitBreaker],
+        ) -> Optional[float]:
+            """Seconds to wait before the next attempt, or None to give up."""
+            if breaker is not None:
+                breaker.record(error)
+            if (
+                not is_retriable(error)
+                or attempts >= max_attempts
+                or not budget.try_spend()
+            ):
+                print(
+                    f"Failed to execute '{func.__name__}' "
+                    f'after {attempts} attempt(s): {error}'
+                )
+                return None
+            wait_time = decorrelated_jitter(min_wait_time, wait_time, max_wait_time)
+            print(f'Attempt {attempts} failed: {error}')
+            print(f'Waiting {wait_time:.1f} seconds before retrying...')
+            return wait_time
+
+        if inspect.iscoroutinefunction(func):
+
+            @wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                max_attempts, min_wait_time = retry_settings(kwargs)
+                budget, breaker = start(args, kwargs)
+                attempts = 0
+                wait_time = 0.0
+                while True:
+                    trial = check_circuit(breaker)
+                    try:
+                        result = await func(*args, **kwargs)
+                    except Exception as e:
+                        attempts += 1
+                        next_wait = next_wait_time(
+                            e,
+                            attempts,
+                            max_attempts,
+                            wait_time,
+                            min_wait_time,
+                            budget,
+                            breaker,
+                        )
+                        if next_wait is None:
+                            raise
+                        wait_time = next_wait
+                        await asyncio.sleep(wait_time)
+                    except BaseException:
+                        if breaker is not None and trial:
+                            breaker.cancel_trial()
+                        raise
+                    else:
+                        if breaker is not None:
+                            breaker.record(None)
+                        return result
+
+            return cast(T, async_wrapper)
+
         @wraps(func)
         def wrapper(*args: Any, **kwargs: Any) -> Any:
-            error_handler_mode = kwargs.get('mode', None)
-            if error_handler_mode == 'TEST':
-                modified_retries = 1
-                modified_base_wait_time = 1
-            else:
-                modified_retries = retries
-                modified_base_wait_time = base_wait_time
-
+            max_attempts, min_wait_time = retry_settings(kwargs)
+            budget, breaker = start(args, kwargs)
             attempts = 0
-            while attempts < modified_retries:
+            wait_time = 0.0
+            while True:
+                trial = check_circuit(breaker)
                 try:
-                    return func(*args, **kwargs)
+                    result = func(*args, **kwargs)
                 except Exception as e:
-                    wait_time = modified_base_wait_time * (2**attempts)
-                    print(f'Attempt {attempts + 1} failed: {e}')
-                    print(f'Waiting {wait_time} seconds before retrying...')
-                    time.sleep(wait_time)
                     attempts += 1
-            print(
-                f"Failed to execute '{func.__name__}' after {modified_retries} retries."
-            )
-            return None
+                    next_wait = next_wait_time(
+                        e,
+                        attempts,
+                        max_attempts,
+                        wait_time,
+                        min_wait_time,
+                        budget,
+                        breaker,
+                    )
+                    if next_wait is None:
+                        raise
+                    wait_time = next_wait
+                    time.sleep(wait_time)
+                except BaseException:
+                    if breaker is not None and trial:
+                        breaker.cancel_trial()
+                    raise
+                else:
+                    if breaker is not None:
+                        breaker.record(None)
+                    return result
 
         return cast(T, wrapper)
 
@@ -55,32 +321,41 @@ TBaseModel = TypeVar('TBaseModel', bound=Callable[..., BaseModel])
 
 
 def parsing_error_exponential_backoff(
-    retries: int = 5, base_wait_time: int = 1
+    retries: int = 5, base_wait_time: int = 1, max_wait_time: float = 16
 ) -> Callable[[TBaseModel], TBaseModel]:
     """
-    Decorator for retrying a function that returns a BaseModel with exponential backoff.
-    :param retries: Maximum number of retries.
-    :param base_wait_time: Base wait time in seconds for the exponential backoff.
+    Decorator for retrying a function that returns a BaseModel with decorrelated
+    jitter backoff, e.g. to prompt again for output that failed to parse.
+    Fatal errors and open circuits are raised at once, and the last error is
+    raised once all attempts failed.
+    :param retries: Maximum number of attempts.
+    :param base_wait_time: Minimum wait time in seconds between attempts.
+    :param max_wait_time: Maximum wait time in seconds between attempts.
     :return: The wrapped function with retry logic applied.
     """
 
     def decorator(func: TBaseModel) -> TBaseModel:
         @wraps(func)
-        def wrapper(self: Any, *args: Any, **kwargs: Any) -> Optional[BaseModel]:
+        def wrapper(self: Any, *args: Any, **kwargs: Any) -> BaseModel:
             attempts = 0
-            while attempts < retries:
+            wait_time = 0.0
+            while True:
                 try:
                     return func(self, *args, **kwargs)
                 except Exception as e:
-                    wait_time = base_wait_time * (2**attempts)
-                    print(f'Attempt {attempts + 1} failed: {e}')
-                    print(f'Waiting {wait_time} seconds before retrying...')
-                    time.sleep(wait_time)
                     attempts += 1
-            print(
-                f'Failed to get valid input from {func.__name__} after {retries} retries.'
-            )
-            return None
+                    if not is_retriable(e) or attempts >= retries:
+                        print(
+                            f'Failed to get valid input from {func.__name__} '
+                            f'after {attempts} attempt(s).'
+                        )
+                        raise
+                    wait_time = decorrelated_jitter(
+                        base_wait_time, wait_time, max_wait_time
+                    )
+                    print(f'Attempt {attempts} failed: {e}')
+                    print(f'Waiting {wait_time:.1f} seconds before retrying...')
+                    time.sleep(wait_time)
 
         return cast(TBaseModel, wrapper)
 
@@ -1,7 +1,7 @@
 from beartype import beartype
 from beartype.typing import Dict, List, Optional, Union
 
-from .model_prompting import model_prompting
+from .model_prompting import amodel_prompting, model_prompting
 from .prompt_constructor import openai_format_prompt_construct
 from .string_mapper import (
     map_idea_to_str,
@@ -16,6 +16,14 @@ from .string_mapper import (
 )
 
 
+def research_insight_quality_eval_messages(
+    insight: Dict[str, str],
+    prompt_template: Dict[str, Union[str, List[str]]],
+) -> List[Dict[str, str]]:
+    input_data = {'insight': map_insight_to_str(insight)}
+    return openai_format_prompt_construct(prompt_template, input_data)
+
+
 @beartype
 def research_insight_quality_eval_prompting(
     model_name: str,
@@ -26,10 +34,9 @@ def research_insight_quality_eval_prompting(
     temperature: Optional[float] = 0.0,
     top_p: Optional[float] = None,
     stream: Optional[bool] = None,
-) -> str:
-    input_data = {'insight': map_insight_to_str(insight)}
-    messages = openai_format_prompt_construct(prompt_template, input_data)
-    insight_eval = model_prompting(
+) -> List[str]:
+    messages = research_insight_quality_eval_messages(insight, prompt_template)
+    return model_prompting(
         model_name,
         messages,
         return_num=return_num,
@@ -37,28 +44,58 @@ def research_insight_quality_eval_prompting(
         temperature=temperature,
         top_p=top_p,
         stream=stream,
-    )[0]
-    return insight_eval
+    )
 
 
 @beartype
-def research_idea_quality_eval_prompting(
+async def aresearch_insight_quality_eval_prompting(
     model_name: str,
-    insights: List[Dict[str, str]],
-    idea: Dict[str, str],
+    insight: Dict[str, str],
     prompt_template: Dict[str, Union[str, List[str]]],
     return_num: Optional[int] = 1,
     max_token_num: Optional[int] = 512,
     temperature: Optional[float] = 0.0,
     top_p: Optional[float] = None,
     stream: Optional[bool] = None,
-) -> str:
+) -> List[str]:
+    messages = research_insight_quality_eval_messages(insight, prompt_template)
+    return await amodel_prompting(
+        model_name,
+        messages,
+        return_num=return_num,
+        max_token_num=max_token_num,
+        temperature=temperature,
+        top_p=top_p,
+        stream=stream,
+    )
+
+
+def research_idea_quality_eval_messages(
+    insights: List[Dict[str, str]],
+    idea: Dict[str, str],
+    prompt_template: Dict[str, Union[str, List[str]]],
+) -> List[Dict[str, str]]:
     input_data = {
         'idea': map_idea_to_str(idea),
         'insights': map_insight_list_to_str(insights),
     }
-    messages = openai_format_prompt_construct(prompt_template, input_data)
-    idea_eval = model_prompting(
+    return openai_format_prompt_construct(prompt_template, input_data)
+
+
+@beartype
+def research_idea_quality_eval_prompting(
+    model_name: str,
+    insights: List[Dict[str, str]],
+    idea: Dict[str, str],
+    prompt_template: Dict[str, Union[str, List[str]]],
+    return_num: Optional[int] = 1,
+    max_token_num: Optional[int] = 512,
+    temperature: Optional[float] = 0.0,
+    top_p: Optional[float] = None,
+    stream: Optional[bool] = None,
+) -> List[str]:
+    messages = research_idea_quality_eval_messages(insights, idea, prompt_template)
+    return model_prompting(
         model_name,
         messages,
         return_num=return_num,
@@ -66,30 +103,64 @@ def research_idea_quality_eval_prompting(
         temperature=temperature,
         top_p=top_p,
         stream=stream,
-    )[0]
-    return idea_eval
+    )
 
 
 @beartype
-def research_proposal_quality_eval_prompting(
+async def aresearch_idea_quality_eval_prompting(
     model_name: str,
     insights: List[Dict[str, str]],
     idea: Dict[str, str],
-    paper: Dict[str, str],
     prompt_template: Dict[str, Union[str, List[str]]],
     return_num: Optional[int] = 1,
     max_token_num: Optional[int] = 512,
     temperature: Optional[float] = 0.0,
     top_p: Optional[float] = None,
     stream: Optional[bool] = None,
-) -> str:
+) -> List[str]:
+    messages = research_idea_quality_eval_messages(insights, idea, prompt_template)
+    return await amodel_prompting(
+        model_name,
+        messages,
+        return_num=return_num,
+        max_token_num=max_token_num,
+        temperature=temperature,
+        top_p=top_p,
+        stream=stream,
+    )
+
+
+def research_proposal_quality_eval_messages(
+    insights: List[Dict[str, str]],
+    idea: Dict[str, str],
+    paper: Dict[str, str],
+    prompt_template: Dict[str, Union[str, List[str]]],
+) -> List[Dict[str, str]]:
     input_data = {
         'insights': map_insight_list_to_str(insights),
         'idea': map_idea_to_str(idea),
         'paper': map_paper_to_str(paper),
     }
-    messages = openai_format_prompt_construct(prompt_template, input_data)
-    paper_eval = model_prompting(
+    return openai_format_prompt_construct(prompt_template, input_data)
+
+
+@beartype
+def research_proposal_quality_eval_prompting(
+    model_name: str,
+    insights: List[Dict[str, str]],
+    idea: Dict[str, str],
+    paper: Dict[str, str],
+    prompt_template: Dict[str, Union[str, List[str]]],
+    return_num: Optional[int] = 1,
+    max_token_num: Optional[int] = 512,
+    temperature: Optional[float] = 0.0,
+    top_p: Optional[float] = None,
+    stream: Optional[bool] = None,
+) -> List[str]:
+    messages = research_proposal_quality_eval_messages(
+        insights, idea, paper, prompt_template
+    )
+    return model_prompting(
         model_name,
         messages,
         return_num=return_num,
@@ -97,31 +168,69 @@ def research_proposal_quality_eval_prompting(
         temperature=temperature,
         top_p=top_p,
         stream=stream,
-    )[0]
-    return paper_eval
+    )
 
 
-def research_review_quality_eval_prompting(
+@beartype
+async def aresearch_proposal_quality_eval_prompting(
     model_name: str,
     insights: List[Dict[str, str]],
     idea: Dict[str, str],
     paper: Dict[str, str],
-    review: Dict[str, Union[int, str]],
     prompt_template: Dict[str, Union[str, List[str]]],
     return_num: Optional[int] = 1,
     max_token_num: Optional[int] = 512,
     temperature: Optional[float] = 0.0,
     top_p: Optional[float] = None,
     stream: Optional[bool] = None,
-) -> str:
+) -> List[str]:
+    messages = research_proposal_quality_eval_messages(
+        insights, idea, paper, prompt_template
+    )
+    return await amodel_prompting(
+        model_name,
+        messages,
+        return_num=return_num,
+        max_token_num=max_token_num,
+        temperature=temperature,
+        top_p=top_p,
+        stream=stream,
+    )
+
+
+def research_review_quality_eval_messages(
+    insights: List[Dict[str, str]],
+    idea: Dict[str, str],
+    paper: Dict[str, str],
+    review: Dict[str, Union[int, str]],
+    prompt_template: Dict[str, Union[str, List[str]]],
+) -> List[Dict[str, str]]:
     input_data = {
         'idea': map_idea_to_str(idea),
         'insights': map_insight_list_to_str(insights),
         'paper': map_paper_to_str(paper),
         'review': map_review_to_str(review),
     }
-    messages = openai_format_prompt_construct(prompt_template, input_data)
-    review_eval = model_prompting(
+    return openai_format_prompt_construct(prompt_template, input_data)
+
+
+def research_review_quality_eval_prompting(
+    model_name: str,
+    insights: List[Dict[str, str]],
+    idea: Dict[str, str],
+    paper: Dict[str, str],
+    review: Dict[str, Union[int, str]],
+    prompt_template: Dict[str, Union[str, List[str]]],
+    return_num: Optional[int] = 1,
+    max_token_num: Optional[int] = 512,
+    temperature: Optional[float] = 0.0,
+    top_p: Optional[float] = None,
+    stream: Optional[bool] = None,
+) -> List[str]:
+    messages = research_review_quality_eval_messages(
+        insights, idea, paper, review, prompt_template
+    )
+    return model_prompting(
         model_name,
         messages,
         return_num=return_num,
@@ -129,24 +238,44 @@ def research_review_quality_eval_prompting(
         temperature=temperature,
         top_p=top_p,
         stream=stream,
-    )[0]
-    return review_eval
+    )
 
 
-def research_rebuttal_quality_eval_prompting(
+async def aresearch_review_quality_eval_prompting(
     model_name: str,
     insights: List[Dict[str, str]],
     idea: Dict[str, str],
     paper: Dict[str, str],
     review: Dict[str, Union[int, str]],
-    rebuttal: Dict[str, str],
     prompt_template: Dict[str, Union[str, List[str]]],
     return_num: Optional[int] = 1,
     max_token_num: Optional[int] = 512,
     temperature: Optional[float] = 0.0,
     top_p: Optional[float] = None,
     stream: Optional[bool] = None,
-) -> str:
+) -> List[str]:
+    messages = research_review_quality_eval_messages(
+        insights, idea, paper, review, prompt_template
+    )
+    return await amodel_prompting(
+        model_name,
+        messages,
+        return_num=return_num,
+        max_token_num=max_token_num,
+        temperature=temperature,
+        top_p=top_p,
+        stream=stream,
+    )
+
+
+def research_rebuttal_quality_eval_messages(
+    insights: List[Dict[str, str]],
+    idea: Dict[str, str],
+    paper: Dict[str, str],
+    review: Dict[str, Union[int, str]],
+    rebuttal: Dict[str, str],
+    prompt_template: Dict[str, Union[str, List[str]]],
+) -> List[Dict[str, str]]:
     input_data = {
         'idea': map_idea_to_str(idea),
         'insights': map_insight_list_to_str(insights),
@@ -154,8 +283,27 @@ def research_rebuttal_quality_eval_prompting(
         'review': map_review_to_str(review),
         'rebuttal': map_rebuttal_to_str(rebuttal),
     }
-    messages = openai_format_prompt_construct(prompt_template, input_data)
-    rebuttal_eval = model_prompting(
+    return openai_format_prompt_construct(prompt_template, input_data)
+
+
+def research_rebuttal_quality_eval_prompting(
+    model_name: str,
+    insights: List[Dict[str, str]],
+    idea: Dict[str, str],
+    paper: Dict[str, str],
+    review: Dict[str, Union[int, str]],
+    rebuttal: Dict[str, str],
+    prompt_template: Dict[str, Union[str, List[str]]],
+    return_num: Optional[int] = 1,
+    max_token_num: Optional[int] = 512,
+    temperature: Optional[float] = 0.0,
+    top_p: Optional[float] = None,
+    stream: Optional[bool] = None,
+) -> List[str]:
+    messages = research_rebuttal_quality_eval_messages(
+        insights, idea, paper, review, rebuttal, prompt_template
+    )
+    return model_prompting(
         model_name,
         messages,
         return_num=return_num,
@@ -163,25 +311,46 @@ def research_rebuttal_quality_eval_prompting(
         temperature=temperature,
         top_p=top_p,
         stream=stream,
-    )[0]
-    return rebuttal_eval
+    )
 
 
-def research_metareview_quality_eval_prompting(
+async def aresearch_rebuttal_quality_eval_prompting(
     model_name: str,
     insights: List[Dict[str, str]],
     idea: Dict[str, str],
     paper: Dict[str, str],
-    reviews: List[Dict[str, Union[int, str]]],
-    rebuttals: List[Dict[str, str]],
-    metareview: Dict[str, str],
+    review: Dict[str, Union[int, str]],
+    rebuttal: Dict[str, str],
     prompt_template: Dict[str, Union[str, List[str]]],
     return_num: Optional[int] = 1,
     max_token_num: Optional[int] = 512,
     temperature: Optional[float] = 0.0,
     top_p: Optional[float] = None,
     stream: Optional[bool] = None,
-) -> str:
+) -> List[str]:
+    messages = research_rebuttal_quality_eval_messages(
+        insights, idea, paper, review, rebuttal, prompt_template
+    )
+    return await amodel_prompting(
+        model_name,
+        messages,
+        return_num=return_num,
+        max_token_num=max_token_num,
+        temperature=temperature,
+        top_p=top_p,
+        stream=stream,
+    )
+
+
+def research_metareview_quality_eval_messages(
+    insights: List[Dict[str, str]],
+    idea: Dict[str, str],
+    paper: Dict[str, str],
+    reviews: List[Dict[str, Union[int, str]]],
+    rebuttals: List[Dict[str, str]],
+    metareview: Dict[str, str],
+    prompt_template: Dict[str, Union[str, List[str]]],
+) -> List[Dict[str, str]]:
     input_data = {
         'insights': map_insight_list_to_str(insights),
         'idea': map_idea_to_str(idea),
@@ -190,8 +359,57 @@ def research_metareview_quality_eval_prompting(
         'rebuttals': map_rebuttal_list_to_str(rebuttals),
         'metareview': map_metareview_to_str(metareview),
     }
-    messages = openai_format_prompt_construct(prompt_template, input_data)
-    metareview_eval = model_prompting(
+    return openai_format_prompt_construct(prompt_template, input_data)
+
+
+def research_metareview_quality_eval_prompting(
+    model_name: str,
+    insights: List[Dict[str, str]],
+    idea: Dict[str, str],
+    paper: Dict[str, str],
+    reviews: List[Dict[str, Union[int, str]]],
+    rebuttals: List[Dict[str, str]],
+    metareview: Dict[str, str],
+    prompt_template: Dict[str, Union[str, List[str]]],
+    return_num: Optional[int] = 1,
+    max_token_num: Optional[int] = 512,
+    temperature: Optional[float] = 0.0,
+    top_p: Optional[float] = None,
+    stream: Optional[bool] = None,
+) -> List[str]:
+    messages = research_metareview_quality_eval_messages(
+        insights, idea, paper, reviews, rebuttals, metareview, prompt_template
+    )
+    return model_prompting(
+        model_name,
+        messages,
+        return_num=return_num,
+        max_token_num=max_token_num,
+        temperature=temperature,
+        top_p=top_p,
+        stream=stream,
+    )
+
+
+async def aresearch_metareview_quality_eval_prompting(
+    model_name: str,
+    insights: List[Dict[str, str]],
+    idea: Dict[str, str],
+    paper: Dict[str, str],
+    reviews: List[Dict[str, Union[int, str]]],
+    rebuttals: List[Dict[str, str]],
+    metareview: Dict[str, str],
+    prompt_template: Dict[str, Union[str, List[str]]],
+    return_num: Optional[int] = 1,
+    max_token_num: Optional[int] = 512,
+    temperature: Optional[float] = 0.0,
+    top_p: Optional[float] = None,
+    stream: Optional[bool] = None,
+) -> List[str]:
+    messages = research_metareview_quality_eval_messages(
+        insights, idea, paper, reviews, rebuttals, metareview, prompt_template
+    )
+    return await amodel_prompting(
         model_name,
         messages,
         return_num=return_num,
@@ -199,5 +417,4 @@ def research_metareview_quality_eval_prompting(
         temperature=temperature,
         top_p=top_p,
         stream=stream,
-    )[0]
-    return metareview_eval
+    )
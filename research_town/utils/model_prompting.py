@@ -1,12 +1,210 @@
+import asyncio
+import contextvars
+import threading
+import time
+import uuid
+import weakref
+from contextlib import contextmanager
+
 import litellm
 from beartype import beartype
-from beartype.typing import Dict, List, Optional
+from beartype.typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+)
 
+from .concurrency import FairSemaphore
 from .error_handler import api_calling_error_exponential_backoff
+from .rate_limiter import RateLimitTicket, arate_limited, rate_limited
+from .response_cache import (
+    aresponse_flight,
+    cacheable_request,
+    lookup_response,
+    request_key,
+    response_flight,
+    store_response,
+)
+from .single_flight import asingle_flight, single_flight
+from .usage_tracker import get_usage_scope, record_llm_call
+
+DEFAULT_MAX_CONCURRENCY = 16
+
+_max_concurrency: Dict[str, int] = {}
+# semaphores are bound to the event loop they are first used in, and are
+# dropped with it
+_semaphores: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]
+] = weakref.WeakKeyDictionary()
+_semaphores_lock = threading.Lock()
+_fair_semaphores: Dict[str, FairSemaphore] = {}
+
+_token_callback: contextvars.ContextVar[Optional[Callable[[str, str], None]]] = (
+    contextvars.ContextVar('token_callback', default=None)
+)
+
+
+def set_max_concurrency(llm_model: str, limit: int) -> None:
+    """
+    Bound the number of requests to a model that ``amodel_prompting`` keeps in
+    flight per event loop, applying to semaphores created after the call, and
+    that ``model_prompting`` keeps in flight per process. Waiting
+    ``model_prompting`` requests are served round-robin across the projects
+    of their usage scopes; they are not bounded until a limit is set.
+    """
+    if limit < 1:
+        raise ValueError('Concurrency limit must be at least 1')
+    _max_concurrency[llm_model] = limit
+    with _semaphores_lock:
+        _fair_semaphores[llm_model] = FairSemaphore(limit)
+
+
+def get_model_semaphore(llm_model: str) -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    with _semaphores_lock:
+        # a semaphore that was waited on refers to its loop, which keeps the
+        # loop alive, so closed loops are dropped here
+        for closed in [other for other in _semaphores if other.is_closed()]:
+            del _semaphores[closed]
+        semaphores = _semaphores.setdefault(loop, {})
+        if llm_model not in semaphores:
+            semaphores[llm_model] = asyncio.Semaphore(
+                _max_concurrency.get(llm_model, DEFAULT_MAX_CONCURRENCY)
+            )
+        return semaphores[llm_model]
+
+
+@contextmanager
+def fair_share(llm_model: str) -> Iterator[None]:
+    with _semaphores_lock:
+        semaphore = _fair_semaphores.get(llm_model)
+    if semaphore is None:
+        yield
+        return
+    with semaphore.acquire(get_usage_scope().get('project_name') or ''):
+        yield
+
+
+def llm_provider(llm_model: str, *args: Any, **kwargs: Any) -> str:
+    """The provider serving a model, whose models share a circuit breaker."""
+    try:
+        return str(litellm.get_llm_provider(llm_model)[1])
+    except Exception:
+        return llm_model.split('/')[0]
+
+
+@contextmanager
+def stream_tokens(callback: Callable[[str, str], None]) -> Iterator[None]:
+    """
+    Call ``callback`` with the id of the completion and every content delta of
+    the streamed (``stream=True``) completions requested inside the block, as
+    soon as it arrives, and with an empty delta once the completion is done.
+    Completions requested concurrently are told apart by their ids. Only the
+    deltas of the first choice are reported.
+    """
+    token = _token_callback.set(callback)
+    try:
+        yield
+    finally:
+        _token_callback.reset(token)
+
+
+def add_stream_chunk(contents: List[List[str]], chunk: Any, stream_id: str) -> None:
+    callback = _token_callback.get()
+    for choice in chunk.choices:
+        delta = choice.delta.content
+        if not delta:
+            continue
+        index = choice.index or 0
+        while len(contents) <= index:
+            contents.append([])
+        contents[index].append(delta)
+        if index == 0 and callback is not None:
+            callback(stream_id, delta)
+
+
+def end_stream(
+    llm_model: str,
+    contents: List[List[str]],
+    stream_id: str,
+    ticket: Optional[RateLimitTicket],
+) -> List[str]:
+    callback = _token_callback.get()
+    if callback is not None:
+        callback(stream_id, '')
+    content_l = [''.join(parts) for parts in contents]
+    if ticket is not None:
+        ticket.record_stream(llm_model, content_l)
+    return content_l
+
+
+def collect_stream(
+    llm_model: str, chunks: Iterable[Any], ticket: Optional[RateLimitTicket]
+) -> List[str]:
+    stream_id = uuid.uuid4().hex
+    contents: List[List[str]] = []
+    try:
+        for chunk in chunks:
+            add_stream_chunk(contents, chunk, stream_id)
+    finally:
+        # the reservation is settled with the tokens received, also when the
+        # stream breaks off
+        content_l = end_stream(llm_model, contents, stream_id, ticket)
+    return content_l
+
+
+def complete(
+    llm_model: str,
+    messages: List[Dict[str, str]],
+    request: Optional[Dict[str, Any]],
+    return_num: Optional[int],
+    max_token_num: Optional[int],
+    temperature: Optional[float],
+    top_p: Optional[float],
+    stream: Optional[bool],
+) -> List[str]:
+    with response_flight(llm_model, request) as waited:
+        if waited:
+            # another process has just requested the same response
+            cached = lookup_response(llm_model, request)
+            if cached is not None:
+                record_llm_call(llm_model, messages, cached, None, 0.0, cached=True)
+                return cached
+        max_output_tokens = (max_token_num or 0) * (return_num or 1)
+        with (
+            fair_share(llm_model),
+            rate_limited(llm_model, messages, max_output_tokens) as ticket,
+        ):
+            start = time.time()
+            completion = litellm.completion(
+                model=llm_model,
+                messages=messages,
+                max_tokens=max_token_num,
+                n=return_num,
+                top_p=top_p,
+                temperature=temperature,
+                stream=stream,
+            )
+            if stream:
+                content_l = collect_stream(llm_model, completion, ticket)
+            else:
+                if ticket is not None:
+                    ticket.record_usage(completion)
+                content_l = [choice.message.content for choice in completion.choices]
+            latency = time.time() - start
+        record_llm_call(llm_model, messages, content_l, completion, latency)
+        store_response(llm_model, request, content_l)
+    return content_l
 
 
 @beartype
-@api_calling_error_exponential_backoff(retries=5, base_wait_time=1)
+@api_calling_error_exponential_backoff(
+    retries=5, base_wait_time=1, circuit_key=llm_provider
+)
 def model_prompting(
     llm_model: str,
     messages: List[Dict[str, str]],
@@ -18,17 +216,128 @@ def model_prompting(
     mode: Optional[str] = None,
 ) -> List[str]:
     """
-    Select model via router in LiteLLM.
+    Select model via router in LiteLLM and return the content of all
+    ``return_num`` choices, which share a single prompt. Deterministic requests
+    are answered from the response cache when one is configured, and requests
+    to rate limited models wait for their share of the limit. Identical
+    deterministic requests in flight at the same time share a single call, also
+    across processes when the response cache is enabled. Streamed completions
+    are reassembled, reporting their deltas to ``stream_tokens``.
+    Every call is metered by the active ``track_usage`` trackers.
     """
-    completion = litellm.completion(
-        model=llm_model,
-        messages=messages,
-        max_tokens=max_token_num,
-        n=return_num,
-        top_p=top_p,
-        temperature=temperature,
-        stream=stream,
+    request = cacheable_request(
+        messages, return_num, max_token_num, temperature, top_p, stream
+    )
+    cached = lookup_response(llm_model, request)
+    if cached is not None:
+        record_llm_call(llm_model, messages, cached, None, 0.0, cached=True)
+        return cached
+    content_l, shared = single_flight(
+        request_key(llm_model, request),
+        lambda: complete(
+            llm_model,
+            messages,
+            request,
+            return_num,
+            max_token_num,
+            temperature,
+            top_p,
+            stream,
+        ),
     )
-    content = completion.choices[0].message.content
-    content_l = [content]
+    if shared:
+        record_llm_call(llm_model, messages, content_l, None, 0.0, cached=True)
+    return list(content_l)
+
+
+async def acomplete(
+    llm_model: str,
+    messages: List[Dict[str, str]],
+    request: Optional[Dict[str, Any]],
+    return_num: Optional[int],
+    max_token_num: Optional[int],
+    temperature: Optional[float],
+    top_p: Optional[float],
+    stream: Optional[bool],
+) -> List[str]:
+    async with aresponse_flight(llm_model, request) as waited:
+        if waited:
+            cached = lookup_response(llm_model, request)
+            if cached is not None:
+                record_llm_call(llm_model, messages, cached, None, 0.0, cached=True)
+                return cached
+        max_output_tokens = (max_token_num or 0) * (return_num or 1)
+        async with (
+            get_model_semaphore(llm_model),
+            arate_limited(llm_model, messages, max_output_tokens) as ticket,
+        ):
+            start = time.time()
+            completion = await litellm.acompletion(
+                model=llm_model,
+                messages=messages,
+                max_tokens=max_token_num,
+                n=return_num,
+                top_p=top_p,
+                temperature=temperature,
+                stream=stream,
+            )
+            if stream:
+                stream_id = uuid.uuid4().hex
+                contents: List[List[str]] = []
+                try:
+                    async for chunk in completion:
+                        add_stream_chunk(contents, chunk, stream_id)
+                finally:
+                    content_l = end_stream(llm_model, contents, stream_id, ticket)
+            else:
+                if ticket is not None:
+                    ticket.record_usage(completion)
+                content_l = [choice.message.content for choice in completion.choices]
+            latency = time.time() - start
+        record_llm_call(llm_model, messages, content_l, completion, latency)
+        store_response(llm_model, request, content_l)
     return content_l
+
+
+@beartype
+@api_calling_error_exponential_backoff(
+    retries=5, base_wait_time=1, circuit_key=llm_provider
+)
+async def amodel_prompting(
+    llm_model: str,
+    messages: List[Dict[str, str]],
+    return_num: Optional[int] = 1,
+    max_token_num: Optional[int] = 512,
+    temperature: Optional[float] = 0.0,
+    top_p: Optional[float] = None,
+    stream: Optional[bool] = None,
+    mode: Optional[str] = None,
+) -> List[str]:
+    """
+    Asynchronous model_prompting. Requests to the same model share a semaphore
+    limiting how many of them are in flight at once, and identical
+    deterministic requests of the tasks of one event loop share a single call.
+    """
+    request = cacheable_request(
+        messages, return_num, max_token_num, temperature, top_p, stream
+    )
+    cached = lookup_response(llm_model, request)
+    if cached is not None:
+        record_llm_call(llm_model, messages, cached, None, 0.0, cached=True)
+        return cached
+    content_l, shared = await asingle_flight(
+        request_key(llm_model, request),
+        lambda: acomplete(
+            llm_model,
+            messages,
+            request,
+            return_num,
+            max_token_num,
+            temperature,
+            top_p,
+            stream,
+        ),
+    )
+    if shared:
+        record_llm_call(llm_model, messages, content_l, None, 0.0, cached=True)
+    return list(content_l)
@@ -1,17 +1,28 @@
+import functools
 import re
 import time
 from io import BytesIO
 
 import arxiv
 import requests
-from beartype.typing import Any, Dict, List, Optional, Set
+from beartype.typing import TYPE_CHECKING, Any, Dict, List, Optional, Set
 from bs4 import BeautifulSoup
-from keybert import KeyBERT
 from PyPDF2 import PdfReader
 from tqdm import tqdm
 
 from ..data.data import Paper
 
+if TYPE_CHECKING:
+    from keybert import KeyBERT
+
+
+@functools.lru_cache(maxsize=None)
+def get_keyword_model() -> 'KeyBERT':
+    # keybert pulls in sentence-transformers, so load it on first use only
+    from keybert import KeyBERT
+
+    return KeyBERT()
+
 
 def perform_arxiv_search(
     search: arxiv.Search,
@@ -45,7 +56,7 @@ def get_related_papers(
     keyword = ''
 
     if query is not None:
-        kw_model = KeyBERT()
+        kw_model = get_keyword_model()
         extraction_results = kw_model.extract_keywords(
             query, keyphrase_ngram_range=(1, 3), stop_words='english'
         )
@@ -1,27 +1,55 @@
-from typing import Any, Dict, List, Union
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple, Union
 
+PromptTemplate = Dict[str, Union[str, List[str]]]
+
+
+class CompiledPromptTemplate:
+    """
+    A prompt template turned into the messages it always starts with, the
+    system prompt and few-shot examples, and the user message template that
+    follows them. The prefix is built once and shared by every prompt of the
+    template, so only the user message is formatted per call, and prompts of
+    the same template start with identical messages that providers can serve
+    from their prompt caches.
+    """
+
+    def __init__(self, prefix: Tuple[Tuple[str, str], ...], template: str) -> None:
+        self.prefix = prefix
+        self.template = template
+
+    def format(self, input_data: Dict[str, Any]) -> List[Dict[str, str]]:
+        messages = [{'role': role, 'content': content} for role, content in self.prefix]
+        messages.append({'role': 'user', 'content': self.template.format(**input_data)})
+        return messages
 
-def openai_format_prompt_construct(
-    template: Dict[str, Union[str, List[str]]], input_data: Dict[str, Any]
-) -> List[Dict[str, str]]:
-    messages = []
-    if 'sys_prompt' in template:
-        sys_prompt = template['sys_prompt']
-        assert isinstance(sys_prompt, str)
-        messages.append({'role': 'system', 'content': sys_prompt})
-
-    if 'fewshot_examples' in template:
-        examples = template['fewshot_examples']
-        assert len(examples) % 2 == 0
-        for i, example in enumerate(examples):
-            if i % 2 == 0:
-                messages.append({'role': 'user', 'content': example})
-            else:
-                messages.append({'role': 'assistant', 'content': example})
 
+@lru_cache(maxsize=256)
+def compile_prompt_parts(
+    sys_prompt: Optional[str], fewshot_examples: Tuple[str, ...], template: str
+) -> CompiledPromptTemplate:
+    prefix: List[Tuple[str, str]] = []
+    if sys_prompt is not None:
+        prefix.append(('system', sys_prompt))
+    assert len(fewshot_examples) % 2 == 0
+    for i, example in enumerate(fewshot_examples):
+        prefix.append(('user' if i % 2 == 0 else 'assistant', example))
+    return CompiledPromptTemplate(tuple(prefix), template)
+
+
+def compile_prompt_template(template: PromptTemplate) -> CompiledPromptTemplate:
+    """Compile a template, or return it from the cache if it was compiled before."""
+    sys_prompt = template.get('sys_prompt')
+    assert sys_prompt is None or isinstance(sys_prompt, str)
+    fewshot_examples = template.get('fewshot_examples', [])
+    assert isinstance(fewshot_examples, list)
     assert isinstance(template['template'], str)
-    query = template['template'].format(**input_data)
-    assert isinstance(query, str)
-    messages.append({'role': 'user', 'content': query})
+    return compile_prompt_parts(
+        sys_prompt, tuple(fewshot_examples), template['template']
+    )
+
 
-    return messages
+def openai_format_prompt_construct(
+    template: PromptTemplate, input_data: Dict[str, Any]
+) -> List[Dict[str, str]]:
+    return compile_prompt_template(template).format(input_data)
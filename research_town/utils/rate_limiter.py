@@ -0,0 +1,328 @@
+import asyncio
+import functools
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from beartype.typing import (
+    IO,
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+from litellm.exceptions import RateLimitError
+from litellm.utils import token_counter
+from pydantic import BaseModel
+
+try:
+    import fcntl
+except ImportError:
+    # not available on Windows, where buckets are only shared within a process
+    fcntl = None  # type: ignore[assignment]
+
+POLL_INTERVAL = 0.05
+
+_process_locks: Dict[str, threading.Lock] = {}
+_process_locks_lock = threading.Lock()
+
+
+class RateLimit(BaseModel):
+    requests_per_minute: Optional[float] = None
+    tokens_per_minute: Optional[float] = None
+    max_concurrency: int = 16
+
+
+_rate_limits: Dict[str, RateLimit] = {}
+
+
+def set_rate_limit(key: str, rate_limit: Optional[RateLimit]) -> None:
+    """
+    Limit the requests to a litellm model, or to every model of a provider when
+    ``key`` is a provider prefix such as ``together_ai``. Limits can also be
+    given as JSON through the ``LLM_RATE_LIMITS`` environment variable, e.g.
+    ``{"gpt-4o-mini": {"requests_per_minute": 500}}``.
+    """
+    if rate_limit is None:
+        _rate_limits.pop(key, None)
+    else:
+        _rate_limits[key] = rate_limit
+
+
+def get_rate_limit(llm_model: str) -> Optional[Tuple[str, RateLimit]]:
+    """The bucket key and limit governing a model, if it is rate limited."""
+    rate_limits = dict(_rate_limits)
+    env_limits = os.getenv('LLM_RATE_LIMITS')
+    if env_limits:
+        for key, value in json.loads(env_limits).items():
+            rate_limits.setdefault(key, RateLimit(**value))
+    for key in (llm_model, llm_model.split('/')[0]):
+        if key in rate_limits:
+            return key, rate_limits[key]
+    return None
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute token buckets shared by every
+    process on the machine, plus an AIMD concurrency window.
+
+    The state of a bucket lives in a small JSON file in ``LLM_RATE_LIMIT_DIR``
+    (a temp directory by default) and is only read and written under an
+    exclusive ``flock``, so all worker processes draw from the same budget;
+    where ``flock`` is not available, only the threads of a process do.
+    A request reserves its prompt tokens plus ``max_tokens`` up front and the
+    unused part is refunded once the actual usage is known. The window of
+    requests allowed in flight grows by one per window of successes and is
+    halved on every rate limit error, which also empties the request bucket so
+    that every process pauses instead of retrying into the same limit.
+    """
+
+    def __init__(self, key: str, rate_limit: RateLimit) -> None:
+        folder_path = os.getenv(
+            'LLM_RATE_LIMIT_DIR',
+            os.path.join(tempfile.gettempdir(), 'research_town_rate_limits'),
+        )
+        os.makedirs(folder_path, exist_ok=True)
+        file_name = re.sub(r'[^\w.-]', '_', key)
+        if fcntl is None:
+            # unlocked, the file could not be shared safely with other processes
+            file_name = f'{file_name}.{os.getpid()}'
+        self.path = os.path.join(folder_path, f'{file_name}.json')
+        self.rate_limit = rate_limit
+
+    @contextmanager
+    def exclusive(self, f: IO[str]) -> Iterator[None]:
+        if fcntl is None:
+            with _process_locks_lock:
+                lock = _process_locks.setdefault(self.path, threading.Lock())
+            with lock:
+                yield
+            return
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+    @contextmanager
+    def locked_state(self) -> Iterator[Dict[str, Any]]:
+        with open(self.path, 'a+', encoding='utf-8') as f, self.exclusive(f):
+            f.seek(0)
+            content = f.read()
+            state = json.loads(content) if content else self.initial_state()
+            self.refill(state)
+            yield state
+            f.seek(0)
+            f.truncate()
+            json.dump(state, f)
+            f.flush()
+
+    def initial_state(self) -> Dict[str, Any]:
+        return {
+            'requests': self.rate_limit.requests_per_minute,
+            'tokens': self.rate_limit.tokens_per_minute,
+            'window': float(self.rate_limit.max_concurrency),
+            'in_flight': {},
+            'updated': time.time(),
+        }
+
+    def refill(self, state: Dict[str, Any]) -> None:
+        now = time.time()
+        elapsed = max(now - state['updated'], 0.0)
+        state['updated'] = now
+        for field, per_minute in (
+            ('requests', self.rate_limit.requests_per_minute),
+            ('tokens', self.rate_limit.tokens_per_minute),
+        ):
+            if per_minute is None:
+                state[field] = None
+            else:
+                level = per_minute if state[field] is None else state[field]
+                state[field] = min(per_minute, level + elapsed * per_minute / 60)
+        # forget the requests of processes that died without releasing them
+        state['in_flight'] = {
+            pid: count
+            for pid, count in state['in_flight'].items()
+            if count > 0 and pid_alive(int(pid))
+        }
+
+    def try_acquire(self, cost: int) -> float:
+        """Reserve a slot and ``cost`` tokens, or return how long to wait."""
+        with self.locked_state() as state:
+            if sum(state['in_flight'].values()) >= max(int(state['window']), 1):
+                return POLL_INTERVAL
+            wait = 0.0
+            rpm = self.rate_limit.requests_per_minute
+            if rpm is not None and state['requests'] < 1:
+                wait = max(wait, (1 - state['requests']) * 60 / rpm)
+            tpm = self.rate_limit.tokens_per_minute
+            if tpm is not None:
+                if state['tokens'] < cost:
+                    wait = max(wait, (cost - state['tokens']) * 60 / tpm)
+            if wait > 0:
+                return max(wait, POLL_INTERVAL)
+            if rpm is not None:
+                state['requests'] -= 1
+            if tpm is not None:
+                state['tokens'] -= cost
+            pid = str(os.getpid())
+            state['in_flight'][pid] = state['in_flight'].get(pid, 0) + 1
+            return 0.0
+
+    def release(
+        self, reserved: int, used: Optional[int], error: Optional[BaseException]
+    ) -> None:
+        with self.locked_state() as state:
+            pid = str(os.getpid())
+            state['in_flight'][pid] = state['in_flight'].get(pid, 1) - 1
+            if state['tokens'] is not None and used is not None:
+                state['tokens'] = min(
+                    self.rate_limit.tokens_per_minute,
+                    state['tokens'] + max(reserved - used, 0),
+                )
+            if isinstance(error, RateLimitError):
+                state['window'] = max(state['window'] / 2, 1.0)
+                if state['requests'] is not None:
+                    state['requests'] = 0.0
+            elif error is None:
+                state['window'] = min(
+                    state['window'] + 1 / state['window'],
+                    float(self.rate_limit.max_concurrency),
+                )
+
+    def acquire(self, cost: int) -> None:
+        while True:
+            wait = self.try_acquire(cost)
+            if wait == 0:
+                return
+            time.sleep(wait)
+
+    async def aacquire(self, cost: int) -> None:
+        # the bucket file is locked in a worker thread, off the event loop
+        while True:
+            attempt = asyncio.ensure_future(asyncio.to_thread(self.try_acquire, cost))
+            try:
+                wait = await asyncio.shield(attempt)
+            except asyncio.CancelledError as e:
+                # hand back a slot the attempt reserves after the caller gave up
+                attempt.add_done_callback(
+                    functools.partial(self.release_abandoned, cost, error=e)
+                )
+                raise
+            if wait == 0:
+                return
+            await asyncio.sleep(wait)
+
+    def release_abandoned(
+        self, cost: int, attempt: 'asyncio.Future[float]', *, error: BaseException
+    ) -> None:
+        if (
+            not attempt.cancelled()
+            and attempt.exception() is None
+            and attempt.result() == 0
+        ):
+            self.release(cost, None, error)
+
+    async def arelease(
+        self, reserved: int, used: Optional[int], error: Optional[BaseException]
+    ) -> None:
+        # shielded, so that a cancelled caller still releases its slot
+        await asyncio.shield(asyncio.to_thread(self.release, reserved, used, error))
+
+
+def pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class RateLimitTicket:
+    """Handed to the caller to report the tokens the request actually used."""
+
+    def __init__(self, reserved: int, prompt_tokens: Optional[int] = None) -> None:
+        self.reserved = reserved
+        # counted for the reservation when the model's tokens are limited
+        self.prompt_tokens = prompt_tokens
+        self.used: Optional[int] = None
+
+    def record_usage(self, completion: Any) -> None:
+        usage = getattr(completion, 'usage', None)
+        total_tokens = getattr(usage, 'total_tokens', None)
+        if isinstance(total_tokens, int):
+            self.used = total_tokens
+
+    def record_stream(self, llm_model: str, outputs: List[str]) -> None:
+        """Count the tokens of a streamed completion, which comes without usage."""
+        if self.prompt_tokens is None:
+            return
+        self.used = self.prompt_tokens + sum(
+            token_counter(model=llm_model, text=output) for output in outputs if output
+        )
+
+
+def get_rate_limiter(
+    llm_model: str, messages: List[Dict[str, str]], max_output_tokens: int
+) -> Optional[Tuple[RateLimiter, RateLimitTicket]]:
+    limit = get_rate_limit(llm_model)
+    if limit is None:
+        return None
+    cost = 1
+    prompt_tokens = None
+    tokens_per_minute = limit[1].tokens_per_minute
+    if tokens_per_minute is not None:
+        prompt_tokens = token_counter(model=llm_model, messages=messages)
+        # a request larger than the whole budget waits for a full bucket
+        cost = min(prompt_tokens + max_output_tokens, int(tokens_per_minute))
+    return RateLimiter(*limit), RateLimitTicket(cost, prompt_tokens)
+
+
+@contextmanager
+def rate_limited(
+    llm_model: str, messages: List[Dict[str, str]], max_output_tokens: int
+) -> Iterator[Optional[RateLimitTicket]]:
+    """Wait for the model's rate limit, if any, before running the block."""
+    limiter = get_rate_limiter(llm_model, messages, max_output_tokens)
+    if limiter is None:
+        yield None
+        return
+    rate_limiter, ticket = limiter
+    rate_limiter.acquire(ticket.reserved)
+    try:
+        yield ticket
+    except BaseException as e:
+        rate_limiter.release(ticket.reserved, ticket.used, e)
+        raise
+    rate_limiter.release(ticket.reserved, ticket.used, None)
+
+
+@asynccontextmanager
+async def arate_limited(
+    llm_model: str, messages: List[Dict[str, str]], max_output_tokens: int
+) -> AsyncIterator[Optional[RateLimitTicket]]:
+    """Asynchronous rate_limited, waiting without blocking the event loop."""
+    limiter = get_rate_limiter(llm_model, messages, max_output_tokens)
+    if limiter is None:
+        yield None
+        return
+    rate_limiter, ticket = limiter
+    await rate_limiter.aacquire(ticket.reserved)
+    try:
+        yield ticket
+    except BaseException as e:
+        await rate_limiter.arelease(ticket.reserved, ticket.used, e)
+        raise
+    await rate_limiter.arelease(ticket.reserved, ticket.used, None)
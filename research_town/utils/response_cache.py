@@ -0,0 +1,354 @@
+import asyncio
+import contextvars
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from beartype.typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from .rate_limiter import pid_alive
+
+LLM_CACHE_MAX_MB = 512
+LLM_CACHE_NAMESPACE = 'default'
+FLIGHT_POLL_INTERVAL = 0.1
+
+_namespace: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    'response_cache_namespace', default=None
+)
+
+
+class ResponseCache:
+    """
+    Persistent cache of LLM completions in a sqlite file.
+
+    Keys are the sha256 of the namespace, the model and every request parameter
+    that determines the response (messages, max_tokens, temperature, top_p and
+    n); values the JSON list of returned contents. Namespaces tag the entries
+    of one experiment so that they can be reported on and cleared together; hit
+    and miss counts are kept per namespace in the file as well, so that they
+    add up across the worker processes of a run.
+    Every hit refreshes the entry's access time, and once the stored responses
+    exceed ``max_bytes`` the least recently used entries are evicted; triggers
+    keep their total size in the ``meta`` table for that.
+    The ``flights`` table records which process is currently requesting the
+    response of a key, so that the other processes of a run wait for it to be
+    cached instead of requesting it again.
+    """
+
+    def __init__(self, path: str, max_bytes: int) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            'key TEXT PRIMARY KEY, namespace TEXT, model TEXT, value TEXT, '
+            'size INTEGER, last_access REAL)'
+        )
+        self.conn.execute(
+            'CREATE INDEX IF NOT EXISTS responses_last_access '
+            'ON responses (last_access)'
+        )
+        self.conn.execute(
+            'CREATE INDEX IF NOT EXISTS responses_namespace ON responses (namespace)'
+        )
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS counters ('
+            'namespace TEXT PRIMARY KEY, hits INTEGER, misses INTEGER)'
+        )
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS flights (key TEXT PRIMARY KEY, pid INTEGER)'
+        )
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)'
+            )
+            # files written before the total was kept are summed up once
+            self.conn.execute(
+                'INSERT OR IGNORE INTO meta (name, value) '
+                "SELECT 'size', COALESCE(SUM(size), 0) FROM responses"
+            )
+            for name, event, change in [
+                ('insert', 'INSERT', 'new.size'),
+                ('update', 'UPDATE OF size', 'new.size - old.size'),
+                ('delete', 'DELETE', '-old.size'),
+            ]:
+                self.conn.execute(
+                    f'CREATE TRIGGER IF NOT EXISTS responses_{name} '
+                    f'AFTER {event} ON responses BEGIN UPDATE meta '
+                    f"SET value = value + {change} WHERE name = 'size'; END"
+                )
+        finally:
+            self.conn.commit()
+
+    @staticmethod
+    def key(namespace: str, model_name: str, request: Dict[str, Any]) -> str:
+        payload = json.dumps(
+            {'namespace': namespace, 'model': model_name, 'request': request},
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(
+        self, namespace: str, model_name: str, request: Dict[str, Any]
+    ) -> Optional[List[str]]:
+        key = self.key(namespace, model_name, request)
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT value FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+            if row is not None:
+                self.conn.execute(
+                    'UPDATE responses SET last_access = ? WHERE key = ?',
+                    (time.time(), key),
+                )
+            self.conn.execute(
+                'INSERT INTO counters (namespace, hits, misses) VALUES (?, ?, ?) '
+                'ON CONFLICT (namespace) DO UPDATE SET '
+                'hits = hits + excluded.hits, misses = misses + excluded.misses',
+                (namespace, int(row is not None), int(row is None)),
+            )
+            self.conn.commit()
+        if row is None:
+            return None
+        response: List[str] = json.loads(row[0])
+        return response
+
+    def put(
+        self,
+        namespace: str,
+        model_name: str,
+        request: Dict[str, Any],
+        response: List[str],
+    ) -> None:
+        value = json.dumps(response)
+        with self.lock:
+            self.conn.execute(
+                'INSERT INTO responses '
+                '(key, namespace, model, value, size, last_access) '
+                'VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET '
+                'namespace = excluded.namespace, model = excluded.model, '
+                'value = excluded.value, size = excluded.size, '
+                'last_access = excluded.last_access',
+                (
+                    self.key(namespace, model_name, request),
+                    namespace,
+                    model_name,
+                    value,
+                    len(value.encode()),
+                    time.time(),
+                ),
+            )
+            self.evict()
+            self.conn.commit()
+
+    def claim(self, key: str) -> bool:
+        """
+        Register this process as the one requesting the response of ``key``,
+        unless another live process already is.
+        """
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self.conn.execute(
+                    'SELECT pid FROM flights WHERE key = ?', (key,)
+                ).fetchone()
+                claimed = row is None or not pid_alive(row[0])
+                if claimed:
+                    self.conn.execute(
+                        'INSERT OR REPLACE INTO flights (key, pid) VALUES (?, ?)',
+                        (key, os.getpid()),
+                    )
+            finally:
+                self.conn.commit()
+        return claimed
+
+    def release(self, key: str) -> None:
+        with self.lock:
+            self.conn.execute(
+                'DELETE FROM flights WHERE key = ? AND pid = ?', (key, os.getpid())
+            )
+            self.conn.commit()
+
+    def evict(self) -> None:
+        (total,) = self.conn.execute(
+            "SELECT value FROM meta WHERE name = 'size'"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        for key, size in self.conn.execute(
+            'SELECT key, size FROM responses ORDER BY last_access'
+        ):
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        self.conn.executemany('DELETE FROM responses WHERE key = ?', evicted)
+
+    def clear(self, namespace: str) -> int:
+        with self.lock:
+            cursor = self.conn.execute(
+                'DELETE FROM responses WHERE namespace = ?', (namespace,)
+            )
+            self.conn.execute('DELETE FROM counters WHERE namespace = ?', (namespace,))
+            self.conn.commit()
+        return cursor.rowcount
+
+    def stats(self, namespace: Optional[str] = None) -> Dict[str, Any]:
+        """Hit rate and size on disk, overall or of a single namespace."""
+        where = '' if namespace is None else ' WHERE namespace = ?'
+        params: List[str] = [] if namespace is None else [namespace]
+        with self.lock:
+            (hits, misses) = self.conn.execute(
+                'SELECT COALESCE(SUM(hits), 0), COALESCE(SUM(misses), 0) '
+                f'FROM counters{where}',
+                params,
+            ).fetchone()
+            (entries, total) = self.conn.execute(
+                f'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses{where}',
+                params,
+            ).fetchone()
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+            'entries': entries,
+            'bytes': total,
+        }
+
+
+_caches: Dict[str, ResponseCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """
+    Return the cache configured by the ``LLM_CACHE_PATH`` environment variable,
+    or None if caching is disabled. ``LLM_CACHE_MAX_MB`` bounds its size.
+    """
+    path = os.getenv('LLM_CACHE_PATH')
+    if not path:
+        return None
+    with _caches_lock:
+        if path not in _caches:
+            max_mb = float(os.getenv('LLM_CACHE_MAX_MB', LLM_CACHE_MAX_MB))
+            _caches[path] = ResponseCache(path, max_bytes=int(max_mb * 1024 * 1024))
+        return _caches[path]
+
+
+def get_response_cache_namespace() -> str:
+    namespace = _namespace.get()
+    if namespace is not None:
+        return namespace
+    return os.getenv('LLM_CACHE_NAMESPACE', LLM_CACHE_NAMESPACE)
+
+
+@contextmanager
+def response_cache_namespace(namespace: str) -> Iterator[None]:
+    """Tag the responses cached inside the block with an experiment namespace."""
+    token = _namespace.set(namespace)
+    try:
+        yield
+    finally:
+        _namespace.reset(token)
+
+
+def cacheable_request(
+    messages: List[Dict[str, str]],
+    return_num: Optional[int],
+    max_token_num: Optional[int],
+    temperature: Optional[float],
+    top_p: Optional[float],
+    stream: Optional[bool],
+) -> Optional[Dict[str, Any]]:
+    """
+    The parameters identifying a completion request, or None if the request is
+    not deterministic (sampled with a non-zero temperature, or streamed) and
+    must therefore not be served from the cache.
+    """
+    if stream or temperature is None or temperature != 0:
+        return None
+    return {
+        'messages': messages,
+        'max_tokens': max_token_num,
+        'temperature': temperature,
+        'top_p': top_p,
+        'n': return_num,
+    }
+
+
+def request_key(model_name: str, request: Optional[Dict[str, Any]]) -> Optional[str]:
+    """The key identifying a deterministic request, or None for other requests."""
+    if request is None:
+        return None
+    return ResponseCache.key(get_response_cache_namespace(), model_name, request)
+
+
+@contextmanager
+def response_flight(
+    model_name: str, request: Optional[Dict[str, Any]]
+) -> Iterator[bool]:
+    """
+    Wait until no other process is requesting the same deterministic response,
+    and claim the request for this process for the duration of the block.
+    Yields whether another process held it, in which case the response is
+    likely cached by now. Does nothing unless the response cache is enabled.
+    """
+    cache = get_response_cache()
+    key = request_key(model_name, request)
+    if cache is None or key is None:
+        yield False
+        return
+    waited = False
+    while not cache.claim(key):
+        waited = True
+        time.sleep(FLIGHT_POLL_INTERVAL)
+    try:
+        yield waited
+    finally:
+        cache.release(key)
+
+
+@asynccontextmanager
+async def aresponse_flight(
+    model_name: str, request: Optional[Dict[str, Any]]
+) -> AsyncIterator[bool]:
+    """Asynchronous response_flight, waiting without blocking the event loop."""
+    cache = get_response_cache()
+    key = request_key(model_name, request)
+    if cache is None or key is None:
+        yield False
+        return
+    waited = False
+    while not cache.claim(key):
+        waited = True
+        await asyncio.sleep(FLIGHT_POLL_INTERVAL)
+    try:
+        yield waited
+    finally:
+        cache.release(key)
+
+
+def lookup_response(
+    model_name: str, request: Optional[Dict[str, Any]]
+) -> Optional[List[str]]:
+    cache = get_response_cache()
+    if cache is None or request is None:
+        return None
+    return cache.get(get_response_cache_namespace(), model_name, request)
+
+
+def store_response(
+    model_name: str, request: Optional[Dict[str, Any]], response: List[Any]
+) -> None:
+    cache = get_response_cache()
+    if cache is None or request is None or any(c is None for c in response):
+        return
+    cache.put(get_response_cache_namespace(), model_name, request, response)
@@ -1,26 +1,118 @@
-from typing import List
+import threading
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
+import numpy.typing as npt
 import torch
-from transformers import BertModel, BertTokenizer
+
+from .embedding_cache import cached_embed
+
+if TYPE_CHECKING:
+    from transformers import BertModel, BertTokenizer
+
+RETRIEVER_MODEL_NAME = 'facebook/contriever'
+
+_retrievers: Dict[str, Tuple['BertTokenizer', 'BertModel']] = {}
+_retrievers_lock = threading.Lock()
+
+
+def get_retriever(
+    model_name: str = RETRIEVER_MODEL_NAME,
+) -> Tuple['BertTokenizer', 'BertModel']:
+    """
+    Return the process-wide tokenizer and model for a retriever checkpoint.
+
+    The checkpoint is loaded on first use only, and every caller in the process
+    shares the same instances; transformers itself is imported lazily here so
+    that importing research_town does not pay for it.
+    """
+    retriever = _retrievers.get(model_name)
+    if retriever is None:
+        with _retrievers_lock:
+            retriever = _retrievers.get(model_name)
+            if retriever is None:
+                from transformers import BertModel, BertTokenizer
+
+                model = BertModel.from_pretrained(model_name)
+                # inference mode, as eval() does; eval itself is untyped
+                model.train(False)
+                retriever = (BertTokenizer.from_pretrained(model_name), model)
+                _retrievers[model_name] = retriever
+    return retriever
+
+
+def get_embed_matrix(
+    instructions: List[str],
+    retriever_tokenizer: 'BertTokenizer',
+    retriever_model: 'BertModel',
+    batch_size: int = 32,
+    num_threads: Optional[int] = None,
+    inference_mode: bool = True,
+) -> torch.Tensor:
+    """
+    Embed a list of texts in padded batches.
+
+    Texts are sorted by token length before batching so that every batch is only
+    padded to its own longest sequence, and the last hidden states are mean
+    pooled over the attention mask so that padding does not change the result.
+
+    :param batch_size: Number of sequences per forward pass.
+    :param num_threads: If given, passed to ``torch.set_num_threads``.
+    :param inference_mode: Run under ``torch.inference_mode`` instead of
+                           ``torch.no_grad``.
+    :return: Embeddings of shape (len(instructions), hidden_size), in input order.
+    """
+    if num_threads is not None:
+        torch.set_num_threads(num_threads)
+    if not instructions:
+        return torch.empty((0, 0))
+
+    encoded_input_all = retriever_tokenizer(
+        instructions, truncation=True, max_length=512
+    )
+    order = sorted(
+        range(len(instructions)),
+        key=lambda i: len(encoded_input_all['input_ids'][i]),
+    )
+
+    emb_list = []
+    with torch.inference_mode() if inference_mode else torch.no_grad():
+        for start in range(0, len(order), batch_size):
+            batch_indices = order[start : start + batch_size]
+            inter = retriever_tokenizer.pad(
+                {
+                    key: [value[i] for i in batch_indices]
+                    for key, value in encoded_input_all.items()
+                },
+                return_tensors='pt',
+            )
+            hidden_states = retriever_model(**inter)['last_hidden_state']
+            mask = inter['attention_mask'].unsqueeze(-1).to(hidden_states.dtype)
+            emb_list.append((hidden_states * mask).sum(1) / mask.sum(1).clamp(min=1e-9))
+
+    # scatter the length-sorted batches back into input order
+    embeddings = torch.cat(emb_list, 0)
+    return embeddings[torch.argsort(torch.tensor(order))]
 
 
 def get_embed(
     instructions: List[str],
-    retriever_tokenizer: BertTokenizer = BertTokenizer.from_pretrained(
-        'facebook/contriever'
-    ),
-    retriever_model: BertModel = BertModel.from_pretrained('facebook/contriever'),
+    retriever_tokenizer: Optional['BertTokenizer'] = None,
+    retriever_model: Optional['BertModel'] = None,
+    batch_size: int = 32,
 ) -> List[torch.Tensor]:
-    encoded_input_all = [
-        retriever_tokenizer(text, return_tensors='pt', truncation=True, max_length=512)
-        for text in instructions
-    ]
-    with torch.no_grad():
-        emb_list = []
-        for inter in encoded_input_all:
-            emb = retriever_model(**inter)
-            emb_list.append(emb['last_hidden_state'].mean(1))
-    return emb_list
+    if retriever_tokenizer is None or retriever_model is None:
+        # the shared checkpoint is identified by name, so its embeddings can be
+        # served from the persistent cache and the model is only loaded on misses
+        def embed(texts: List[str]) -> npt.NDArray[Any]:
+            matrix = get_embed_matrix(texts, *get_retriever(), batch_size=batch_size)
+            return matrix.numpy(force=True)
+
+        cached = cached_embed(RETRIEVER_MODEL_NAME, instructions, embed)
+        return [torch.from_numpy(embedding).unsqueeze(0) for embedding in cached]
+    embeddings = get_embed_matrix(
+        instructions, retriever_tokenizer, retriever_model, batch_size=batch_size
+    )
+    return list(torch.split(embeddings, 1))
 
 
 def rank_topk(
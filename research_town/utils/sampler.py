@@ -1,10 +1,12 @@
 import random
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
 from ..data import Idea
 
 
-def sample_ideas(lst: List[Idea], n: int) -> List[List[Idea]]:
+def sample_ideas(
+    lst: List[Idea], n: int, rng: Optional[random.Random] = None
+) -> List[List[Idea]]:
     total_subsets = 2 ** len(lst) - (len(lst) + 1)
     if n > total_subsets:
         raise ValueError(f'n cannot be greater than {total_subsets}')
@@ -14,7 +16,7 @@ def sample_ideas(lst: List[Idea], n: int) -> List[List[Idea]]:
     lst_indices = list(range(lst_len))
 
     while len(sampled_subsets) < n:
-        bits = random.getrandbits(lst_len)
+        bits = (rng or random).getrandbits(lst_len)
         if bits == 0:
             continue  # Skip empty set
         indices = [i for i in lst_indices if bits & (1 << i)]
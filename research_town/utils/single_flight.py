@@ -0,0 +1,90 @@
+import asyncio
+import threading
+
+from beartype.typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+T = TypeVar('T')
+
+
+class Flight:
+    """A call in progress whose outcome is handed to every caller waiting on it."""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+_flights: Dict[str, Flight] = {}
+_flights_lock = threading.Lock()
+_async_flights: Dict[Tuple[str, int], 'asyncio.Future[Any]'] = {}
+
+
+def single_flight(key: Optional[str], func: Callable[[], T]) -> Tuple[T, bool]:
+    """
+    Run ``func`` once for all threads calling with the same ``key`` at the same
+    time: the first caller runs it and the others wait for and share its result
+    or error. Returns the result and whether it was shared from another caller.
+    A ``key`` of None runs ``func`` without coalescing.
+    """
+    if key is None:
+        return func(), False
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if flight is None:
+            flight = _flights[key] = Flight()
+    if not leader:
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result, True
+
+    try:
+        flight.result = func()
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        with _flights_lock:
+            del _flights[key]
+        flight.done.set()
+    return flight.result, False
+
+
+async def asingle_flight(
+    key: Optional[str], func: Callable[[], Awaitable[T]]
+) -> Tuple[T, bool]:
+    """
+    Asynchronous single_flight, coalescing the calls of the tasks of one event
+    loop. Waiting tasks are not cancelled with the task running ``func``; they
+    start a new flight instead.
+    """
+    if key is None:
+        return await func(), False
+    flight_key = (key, id(asyncio.get_running_loop()))
+    while flight_key in _async_flights:
+        future = _async_flights[flight_key]
+        try:
+            return await asyncio.shield(future), True
+        except asyncio.CancelledError:
+            if not future.cancelled():
+                raise
+
+    future = asyncio.get_running_loop().create_future()
+    _async_flights[flight_key] = future
+    try:
+        result = await func()
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except BaseException as e:
+        future.set_exception(e)
+        # the error is raised here, so waiting tasks need not retrieve it
+        future.exception()
+        raise
+    else:
+        future.set_result(result)
+    finally:
+        del _async_flights[flight_key]
+    return result, False
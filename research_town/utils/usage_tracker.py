@@ -0,0 +1,195 @@
+import contextvars
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+import litellm
+from beartype.typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    cast,
+)
+from litellm.utils import token_counter
+
+from ..data.data import LLMCallLog
+
+F = TypeVar('F', bound=Callable[..., Any])
+
+USAGE_FIELDS = ['calls', 'cached_calls', 'prompt_tokens', 'completion_tokens', 'cost']
+
+_scope: contextvars.ContextVar[Dict[str, Optional[str]]] = contextvars.ContextVar(
+    'usage_scope', default={}
+)
+_trackers: contextvars.ContextVar[Tuple['UsageTracker', ...]] = contextvars.ContextVar(
+    'usage_trackers', default=()
+)
+
+
+class UsageTracker:
+    """
+    Collects an LLMCallLog for every model call made inside ``track_usage``
+    blocks: its model, prompt and completion tokens, latency and cost, and the
+    agent (``profile_pk``), env and project it is attributed to by the
+    enclosing ``usage_scope`` blocks.
+    """
+
+    def __init__(self) -> None:
+        self.records: List[LLMCallLog] = []
+        self.num_flushed = 0
+        self.lock = threading.Lock()
+
+    def add(self, record: LLMCallLog) -> None:
+        with self.lock:
+            self.records.append(record)
+
+    def extend(self, records: List[LLMCallLog]) -> None:
+        with self.lock:
+            self.records.extend(records)
+
+    def flush(self) -> List[LLMCallLog]:
+        """Return the records added since the previous flush."""
+        with self.lock:
+            records = self.records[self.num_flushed :]
+            self.num_flushed = len(self.records)
+        return records
+
+    def summary(self, group_by: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+        """Usage totals, overall or per value of a record field such as env_name."""
+        groups: Dict[str, Dict[str, float]] = {}
+        with self.lock:
+            records = list(self.records)
+        for record in records:
+            key = 'total' if group_by is None else str(getattr(record, group_by))
+            group = groups.setdefault(key, dict.fromkeys(USAGE_FIELDS, 0.0))
+            group['calls'] += 1
+            group['cached_calls'] += int(record.cached)
+            group['prompt_tokens'] += record.prompt_tokens
+            group['completion_tokens'] += record.completion_tokens
+            group['cost'] += record.cost
+        return groups
+
+    def report(self) -> str:
+        lines = []
+        for group_by in [None, 'model_name', 'env_name', 'profile_pk']:
+            title = 'LLM usage' if group_by is None else f'  by {group_by}'
+            lines.append(title)
+            for key, usage in self.summary(group_by).items():
+                lines.append(
+                    f'    {key}: {int(usage["calls"])} calls '
+                    f'({int(usage["cached_calls"])} cached), '
+                    f'{int(usage["prompt_tokens"])} prompt tokens, '
+                    f'{int(usage["completion_tokens"])} completion tokens, '
+                    f'${usage["cost"]:.4f}'
+                )
+        return '\n'.join(lines)
+
+
+@contextmanager
+def track_usage(tracker: UsageTracker) -> Iterator[UsageTracker]:
+    """Record the model calls made inside the block into ``tracker``."""
+    token = _trackers.set(_trackers.get() + (tracker,))
+    try:
+        yield tracker
+    finally:
+        _trackers.reset(token)
+
+
+@contextmanager
+def usage_scope(**attributes: Optional[str]) -> Iterator[None]:
+    """
+    Attribute the model calls made inside the block to an agent
+    (``profile_pk``), an env (``env_name``) or a project (``project_name``).
+    Nested scopes add to or override the attributes of the enclosing ones.
+    """
+    token = _scope.set({**_scope.get(), **attributes})
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def get_usage_scope() -> Dict[str, Optional[str]]:
+    """The attributes of the enclosing ``usage_scope`` blocks."""
+    return _scope.get()
+
+
+def agent_usage(method: F) -> F:
+    """Attribute the model calls of an agent method to the agent's profile."""
+
+    @wraps(method)
+    def wrapper(self: Any, *args: Any, **kwargs: Any) -> Any:
+        with usage_scope(profile_pk=self.profile.pk):
+            return method(self, *args, **kwargs)
+
+    return cast(F, wrapper)
+
+
+def estimate_cost(llm_model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    try:
+        prompt_cost, completion_cost = litellm.cost_per_token(
+            model=llm_model,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+        )
+    except Exception:
+        # models missing from the litellm price list are not priced
+        return 0.0
+    return float(prompt_cost + completion_cost)
+
+
+def record_llm_call(
+    llm_model: str,
+    messages: List[Dict[str, str]],
+    outputs: Sequence[Optional[str]],
+    completion: Any,
+    latency: float,
+    cached: bool = False,
+) -> None:
+    trackers = _trackers.get()
+    if not trackers:
+        return
+
+    prompt_tokens = completion_tokens = 0
+    cost = 0.0
+    if not cached:
+        usage = getattr(completion, 'usage', None)
+        usage_prompt_tokens: Optional[int] = getattr(usage, 'prompt_tokens', None)
+        usage_completion_tokens: Optional[int] = getattr(
+            usage, 'completion_tokens', None
+        )
+        # streamed completions come without usage, so count their tokens here
+        if isinstance(usage_prompt_tokens, int):
+            prompt_tokens = usage_prompt_tokens
+        else:
+            prompt_tokens = token_counter(model=llm_model, messages=messages)
+        if isinstance(usage_completion_tokens, int):
+            completion_tokens = usage_completion_tokens
+        else:
+            completion_tokens = sum(
+                token_counter(model=llm_model, text=output)
+                for output in outputs
+                if output
+            )
+        cost = estimate_cost(llm_model, prompt_tokens, completion_tokens)
+
+    scope = _scope.get()
+    record = LLMCallLog(
+        project_name=scope.get('project_name'),
+        profile_pk=scope.get('profile_pk'),
+        env_name=scope.get('env_name'),
+        model_name=llm_model,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        latency=latency,
+        cost=cost,
+        cached=cached,
+    )
+    for tracker in trackers:
+        tracker.add(record)
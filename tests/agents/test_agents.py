@@ -58,6 +58,26 @@ def test_brainstorm_idea(
     assert research_idea.content == 'Idea1'
 
 
+@patch('research_town.utils.agent_prompter.model_prompting')
+def test_brainstorm_ideas(
+    mock_model_prompting: MagicMock,
+) -> None:
+    mock_model_prompting.side_effect = mock_prompting
+    agent = Agent(
+        profile=profile_A,
+        model_name='gpt-4o-mini',
+        role='leader',
+    )
+    research_ideas = agent.brainstorm_ideas(
+        insights=[research_insight_A, research_insight_B],
+        papers=[paper_A, paper_B],
+        config=example_config,
+    )
+    assert mock_model_prompting.call_count == 1
+    assert [idea.content for idea in research_ideas] == ['Idea1', 'Idea2', 'Idea3']
+    assert len({idea.pk for idea in research_ideas}) == 3
+
+
 @patch('research_town.utils.agent_prompter.model_prompting')
 def test_write_proposal(mock_model_prompting: MagicMock) -> None:
     mock_model_prompting.side_effect = mock_prompting
@@ -1,7 +1,12 @@
+import os
 from unittest.mock import MagicMock, patch
 
-from beartype.typing import Any, Dict, List
+import numpy as np
+import pytest
+import torch
+from beartype.typing import Any, Dict, List, Optional
 
+from research_town.configs import AnnIndexConfig, DatabaseConfig
 from research_town.data import (
     Idea,
     MetaReviewWritingLog,
@@ -11,6 +16,12 @@ from research_town.data import (
     ReviewWritingLog,
 )
 from research_town.dbs import LogDB, PaperDB, ProfileDB, ProgressDB
+from research_town.dbs.db_provider.local import LocalDatabaseClient
+from research_town.dbs.db_provider.local.embedding_store import (
+    EmbeddingMatrix,
+    top_k,
+)
+from research_town.dbs.db_provider.sqlite import SQLiteDatabaseClient
 from tests.constants.config_constants import example_config
 from tests.mocks.mocking_func import mock_prompting
 
@@ -107,6 +118,21 @@ def test_progressdb_basic() -> None:
     assert new_db.dbs['Idea'].count() == 2
 
 
+def test_progressdb_for_project() -> None:
+    db = ProgressDB(config=example_config.database)
+    db_a = db.for_project('project_a')
+    db_b = db.for_project('project_b')
+    db_a.add(Idea(content='Idea of project a'))
+    db_b.add(Idea(content='Idea of project b'))
+    db_b.add(Idea(content='Another idea of project b'))
+
+    # the views share the client and keep the data of their projects apart
+    assert db.count(Idea, project_name='project_a') == 1
+    assert db.count(Idea, project_name='project_b') == 2
+    assert db.dbs['Idea'].project_name is None
+    assert db_a.dbs['Idea'].database_client is db.dbs['Idea'].database_client
+
+
 def test_ProfileDB_basic() -> None:
     db = ProfileDB(config=example_config.database)
     agent1 = Profile(name='John Doe', bio='Profile in AI', institute='AI Institute')
@@ -287,3 +313,303 @@ def test_pull_papers() -> None:
     db = PaperDB(config=example_config.database)
     db.pull_papers(num=2, domain='Data Mining')
     assert db.count() == 2
+
+
+def test_local_client_journal_replay() -> None:
+    config = DatabaseConfig(
+        provider='local', journal=True, journal_compaction_threshold=4
+    )
+    client = LocalDatabaseClient(config)
+    client.register_namespace('Item', with_embeddings=True)
+    for i in range(10):
+        client.add(
+            'Item', [{'pk': str(i), 'value': i}], [np.full(3, i, dtype=np.float32)]
+        )
+    client.update('Item', '3', {'value': 33, 'embedding': np.zeros(3)})
+    client.delete('Item', '4')
+    client.close()
+
+    # simulate a crash in the middle of an append
+    folder_path = os.environ['DATABASE_FOLDER_PATH']
+    with open(os.path.join(folder_path, 'Item.wal'), 'a', encoding='utf-8') as f:
+        f.write('{"op": "delete", "pk"')
+
+    new_client = LocalDatabaseClient(config)
+    assert new_client.count('Item') == 9
+    assert new_client.get('Item', pk='3')[0]['value'] == 33
+    assert np.array_equal(new_client.data_embed['Item'].get('3'), np.zeros(3))
+    assert new_client.count('Item', pk='4') == 0
+
+    new_client.add('Item', [{'pk': '10', 'value': 10}], [np.ones(3, dtype=np.float32)])
+    new_client.save()
+    assert not os.path.exists(os.path.join(folder_path, 'Item.wal'))
+    assert LocalDatabaseClient(config).count('Item') == 10
+
+
+def test_local_client_embedding_matrix() -> None:
+    client = LocalDatabaseClient()
+    client.register_namespace('Item', with_embeddings=True)
+    embeddings = np.eye(4, dtype=np.float32)
+    client.add(
+        'Item',
+        [{'pk': str(i), 'group': i % 2} for i in range(4)],
+        [embeddings[i] * (i + 1) for i in range(4)],
+    )
+    client.delete('Item', '1')
+
+    query = [np.array([0.1, 0.9, 0.8, 0.0], dtype=np.float32)]
+    assert [data['pk'] for data in client.search('Item', query, num=2)[0]] == [
+        '2',
+        '0',
+    ]
+    assert [data['pk'] for data in client.search('Item', query, group=1)[0]] == ['3']
+
+    # vectors are stored normalized in a memory-mapped matrix that survives reloads
+    client.save()
+    new_client = LocalDatabaseClient()
+    matrix = new_client.data_embed['Item']
+    assert isinstance(matrix.matrix, np.memmap)
+    assert len(matrix) == matrix.size == 3
+    assert np.allclose(matrix.get('3'), embeddings[3])
+    assert new_client.search('Item', query)[0][0]['pk'] == '2'
+
+
+def test_local_client_vacuum_crash() -> None:
+    client = LocalDatabaseClient()
+    client.register_namespace('Item', with_embeddings=True)
+    embeddings = np.eye(4, dtype=np.float32)
+    client.add('Item', [{'pk': str(i)} for i in range(4)], list(embeddings))
+    client.save()
+    client.delete('Item', '1')
+
+    save_index = EmbeddingMatrix.save_index
+
+    def crash_on_vacuum(
+        self: EmbeddingMatrix, pks: List[Optional[str]], matrix_path: str
+    ) -> None:
+        if matrix_path.endswith('.vacuumed.npy'):
+            raise OSError('crashed')
+        save_index(self, pks, matrix_path)
+
+    with patch.object(EmbeddingMatrix, 'save_index', crash_on_vacuum):
+        with pytest.raises(OSError, match='crashed'):
+            client.save()
+
+    # the renumbered matrix is not used without the row index naming it
+    client = LocalDatabaseClient()
+    matrix = client.data_embed['Item']
+    assert matrix.matrix_path.endswith('Item.npy')
+    for pk in ['0', '2', '3']:
+        assert np.allclose(matrix.get(pk), embeddings[int(pk)])
+
+    client.save()
+    matrix = LocalDatabaseClient().data_embed['Item']
+    assert matrix.matrix_path.endswith('Item.vacuumed.npy')
+    assert not os.path.exists(matrix.matrix_path.replace('.vacuumed', ''))
+    assert matrix.size == 3
+    for pk in ['0', '2', '3']:
+        assert np.allclose(matrix.get(pk), embeddings[int(pk)])
+
+
+def test_local_client_field_index() -> None:
+    client = LocalDatabaseClient()
+    client.register_namespace('Item', with_embeddings=False, index_fields=['group'])
+    client.add(
+        'Item',
+        [{'pk': str(i), 'group': i % 3, 'tags': [i]} for i in range(9)],
+        [],
+    )
+    assert [data['pk'] for data in client.get('Item', group=1)] == ['1', '4', '7']
+    assert len(client.get('Item', group=2, tags=[5])) == 1
+
+    client.update('Item', '4', {'group': 2})
+    client.delete('Item', '7')
+    client.add('Item', [{'pk': '1', 'group': 0, 'tags': []}], [])
+    assert client.count('Item', group=1) == 0
+    assert client.count('Item', group=2) == 4
+    assert client.indexes['Item'].candidates({'group': 1}) == []
+
+    # indexes are rebuilt from the persisted records on registration
+    new_client = LocalDatabaseClient()
+    new_client.register_namespace('Item', with_embeddings=False, index_fields=['group'])
+    assert sorted(data['pk'] for data in new_client.get('Item', group=0)) == [
+        '0',
+        '1',
+        '3',
+        '6',
+    ]
+
+
+def test_local_client_ann_search() -> None:
+    config = DatabaseConfig(
+        provider='local',
+        ann_indexes={'Item': AnnIndexConfig(nlist=4, nprobe=2, min_train_size=40)},
+    )
+    rng = np.random.default_rng(0)
+    centers = np.eye(8, dtype=np.float32)[:4]
+    vectors = centers[np.arange(200) % 4] + 0.05 * rng.standard_normal((200, 8))
+
+    client = LocalDatabaseClient(config)
+    client.register_namespace('Item', with_embeddings=True)
+    client.add(
+        'Item',
+        [{'pk': str(i), 'group': i % 4, 'odd': i % 2} for i in range(200)],
+        list(vectors),
+    )
+    client.delete('Item', '0')
+    ann = client.data_embed['Item'].ann
+    assert ann is not None and ann.trained
+
+    queries = list(centers[:2])
+    exact = [
+        [data['pk'] for data in matches]
+        for matches in LocalDatabaseClient().search('Item', queries, num=10)
+    ]
+    approximate = [
+        [data['pk'] for data in matches]
+        for matches in client.search('Item', queries, num=10)
+    ]
+    assert approximate == exact
+    assert '0' not in approximate[0]
+    assert all(
+        data['odd'] == 1 for data in client.search('Item', queries, num=5, odd=1)[0]
+    )
+
+    client.save()
+    folder_path = os.environ['DATABASE_FOLDER_PATH']
+    assert os.path.exists(os.path.join(folder_path, 'Item.ivf.npz'))
+    new_client = LocalDatabaseClient(config)
+    new_ann = new_client.data_embed['Item'].ann
+    assert new_ann is not None
+    assert new_ann.centroids is not None and ann.centroids is not None
+    assert np.array_equal(new_ann.centroids, ann.centroids)
+    assert [
+        data['pk'] for data in new_client.search('Item', queries[:1], num=10)[0]
+    ] == exact[0]
+
+
+@patch('research_town.dbs.db_paper.get_embed')
+def test_paper_match_many(mock_get_embed: MagicMock) -> None:
+    def embed(instructions: List[str]) -> List[torch.Tensor]:
+        return [
+            torch.tensor([[float('2' in text), float('1' in text), 0.1]])
+            for text in instructions
+        ]
+
+    mock_get_embed.side_effect = embed
+    db = PaperDB(config=example_config.database)
+    for i in range(1, 4):
+        db.add(
+            Paper(
+                title=f'Sample Paper {i}',
+                abstract=f'Abstract {i}',
+                domain='Physics' if i == 3 else 'Computer Science',
+                embed=embed([f'Abstract {i}'])[0],
+            )
+        )
+
+    matches = db.match_many(['about 2', 'about 1', 'other'], num=2)
+    assert mock_get_embed.call_count == 1
+    assert [paper.title for paper in matches[0]][0] == 'Sample Paper 2'
+    assert [paper.title for paper in matches[1]][0] == 'Sample Paper 1'
+    assert len(matches[2]) == 2
+    assert db.match_many(['about 2'], num=5, domain='Physics')[0][0].title == (
+        'Sample Paper 3'
+    )
+    assert db.match_many([]) == []
+
+
+def test_top_k() -> None:
+    similarities = np.array([[0.1, 0.9, 0.5, 0.7], [0.3, 0.2, 0.8, 0.0]])
+    assert top_k(similarities, 2).tolist() == [[1, 3], [2, 0]]
+    assert top_k(similarities, 10).tolist() == [[1, 3, 2, 0], [2, 0, 1, 3]]
+
+
+def test_sqlite_client() -> None:
+    client = SQLiteDatabaseClient(DatabaseConfig(provider='sqlite'))
+    client.register_namespace('Item', with_embeddings=True, index_fields=['group'])
+    client.add(
+        'Item',
+        [
+            {'pk': 'a', 'group': 'x', 'tags': [1, 2]},
+            {'pk': 'b', 'group': 'y', 'tags': [3]},
+            {'pk': 'c', 'group': 'x', 'tags': [1, 2]},
+        ],
+        [np.array([1.0, 0.0]), np.array([0.0, 1.0]), np.array([1.0, 1.0])],
+    )
+    assert client.count('Item') == 3
+    assert client.count('Item', group='x') == 2
+    assert [data['pk'] for data in client.get('Item', tags=[1, 2])] == ['a', 'c']
+    plan = client.conn.execute(
+        'EXPLAIN QUERY PLAN SELECT data FROM "Item" WHERE "idx_group" = ?', ('x',)
+    ).fetchall()
+    assert 'Item_group' in str(plan)
+
+    results = client.search('Item', [np.array([1.0, 0.1]), np.array([0.0, 1.0])], 2)
+    assert [[data['pk'] for data in result] for result in results] == [
+        ['a', 'c'],
+        ['b', 'c'],
+    ]
+    results = client.search('Item', [np.array([0.0, 1.0])], 5, group='x')
+    assert [data['pk'] for data in results[0]] == ['c', 'a']
+
+    assert client.update('Item', 'a', {'group': 'y', 'embedding': [0.0, 1.0]})
+    assert not client.update('Item', 'missing', {'group': 'y'})
+    assert client.delete('Item', 'b')
+    assert not client.delete('Item', 'b')
+    client.add(
+        'Item', [{'pk': 'c', 'group': 'z', 'tags': []}], [np.ones(2, dtype=np.float32)]
+    )
+
+    # a second client sees the committed state without loading anything
+    reopened = SQLiteDatabaseClient(DatabaseConfig(provider='sqlite'))
+    assert reopened.indexed_fields['Item'] == {'group'}
+    assert [data['group'] for data in reopened.get('Item')] == ['y', 'z']
+    results = reopened.search('Item', [np.array([0.0, 1.0])], 1)
+    assert results[0][0]['pk'] == 'a'
+
+
+def test_sqlite_search_deleted_during_search() -> None:
+    client = SQLiteDatabaseClient(DatabaseConfig(provider='sqlite'))
+    client.register_namespace('Item', with_embeddings=True)
+    client.add(
+        'Item',
+        [{'pk': 'a'}, {'pk': 'b'}],
+        [np.array([1.0, 0.0]), np.array([0.0, 1.0])],
+    )
+    get_by_rowids = client.get_by_rowids
+
+    def delete_then_get(namespace: str, rowids: List[int]) -> Dict[int, Any]:
+        # another connection deletes a row between the scan and the fetch
+        SQLiteDatabaseClient(DatabaseConfig(provider='sqlite')).delete('Item', 'b')
+        return get_by_rowids(namespace, rowids)
+
+    with patch.object(client, 'get_by_rowids', side_effect=delete_then_get):
+        results = client.search('Item', [np.array([0.0, 1.0])], 2)
+    assert [[data['pk'] for data in result] for result in results] == [['a']]
+
+
+@patch('research_town.dbs.db_paper.get_embed')
+def test_paper_add_many_batch(mock_get_embed: MagicMock) -> None:
+    mock_get_embed.side_effect = lambda instructions: [
+        torch.ones(1, 3) for _ in instructions
+    ]
+    db = PaperDB(config=DatabaseConfig(provider='local'))
+    client = db.database_client
+    assert isinstance(client, LocalDatabaseClient)
+    papers = [Paper(title=f'Paper {i}', abstract=f'Abstract {i}') for i in range(3)]
+    papers[0].embed = torch.zeros(1, 3)
+
+    with patch.object(
+        client, 'save_namespace', wraps=client.save_namespace
+    ) as mock_save:
+        with db.batch():
+            db.add_many(papers)
+            db.delete(papers[1].pk)
+            assert mock_save.call_count == 0
+        mock_save.assert_called_once_with('Paper', with_embed=True)
+
+    # only the papers without an embedding are embedded, in a single call
+    mock_get_embed.assert_called_once_with(['Abstract 1', 'Abstract 2'])
+    assert [paper.title for paper in db.get()] == ['Paper 0', 'Paper 2']
+    assert LocalDatabaseClient().count('Paper') == 2
@@ -0,0 +1,238 @@
+import threading
+from typing import Any, Dict, Generator, List, Optional, Tuple, Type
+
+import pytest
+import torch
+
+from research_town.agents import Agent
+from research_town.configs import Config
+from research_town.data import (
+    Checkpoint,
+    Idea,
+    IdeaBrainstormLog,
+    Insight,
+    Profile,
+    Progress,
+)
+from research_town.dbs import LogDB, PaperDB, ProfileDB, ProgressDB
+from research_town.engines import BaseEngine, BatchEngine
+from research_town.envs.env_base import BaseEnv
+from tests.constants.config_constants import example_config
+
+
+class StubEnv(BaseEnv):
+    def __init__(self, name: str, config: Config, engine: 'StubEngine') -> None:
+        super().__init__(name=name, config=config)
+        self.engine = engine
+
+    def on_enter(self, **context: Any) -> None:
+        self.engine.log(f'enter {self.name}')
+        self.leader: Agent = context['leader']
+        self.context = context
+
+    def run(self) -> Generator[Tuple[Progress, Agent], None, None]:
+        self.engine.log(f'run {self.name}')
+        if self.name in self.engine.fail_in:
+            self.engine.fail_in.remove(self.name)
+            raise RuntimeError('interrupted')
+        yield from self.produce()
+
+    def produce(self) -> Generator[Tuple[Progress, Agent], None, None]:
+        if False:
+            yield
+
+    def on_exit(self) -> Tuple[str, Dict[str, Any]]:
+        self.engine.log(f'exit {self.name}')
+        return 'next', {'leader': self.leader}
+
+
+class StubStartEnv(StubEnv):
+    def on_enter(self, **context: Any) -> None:
+        profile = self.engine.profile_db.get()[0]
+        super().on_enter(
+            leader=self.engine.agent_manager.create_agent(profile, role='leader'),
+            **context,
+        )
+
+    def on_exit(self) -> Tuple[str, Dict[str, Any]]:
+        trigger, context = super().on_exit()
+        return trigger, {**context, 'contexts': self.context['contexts']}
+
+
+class StubWriteEnv(StubEnv):
+    outputs: Dict[str, Type[Progress]] = {'ideas': Idea}
+
+    def produce(self) -> Generator[Tuple[Progress, Agent], None, None]:
+        self.ideas = []
+        for index, context in enumerate(self.context['contexts']):
+            idea = Idea(content=f'idea on {context}')
+            self.ideas.append(idea)
+            yield idea, self.leader
+            if self.engine.stream and index == 0:
+                # the first idea is reviewed while the rest are written
+                assert self.engine.reviewed.wait(timeout=5)
+
+    def on_stream(self) -> Optional[Tuple[str, Dict[str, Any]]]:
+        return ('next', {'leader': self.leader}) if self.engine.stream else None
+
+    def on_exit(self) -> Tuple[str, Dict[str, Any]]:
+        trigger, context = super().on_exit()
+        return trigger, {**context, 'ideas': self.ideas}
+
+
+class StubReviewEnv(StubEnv):
+    inputs: Dict[str, Type[Progress]] = {'ideas': Idea}
+
+    def produce(self) -> Generator[Tuple[Progress, Agent], None, None]:
+        for idea in self.context['ideas']:
+            self.engine.reviewed.set()
+            yield Insight(content=f'review of {idea.content}'), self.leader
+
+
+class StubEngine(BaseEngine):
+    def __init__(
+        self, *args: Any, stream: bool = True, fail_in: List[str] = [], **kwargs: Any
+    ) -> None:
+        self.stream = stream
+        self.fail_in = list(fail_in)
+        self.events: List[str] = []
+        self.events_lock = threading.Lock()
+        self.reviewed = threading.Event()
+        super().__init__(*args, **kwargs)
+
+    def log(self, event: str) -> None:
+        with self.events_lock:
+            self.events.append(event)
+
+    def record(self, progress: Progress, agent: Agent) -> None:
+        self.log(f'record {progress.content}')
+        super().record(progress, agent)
+
+    def set_envs(self) -> None:
+        self.add_envs(
+            [
+                StubStartEnv('start', self.config, self),
+                StubWriteEnv('write', self.config, self),
+                StubReviewEnv('review', self.config, self),
+                StubEnv('end', self.config, self),
+            ]
+        )
+
+    def set_transitions(self) -> None:
+        self.add_transitions(
+            [
+                ('start', 'next', 'write'),
+                ('write', 'next', 'review'),
+                ('review', 'next', 'end'),
+            ]
+        )
+
+
+@pytest.fixture
+def dbs(set_env_variable: None) -> Dict[str, Any]:
+    profile_db = ProfileDB(config=example_config.database)
+    profile_db.add(Profile(name='Jiaxuan You', bio='bio', embed=torch.ones(1, 4)))
+    return {
+        'profile_db': profile_db,
+        'paper_db': PaperDB(config=example_config.database),
+        'progress_db': ProgressDB(config=example_config.database),
+        'log_db': LogDB(config=example_config.database),
+        'config': example_config,
+    }
+
+
+def recorded(engine: BaseEngine) -> List[str]:
+    project_name = engine.project_name
+    progress_db = engine.progress_db
+    logs = engine.log_db.get(IdeaBrainstormLog, project_name=project_name)
+    ideas = progress_db.get(Idea, project_name=project_name)
+    insights = progress_db.get(Insight, project_name=project_name)
+    assert len(logs) == len(ideas)
+    return sorted(str(progress.content) for progress in ideas + insights)
+
+
+def test_engine_pipeline(dbs: Dict[str, Any]) -> None:
+    engine = StubEngine('pipeline', **dbs)
+    engine.run(contexts=['a', 'b', 'c'])
+
+    # the review env is entered as soon as the write env runs, and gets the
+    # ideas streamed to it while they are written
+    events = engine.events
+    assert events.index('exit start') < events.index('enter write')
+    assert events.index('enter write') < events.index('enter review')
+    assert events.index('enter review') < events.index('run write')
+    assert events.index('exit review') < events.index('enter end')
+    for context in 'abc':
+        assert events.index(f'record idea on {context}') < events.index(
+            f'record review of idea on {context}'
+        )
+    for name in ['start', 'write', 'review']:
+        assert events.count(f'run {name}') == 1
+        assert events.count(f'exit {name}') == 1
+    # the run stops once it enters the end env
+    assert events[-1] == 'enter end'
+    assert engine.time_step == 6
+    assert recorded(engine) == sorted(
+        [f'idea on {context}' for context in 'abc']
+        + [f'review of idea on {context}' for context in 'abc']
+    )
+
+
+def test_engine_resume(dbs: Dict[str, Any]) -> None:
+    contexts = ['a', 'b']
+    uninterrupted = StubEngine('uninterrupted', stream=False, **dbs)
+    uninterrupted.run(contexts=contexts)
+
+    engine = StubEngine('interrupted', stream=False, fail_in=['review'], **dbs)
+    with pytest.raises(RuntimeError, match='interrupted'):
+        engine.run(contexts=contexts)
+    checkpoint = engine.log_db.get(Checkpoint, project_name='interrupted')[-1]
+    assert checkpoint.env_name == 'review'
+    assert checkpoint.time_step == 2
+
+    resumed = StubEngine('interrupted', stream=False, **dbs)
+    resumed.resume()
+    # the envs finished before the interruption are not run again
+    assert [event for event in resumed.events if event.startswith('run')] == [
+        'run review'
+    ]
+    assert resumed.time_step == uninterrupted.time_step == 4
+    assert recorded(resumed) == recorded(uninterrupted)
+    # a finished run is resumed to nothing
+    resumed_again = StubEngine('interrupted', stream=False, **dbs)
+    resumed_again.resume()
+    assert recorded(resumed_again) == recorded(uninterrupted)
+
+
+class BrokenStubEngine(StubEngine):
+    def set_envs(self) -> None:
+        super().set_envs()
+        if self.project_name == 'broken':
+            self.fail_in = ['write']
+
+
+def test_batch_engine(dbs: Dict[str, Any]) -> None:
+    batch = BatchEngine(engine_class=BrokenStubEngine, max_projects=2, **dbs)
+    for project_name in ['first', 'broken', 'second']:
+        batch.add_project(project_name, contexts=[project_name])
+    with pytest.raises(ValueError):
+        batch.add_project('first', contexts=['first'])
+    batch.run()
+
+    # the failed project does not stop the others
+    assert list(batch.errors) == ['broken']
+    assert isinstance(batch.errors['broken'], RuntimeError)
+    assert set(batch.durations) == {'first', 'broken', 'second'}
+    for project_name in ['first', 'second']:
+        engine = batch.engines[project_name]
+        assert recorded(engine) == [
+            f'idea on {project_name}',
+            f'review of idea on {project_name}',
+        ]
+    assert recorded(batch.engines['broken']) == []
+    # the engines write through views of the shared DBs, which stay unscoped
+    assert batch.log_db.dbs['Checkpoint'].project_name is None
+
+    report = batch.report()
+    assert '2 projects done, 1 failed' in report
+    assert 'projects/min' in report
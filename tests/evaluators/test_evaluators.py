@@ -229,3 +229,26 @@ def test_evaluator_eval_metareview(use_mock: bool, model_name: str) -> None:
         assert (
             0 <= evals_output.overall_score <= 100
         ), f'Expected score between 0 and 100, got {evals_output.overall_score}'
+
+
+def test_evaluator_eval_multiple_samples() -> None:
+    evaluator = IdeaQualityEvaluator(model_name='gpt-4o-mini', config=example_config)
+    insights = [research_insight_A.model_dump(), research_insight_B.model_dump()]
+    idea = research_idea_A.model_dump()
+    input_dict = {'insights': insights, 'idea': idea}
+
+    mock_model_prompting = MagicMock(
+        return_value=[
+            'Overall Score=80. Dimension Scores=[8, 8, 9, 9, 8, 8].',
+            'Overall Score=85. Dimension Scores=[9, 8, 9, 7, 8, 9].',
+            'No scores in this sample.',
+            'Overall Score=90. Dimension Scores=[10, 8, 9, 8, 8, 10].',
+        ]
+    )
+    with patch(
+        'research_town.utils.eval_prompter.model_prompting', mock_model_prompting
+    ):
+        evals_output = evaluator.eval(**input_dict)
+    assert mock_model_prompting.call_count == 1
+    assert evals_output.overall_score == 85
+    assert evals_output.dimension_scores == [9, 8, 9, 8, 8, 9]
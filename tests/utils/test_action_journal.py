@@ -0,0 +1,66 @@
+from unittest.mock import MagicMock, patch
+
+from research_town.agents.agent import Agent
+from research_town.data import AgentActionLog, Insight
+from research_town.utils.action_journal import (
+    ActionJournal,
+    dump_value,
+    journal_scope,
+    load_value,
+)
+from tests.constants.config_constants import example_config
+from tests.constants.data_constants import (
+    paper_A,
+    profile_A,
+    research_insight_A,
+)
+from tests.mocks.mocking_func import mock_prompting
+
+
+def test_dump_value() -> None:
+    value = ('summary', ['keyword'], research_insight_A)
+    loaded = load_value(dump_value(value))
+    assert loaded == value
+    assert isinstance(loaded, tuple)
+    assert isinstance(loaded[2], Insight)
+
+
+@patch('research_town.utils.agent_prompter.model_prompting')
+def test_journaled_actions_are_replayed(mock_model_prompting: MagicMock) -> None:
+    mock_model_prompting.side_effect = mock_prompting
+    saved: list[AgentActionLog] = []
+    leader = Agent(profile=profile_A, model_name='gpt-4o-mini', role='leader')
+    member = Agent(profile=profile_A, model_name='gpt-4o-mini', role='member')
+
+    def review_literature(agent: Agent) -> Insight:
+        return agent.review_literature(
+            papers=[paper_A], contexts=['context'], config=example_config
+        )[2]
+
+    with journal_scope(ActionJournal(save=saved.append), 'env:0'):
+        insights = [review_literature(leader), review_literature(leader)]
+        member_insight = review_literature(member)
+    assert len(saved) == 3
+    assert mock_model_prompting.call_count == 3
+
+    # a resumed run gets the same insights, in the same order, without prompting
+    with journal_scope(ActionJournal(logs=saved), 'env:0'):
+        assert [review_literature(leader), review_literature(leader)] == insights
+        assert review_literature(member) == member_insight
+    assert mock_model_prompting.call_count == 3
+
+    # but makes the actions of another scope again
+    with journal_scope(ActionJournal(logs=saved), 'env:1'):
+        assert review_literature(leader).pk != insights[0].pk
+    assert mock_model_prompting.call_count == 4
+
+
+@patch('research_town.utils.agent_prompter.model_prompting')
+def test_delegating_action_is_journaled_once(mock_model_prompting: MagicMock) -> None:
+    mock_model_prompting.side_effect = mock_prompting
+    saved: list[AgentActionLog] = []
+    member = Agent(profile=profile_A, model_name='gpt-4o-mini', role='member')
+    with journal_scope(ActionJournal(save=saved.append), 'env:0'):
+        member.brainstorm_idea(insights=[research_insight_A], config=example_config)
+    # brainstorm_idea is journaled through the brainstorm_ideas it calls
+    assert [log.action for log in saved] == ['brainstorm_ideas']
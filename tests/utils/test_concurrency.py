@@ -0,0 +1,86 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from beartype.typing import List
+
+from research_town.utils.concurrency import (
+    Channel,
+    FairSemaphore,
+    ordered_map,
+    submit_after,
+)
+from research_town.utils.usage_tracker import _scope, usage_scope
+
+
+def test_ordered_map() -> None:
+    def work(item: int) -> str:
+        # later items finish first
+        time.sleep(0.05 * (4 - item))
+        return f'{item}:{_scope.get().get("env_name")}'
+
+    start = time.time()
+    with usage_scope(env_name='env'):
+        results = list(ordered_map(work, range(4), max_workers=4))
+    assert results == ['0:env', '1:env', '2:env', '3:env']
+    # the items are processed side by side
+    assert time.time() - start < 0.05 * (4 + 3 + 2 + 1)
+
+    thread_names = list(
+        ordered_map(lambda item: threading.current_thread().name, range(3), 1)
+    )
+    assert thread_names == [threading.current_thread().name] * 3
+
+
+def test_submit_after() -> None:
+    started = []
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        slow = executor.submit(time.sleep, 0.1)
+        fast = executor.submit(lambda: None)
+        # submitted last, but started as soon as the fast task is done
+        dependent = submit_after(executor, [fast], lambda: started.append('after'))
+        failed = submit_after(executor, [executor.submit(lambda: 1 / 0)], print)
+        dependent.result()
+        assert started == ['after']
+        assert slow.done()
+        assert isinstance(failed.exception(), ZeroDivisionError)
+
+
+def test_channel() -> None:
+    channel: Channel[int] = Channel()
+
+    def produce() -> None:
+        for item in range(3):
+            time.sleep(0.01)
+            channel.put(item)
+        channel.close()
+
+    producer = threading.Thread(target=produce)
+    producer.start()
+    assert list(channel) == [0, 1, 2]
+    producer.join()
+    # a closed channel replays all of its items
+    assert list(channel) == [0, 1, 2]
+
+
+def test_fair_semaphore() -> None:
+    semaphore = FairSemaphore(1)
+    order: List[str] = []
+
+    def work(key: str) -> None:
+        with semaphore.acquire(key):
+            order.append(key)
+
+    # project a queues up its calls before project b makes any
+    with semaphore.acquire('a'):
+        threads = [threading.Thread(target=work, args=('a',)) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.01)
+        threads += [threading.Thread(target=work, args=('b',)) for _ in range(2)]
+        for thread in threads[3:]:
+            thread.start()
+            time.sleep(0.01)
+    for thread in threads:
+        thread.join()
+    assert order == ['a', 'b', 'a', 'b', 'a']
@@ -0,0 +1,58 @@
+from unittest.mock import MagicMock, patch
+
+from beartype.typing import Any, Dict, List
+
+from research_town.utils.agent_prompter import write_review_messages
+from research_town.utils.context_budget import (
+    count_message_tokens,
+    fit_to_context,
+    set_context_window,
+)
+from tests.constants.config_constants import example_config
+
+
+def build_messages(papers: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    content = ''.join(paper['abstract'] + '\n' for paper in papers)
+    return [{'role': 'user', 'content': content}]
+
+
+def test_fit_to_context() -> None:
+    set_context_window('mock-model', 1000)
+    papers = [{'title': str(i), 'abstract': 'word ' * 400} for i in range(5)]
+    # everything fits into a large enough window
+    assert fit_to_context('gpt-4o-mini', 512, build_messages, papers) == papers
+
+    kept = fit_to_context(
+        'mock-model', 200, build_messages, papers, name='papers', text_key='abstract'
+    )
+    assert [paper['title'] for paper in kept] == ['0', '1']
+    # the second paper is truncated to the rest of the budget
+    assert kept[0] == papers[0]
+    assert 0 < len(kept[1]['abstract']) < len(papers[1]['abstract'])
+    assert count_message_tokens('mock-model', build_messages(kept)) <= 1000 - 200
+    set_context_window('mock-model', None)
+
+
+@patch('research_town.utils.context_budget.rank_by_relevance')
+def test_write_review_messages_fit_citations(mock_rank: MagicMock) -> None:
+    set_context_window('mock-model', 2000)
+    mock_rank.side_effect = lambda texts, query: list(reversed(range(len(texts))))
+    # proposals carry their citations as a list
+    proposal: Dict[str, Any] = {
+        'content': 'proposal',
+        'citations': [f'citation {i} ' + 'word ' * 600 for i in range(10)],
+    }
+    strength_messages, weakness_messages = write_review_messages(
+        proposal,
+        {'bio': 'bio'},
+        example_config.agent_prompt_template.write_review_strength,
+        example_config.agent_prompt_template.write_review_weakness,
+        model_name='mock-model',
+        max_token_num=512,
+    )
+    # the citations ranked most relevant are kept
+    assert 'citation 9' in strength_messages[-1]['content']
+    assert 'citation 0' not in weakness_messages[-1]['content']
+    for messages in (strength_messages, weakness_messages):
+        assert count_message_tokens('mock-model', messages) <= 2000 - 512
+    set_context_window('mock-model', None)
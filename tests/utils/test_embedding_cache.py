@@ -0,0 +1,81 @@
+import os
+from unittest.mock import MagicMock
+
+import numpy as np
+from beartype.typing import List
+from pytest import MonkeyPatch
+
+from research_town.utils.embedding_cache import (
+    EmbeddingCache,
+    cached_embed,
+    get_embedding_cache,
+)
+
+
+def test_embedding_cache_lru_eviction() -> None:
+    cache = EmbeddingCache(
+        os.path.join(os.environ['DATABASE_FOLDER_PATH'], 'cache.sqlite'),
+        max_bytes=3 * 4 * 4,
+    )
+    for i, text in enumerate(['a', 'b', 'c']):
+        cache.put_many('model', [text], [np.full(4, i)])
+    # touching 'a' makes 'b' the least recently used entry
+    assert cache.get_many('model', ['a'])[0] is not None
+    cache.put_many('model', ['d'], [np.ones(4)])
+
+    results = cache.get_many('model', ['a', 'b', 'c', 'd'])
+    assert [result is None for result in results] == [False, True, False, False]
+    third = results[2]
+    assert third is not None
+    assert np.array_equal(third, np.full(4, 2, dtype=np.float32))
+    assert cache.get_many('other-model', ['a']) == [None]
+    assert cache.stats() == {'hits': 4, 'misses': 2, 'entries': 3, 'bytes': 48}
+
+
+def test_embedding_cache_size_total() -> None:
+    path = os.path.join(os.environ['DATABASE_FOLDER_PATH'], 'cache.sqlite')
+    cache = EmbeddingCache(path, max_bytes=1024)
+    cache.put_many('model', ['a', 'b'], [np.ones(4), np.ones(8)])
+    cache.put_many('model', ['a'], [np.ones(2)])
+    cache.conn.execute(
+        'DELETE FROM embeddings WHERE key = ?', (cache.key('model', 'b'),)
+    )
+    cache.conn.commit()
+
+    def total(cache: EmbeddingCache) -> int:
+        (value,) = cache.conn.execute(
+            "SELECT value FROM meta WHERE name = 'size'"
+        ).fetchone()
+        return int(value)
+
+    assert total(cache) == cache.stats()['bytes'] == 8
+    # a file written without the total gets it summed up when opened
+    cache.conn.execute('DROP TABLE meta')
+    cache.conn.commit()
+    assert total(EmbeddingCache(path, max_bytes=1024)) == 8
+    cache.put_many('model', ['c'], [np.ones(4)])
+    assert total(cache) == cache.stats()['bytes'] == 24
+
+
+def test_cached_embed(monkeypatch: MonkeyPatch) -> None:
+    def embed(texts: List[str]) -> List[List[float]]:
+        return [[float(len(text)), 1.0] for text in texts]
+
+    embed_func = MagicMock(side_effect=embed)
+    monkeypatch.delenv('EMBEDDING_CACHE_PATH', raising=False)
+    assert get_embedding_cache() is None
+    assert len(cached_embed('model', ['x'], embed_func)) == 1
+
+    monkeypatch.setenv(
+        'EMBEDDING_CACHE_PATH',
+        os.path.join(os.environ['DATABASE_FOLDER_PATH'], 'cache.sqlite'),
+    )
+    first = cached_embed('model', ['ab', 'abc', 'ab'], embed_func)
+    embed_func.assert_called_with(['ab', 'abc'])
+    second = cached_embed('model', ['abc', 'abcd'], embed_func)
+    embed_func.assert_called_with(['abcd'])
+
+    assert [embedding[0] for embedding in first + second] == [2, 3, 2, 3, 4]
+    cache = get_embedding_cache()
+    assert cache is not None
+    assert (cache.hits, cache.misses) == (1, 4)
@@ -1,7 +1,17 @@
+import asyncio
 import time
 
+import pytest
+from beartype.typing import Any, List
+from litellm.exceptions import AuthenticationError
+
 from research_town.utils.error_handler import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryBudget,
     api_calling_error_exponential_backoff,
+    decorrelated_jitter,
+    get_circuit_breaker,
     parsing_error_exponential_backoff,
 )
 from tests.mocks.mocking_func import (
@@ -32,12 +42,12 @@ def test_api_calling_error_exponential_backoff_failure() -> None:
         mock_api_call_failure
     )
     start_time = time.time()
-    result = decorated_func()
+    with pytest.raises(Exception, match='API call failed'):
+        decorated_func()
     end_time = time.time()
-    assert result is None
     assert (
-        3 <= end_time - start_time < 15
-    )  # Considering 1 + 2 + 4 + 8 seconds of wait time
+        2 <= end_time - start_time < 15
+    )  # Considering two waits of 1 to 3 and 1 to 9 seconds
 
 
 def test_parsing_error_exponential_backoff_success() -> None:
@@ -49,9 +59,142 @@ def test_parsing_error_exponential_backoff_success() -> None:
 def test_parsing_error_exponential_backoff_failure() -> None:
     mock_instance = MockClass()
     start_time = time.time()
-    result = mock_instance.mock_parsing_call_failure()
+    with pytest.raises(Exception, match='Parsing call failed'):
+        mock_instance.mock_parsing_call_failure()
     end_time = time.time()
-    assert result is None
     assert (
-        3 <= end_time - start_time < 15
-    )  # Considering 1 + 2 + 4 + 8 seconds of wait time
+        2 <= end_time - start_time < 15
+    )  # Considering two waits of 1 to 3 and 1 to 9 seconds
+
+
+@pytest.mark.asyncio
+async def test_api_calling_error_exponential_backoff_async() -> None:
+    attempts = 0
+
+    async def flaky_api_call(*args: Any, **kwargs: Any) -> List[str]:
+        nonlocal attempts
+        attempts += 1
+        if attempts < 2:
+            raise Exception('API call failed')
+        return ['Success']
+
+    decorated_func = api_calling_error_exponential_backoff(retries=3, base_wait_time=0)(
+        flaky_api_call
+    )
+    assert await decorated_func() == ['Success']
+    assert attempts == 2
+
+
+def test_api_calling_error_fatal_error_not_retried() -> None:
+    attempts = 0
+
+    def unauthorized_api_call(*args: Any, **kwargs: Any) -> List[str]:
+        nonlocal attempts
+        attempts += 1
+        raise AuthenticationError(
+            message='Invalid API key', llm_provider='openai', model='gpt-4o-mini'
+        )
+
+    decorated_func = api_calling_error_exponential_backoff(retries=3, base_wait_time=0)(
+        unauthorized_api_call
+    )
+    with pytest.raises(AuthenticationError):
+        decorated_func()
+    assert attempts == 1
+
+
+def test_api_calling_error_retry_budget() -> None:
+    attempts = 0
+
+    def failing_api_call(*args: Any, **kwargs: Any) -> List[str]:
+        nonlocal attempts
+        attempts += 1
+        raise Exception('API call failed')
+
+    decorated_func = api_calling_error_exponential_backoff(
+        retries=5,
+        base_wait_time=0,
+        retry_budget=RetryBudget(ratio=0.0, min_retries=3),
+    )(failing_api_call)
+    with pytest.raises(Exception, match='API call failed'):
+        decorated_func()
+    assert attempts == 4
+    # the budget is spent, so the next call fails without retrying
+    with pytest.raises(Exception, match='API call failed'):
+        decorated_func()
+    assert attempts == 5
+
+
+def test_api_calling_error_circuit_breaker() -> None:
+    attempts = 0
+
+    def outage_api_call(provider: str) -> List[str]:
+        nonlocal attempts
+        attempts += 1
+        raise Exception('Service unavailable')
+
+    decorated_func = api_calling_error_exponential_backoff(
+        retries=3,
+        base_wait_time=0,
+        circuit_key=lambda provider: provider,
+        retry_budget=RetryBudget(),
+    )(outage_api_call)
+    with pytest.raises(Exception, match='Service unavailable'):
+        decorated_func('test-outage-provider')
+    # the circuit opens after five consecutive failures, even mid-retry
+    with pytest.raises(CircuitOpenError):
+        decorated_func('test-outage-provider')
+    assert attempts == 5
+    with pytest.raises(CircuitOpenError):
+        decorated_func('test-outage-provider')
+    assert attempts == 5
+
+    breaker = CircuitBreaker('provider', failure_threshold=1, reset_timeout=0.0)
+    breaker.record_failure()
+    # a single trial call is let through once the timeout has passed
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.allow()
+
+
+@pytest.mark.asyncio
+async def test_api_calling_error_circuit_breaker_cancelled_trial() -> None:
+    calls = 0
+
+    async def hanging_api_call(provider: str) -> List[str]:
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            await asyncio.sleep(10)
+        return ['Success']
+
+    decorated_func = api_calling_error_exponential_backoff(
+        retries=3,
+        base_wait_time=0,
+        circuit_key=lambda provider: provider,
+        retry_budget=RetryBudget(),
+    )(hanging_api_call)
+    breaker = get_circuit_breaker('test-cancelled-provider')
+    breaker.reset_timeout = 0.0
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+
+    trial = asyncio.ensure_future(decorated_func('test-cancelled-provider'))
+    await asyncio.sleep(0.01)
+    assert breaker.trial_in_flight
+    trial.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await trial
+    # the cancelled trial does not keep the circuit open, the next call is tried
+    assert not breaker.trial_in_flight
+    assert await decorated_func('test-cancelled-provider') == ['Success']
+    assert breaker.opened_at is None
+
+
+def test_decorrelated_jitter() -> None:
+    wait_time = 0.0
+    for _ in range(100):
+        previous_wait_time = wait_time
+        wait_time = decorrelated_jitter(1, wait_time, 16)
+        assert 1 <= wait_time <= min(16, max(previous_wait_time, 1) * 3)
@@ -1,4 +1,21 @@
-from research_town.utils.model_prompting import model_prompting
+import asyncio
+import gc
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+import pytest
+from beartype.typing import Any, List, Tuple
+
+from research_town.utils.model_prompting import (
+    amodel_prompting,
+    get_model_semaphore,
+    model_prompting,
+    set_max_concurrency,
+    stream_tokens,
+)
 
 
 def test_openai_call() -> None:
@@ -29,3 +46,165 @@ def test_togetherai_mistral_call() -> None:
     assert response is not None
     assert len(response) > 0
     assert len(response[0]) > 0
+
+
+@pytest.mark.asyncio
+@patch('research_town.utils.model_prompting.litellm.acompletion')
+async def test_amodel_prompting_concurrency(mock_acompletion: MagicMock) -> None:
+    in_flight = 0
+    max_in_flight = 0
+
+    async def acompletion(**kwargs: Any) -> MagicMock:
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        choice = MagicMock()
+        choice.message.content = kwargs['messages'][0]['content']
+        completion = MagicMock()
+        completion.choices = [choice]
+        return completion
+
+    mock_acompletion.side_effect = acompletion
+    set_max_concurrency('mock-model', 3)
+    responses = await asyncio.gather(
+        *[
+            amodel_prompting('mock-model', [{'role': 'user', 'content': str(i)}])
+            for i in range(10)
+        ]
+    )
+    assert responses == [[str(i)] for i in range(10)]
+    assert max_in_flight == 3
+
+
+def test_model_semaphores_per_loop() -> None:
+    async def semaphore() -> asyncio.Semaphore:
+        return get_model_semaphore('mock-loop-model')
+
+    async def contend() -> None:
+        async def hold() -> None:
+            async with get_model_semaphore('mock-loop-model'):
+                await asyncio.sleep(0)
+
+        await asyncio.gather(hold(), hold())
+
+    set_max_concurrency('mock-loop-model', 1)
+    loop = asyncio.new_event_loop()
+    first = loop.run_until_complete(semaphore())
+    assert loop.run_until_complete(semaphore()) is first
+    loop.run_until_complete(contend())
+    assert asyncio.run(semaphore()) is not first
+    loop.close()
+    loop_ref = weakref.ref(loop)
+    del loop, first
+    # the semaphores of closed loops are dropped with them
+    asyncio.run(semaphore())
+    gc.collect()
+    assert loop_ref() is None
+
+
+@patch('research_town.utils.model_prompting.litellm.completion')
+def test_model_prompting_returns_all_choices(mock_completion: MagicMock) -> None:
+    choices = []
+    for i in range(3):
+        choice = MagicMock()
+        choice.message.content = f'Answer{i}'
+        choices.append(choice)
+    mock_completion.return_value.choices = choices
+    response = model_prompting(
+        'mock-model', [{'role': 'user', 'content': 'Question'}], return_num=3
+    )
+    assert response == ['Answer0', 'Answer1', 'Answer2']
+    assert mock_completion.call_args.kwargs['n'] == 3
+
+
+def mock_stream_chunk(index: int, delta: Any) -> MagicMock:
+    choice = MagicMock()
+    choice.index = index
+    choice.delta.content = delta
+    chunk = MagicMock()
+    chunk.choices = [choice]
+    return chunk
+
+
+@patch('research_town.utils.model_prompting.litellm.completion')
+def test_model_prompting_stream(mock_completion: MagicMock) -> None:
+    mock_completion.side_effect = lambda **kwargs: iter(
+        [
+            mock_stream_chunk(0, 'Hel'),
+            mock_stream_chunk(1, 'Bye'),
+            mock_stream_chunk(0, 'lo'),
+            mock_stream_chunk(0, None),
+        ]
+    )
+    messages = [{'role': 'user', 'content': 'Question'}]
+    deltas: List[Tuple[str, str]] = []
+    with stream_tokens(lambda stream_id, delta: deltas.append((stream_id, delta))):
+        response = model_prompting('mock-model', messages, return_num=2, stream=True)
+    assert response == ['Hello', 'Bye']
+    assert [delta for _, delta in deltas] == ['Hel', 'lo', '']
+    assert len({stream_id for stream_id, _ in deltas}) == 1
+    # every completion is reported under its own id
+    with stream_tokens(lambda stream_id, delta: deltas.append((stream_id, delta))):
+        model_prompting('mock-model', messages, return_num=2, stream=True)
+    assert len({stream_id for stream_id, _ in deltas}) == 2
+    assert mock_completion.call_args.kwargs['stream'] is True
+
+
+@patch('research_town.utils.model_prompting.litellm.completion')
+def test_model_prompting_coalesces_identical_requests(
+    mock_completion: MagicMock,
+) -> None:
+    started = threading.Event()
+
+    def completion(**kwargs: Any) -> MagicMock:
+        started.set()
+        time.sleep(0.2)
+        choice = MagicMock()
+        choice.message.content = 'Answer'
+        completion = MagicMock()
+        completion.choices = [choice]
+        return completion
+
+    mock_completion.side_effect = completion
+    messages = [{'role': 'user', 'content': 'Question'}]
+
+    def prompt() -> List[str]:
+        return model_prompting('mock-model', messages)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        leader = executor.submit(prompt)
+        started.wait()
+        followers = [executor.submit(prompt) for _ in range(3)]
+        responses = [leader.result()] + [f.result() for f in followers]
+    assert responses == [['Answer']] * 4
+    assert mock_completion.call_count == 1
+
+    # sampled completions are requested separately
+    model_prompting('mock-model', messages, temperature=0.7)
+    assert mock_completion.call_count == 2
+
+
+@pytest.mark.asyncio
+@patch('research_town.utils.model_prompting.litellm.acompletion')
+async def test_amodel_prompting_coalesces_identical_requests(
+    mock_acompletion: MagicMock,
+) -> None:
+    async def acompletion(**kwargs: Any) -> MagicMock:
+        await asyncio.sleep(0.01)
+        choice = MagicMock()
+        choice.message.content = kwargs['messages'][0]['content']
+        completion = MagicMock()
+        completion.choices = [choice]
+        return completion
+
+    mock_acompletion.side_effect = acompletion
+    responses = await asyncio.gather(
+        *[
+            amodel_prompting('mock-model', [{'role': 'user', 'content': str(i % 2)}])
+            for i in range(6)
+        ]
+    )
+    assert responses == [[str(i % 2)] for i in range(6)]
+    assert mock_acompletion.call_count == 2
@@ -0,0 +1,39 @@
+from research_town.utils.prompt_constructor import (
+    PromptTemplate,
+    compile_prompt_parts,
+    compile_prompt_template,
+    openai_format_prompt_construct,
+)
+from tests.constants.config_constants import example_config
+
+
+def test_openai_format_prompt_construct() -> None:
+    template: PromptTemplate = {
+        'sys_prompt': 'system',
+        'fewshot_examples': ['question', 'answer'],
+        'template': 'Here is the submission: {proposal}',
+    }
+    messages = openai_format_prompt_construct(template, {'proposal': 'proposal'})
+    assert messages == [
+        {'role': 'system', 'content': 'system'},
+        {'role': 'user', 'content': 'question'},
+        {'role': 'assistant', 'content': 'answer'},
+        {'role': 'user', 'content': 'Here is the submission: proposal'},
+    ]
+    # equal templates share one compiled template
+    assert compile_prompt_template(dict(template)) is compile_prompt_template(template)
+    # every prompt gets its own messages
+    messages[0]['content'] = 'changed'
+    assert openai_format_prompt_construct(template, {'proposal': ''})[0] == {
+        'role': 'system',
+        'content': 'system',
+    }
+
+
+def test_config_precompiles_prompt_templates() -> None:
+    misses = compile_prompt_parts.cache_info().misses
+    for template in example_config.agent_prompt_template.model_dump().values():
+        compile_prompt_template(template)
+    for template in example_config.eval_prompt_template.model_dump().values():
+        compile_prompt_template(template)
+    assert compile_prompt_parts.cache_info().misses == misses
@@ -0,0 +1,175 @@
+import asyncio
+import json
+import os
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+from beartype.typing import Any, Iterator
+from litellm.exceptions import RateLimitError
+from pytest import MonkeyPatch
+
+from research_town.utils import rate_limiter
+from research_town.utils.model_prompting import complete, model_prompting
+from research_town.utils.rate_limiter import (
+    RateLimit,
+    RateLimiter,
+    get_rate_limit,
+    set_rate_limit,
+)
+
+
+@pytest.fixture(autouse=True)
+def rate_limit_dir(monkeypatch: MonkeyPatch, tmp_path: str) -> None:
+    monkeypatch.setenv('LLM_RATE_LIMIT_DIR', str(tmp_path))
+
+
+def test_rate_limiter_buckets_are_shared() -> None:
+    rate_limit = RateLimit(requests_per_minute=2, tokens_per_minute=600)
+    limiter = RateLimiter('model', rate_limit)
+    # a second limiter on the same key stands for another worker process
+    other = RateLimiter('model', rate_limit)
+
+    assert limiter.try_acquire(100) == 0
+    assert other.try_acquire(400) == 0
+    # both requests and 500 tokens are used up, a refill takes 30 seconds
+    assert 29 < limiter.try_acquire(100) <= 30
+    other.release(400, 100, None)
+    with other.locked_state() as state:
+        assert state['in_flight'] == {str(os.getpid()): 1}
+        assert 399 < state['tokens'] <= 401
+
+
+def test_rate_limiter_aimd_window() -> None:
+    rate_limit = RateLimit(requests_per_minute=1000, max_concurrency=4)
+    limiter = RateLimiter('model', rate_limit)
+    for _ in range(4):
+        assert limiter.try_acquire(1) == 0
+    assert limiter.try_acquire(1) > 0
+
+    error = RateLimitError(message='429', llm_provider='openai', model='m')
+    limiter.release(1, None, error)
+    with limiter.locked_state() as state:
+        assert state['window'] == 2.0
+        assert state['requests'] < 1
+        # requests of processes that are gone are not counted
+        state['in_flight']['999999999'] = 3
+    limiter.release(1, None, None)
+    with limiter.locked_state() as state:
+        assert state['window'] == 2.5
+        assert state['in_flight'] == {str(os.getpid()): 2}
+
+
+@patch('research_town.utils.model_prompting.litellm.completion')
+def test_model_prompting_rate_limit(
+    mock_completion: MagicMock, monkeypatch: MonkeyPatch
+) -> None:
+    mock_completion.return_value.choices = [MagicMock()]
+    mock_completion.return_value.choices[0].message.content = 'response'
+    mock_completion.return_value.usage.total_tokens = 20
+    monkeypatch.setenv(
+        'LLM_RATE_LIMITS', json.dumps({'openai': {'tokens_per_minute': 1000}})
+    )
+    set_rate_limit('gpt-4o-mini', RateLimit(requests_per_minute=10))
+    try:
+        assert get_rate_limit('openai/gpt-4o') == (
+            'openai',
+            RateLimit(tokens_per_minute=1000),
+        )
+        assert get_rate_limit('other') is None
+
+        messages = [{'role': 'user', 'content': 'question'}]
+        assert model_prompting('openai/gpt-4o', messages) == ['response']
+        limiter = RateLimiter('openai', RateLimit(tokens_per_minute=1000))
+        with limiter.locked_state() as state:
+            # the reserved prompt and max tokens are refunded down to the usage
+            assert 979 < state['tokens'] <= 981
+            assert state['requests'] is None
+    finally:
+        set_rate_limit('gpt-4o-mini', None)
+
+
+def test_rate_limiter_without_flock(monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setattr(rate_limiter, 'fcntl', None)
+    rate_limit = RateLimit(requests_per_minute=1)
+    limiter = RateLimiter('model', rate_limit)
+    # the bucket is kept per process, and shared by its threads
+    assert limiter.path.endswith(f'model.{os.getpid()}.json')
+    assert limiter.try_acquire(1) == 0
+    assert RateLimiter('model', rate_limit).try_acquire(1) > 0
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_async_locks_off_event_loop() -> None:
+    limiter = RateLimiter('model', RateLimit(requests_per_minute=1000))
+    threads = []
+    try_acquire = limiter.try_acquire
+
+    def record_thread(cost: int) -> float:
+        threads.append(threading.current_thread())
+        return try_acquire(cost)
+
+    with patch.object(limiter, 'try_acquire', side_effect=record_thread):
+        await limiter.aacquire(1)
+    assert threads and threading.main_thread() not in threads
+    await limiter.arelease(1, None, None)
+    with limiter.locked_state() as state:
+        assert state['in_flight'] == {}
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_cancelled_acquire() -> None:
+    limiter = RateLimiter('model', RateLimit(requests_per_minute=1000))
+    started = threading.Event()
+    proceed = threading.Event()
+    reserved = threading.Event()
+    try_acquire = limiter.try_acquire
+
+    def slow_try_acquire(cost: int) -> float:
+        started.set()
+        proceed.wait(timeout=5)
+        wait = try_acquire(cost)
+        reserved.set()
+        return wait
+
+    with patch.object(limiter, 'try_acquire', side_effect=slow_try_acquire):
+        task = asyncio.ensure_future(limiter.aacquire(1))
+        await asyncio.to_thread(started.wait, 5)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        proceed.set()
+        await asyncio.to_thread(reserved.wait, 5)
+        await asyncio.sleep(0.1)
+    # the slot reserved after the caller gave up is handed back
+    with limiter.locked_state() as state:
+        assert state['in_flight'] == {}
+
+
+@patch('research_town.utils.model_prompting.litellm.completion')
+def test_stream_rate_limit(
+    mock_completion: MagicMock, monkeypatch: MonkeyPatch
+) -> None:
+    def chunk(delta: str) -> MagicMock:
+        chunk = MagicMock()
+        chunk.choices[0].index = 0
+        chunk.choices[0].delta.content = delta
+        return chunk
+
+    def broken_stream(**kwargs: Any) -> Iterator[MagicMock]:
+        yield chunk('Hel')
+        raise ConnectionError('stream broke off')
+
+    mock_completion.side_effect = broken_stream
+    monkeypatch.setenv(
+        'LLM_RATE_LIMITS', json.dumps({'openai': {'tokens_per_minute': 1000}})
+    )
+    messages = [{'role': 'user', 'content': 'question'}]
+    with pytest.raises(ConnectionError):
+        complete('openai/gpt-4o', messages, None, 1, 200, 0.0, None, True)
+
+    limiter = RateLimiter('openai', RateLimit(tokens_per_minute=1000))
+    with limiter.locked_state() as state:
+        # the broken stream is charged the tokens it received, not max tokens
+        assert state['tokens'] > 950
+        assert state['in_flight'] == {}
@@ -0,0 +1,106 @@
+import os
+from unittest.mock import MagicMock, patch
+
+from pytest import MonkeyPatch
+
+from research_town.utils.model_prompting import model_prompting
+from research_town.utils.response_cache import (
+    ResponseCache,
+    get_response_cache,
+    response_cache_namespace,
+)
+
+
+def test_response_cache_lru_eviction() -> None:
+    cache = ResponseCache(
+        os.path.join(os.environ['DATABASE_FOLDER_PATH'], 'responses.sqlite'),
+        max_bytes=3 * len('["xxxx"]'),
+    )
+    requests = [{'messages': [{'role': 'user', 'content': c}]} for c in 'abcd']
+    for request in requests[:3]:
+        cache.put('exp', 'model', request, ['xxxx'])
+    # touching 'a' makes 'b' the least recently used entry
+    assert cache.get('exp', 'model', requests[0]) == ['xxxx']
+    cache.put('exp', 'model', requests[3], ['xxxx'])
+
+    results = [cache.get('exp', 'model', request) for request in requests]
+    assert [result is None for result in results] == [False, True, False, False]
+    assert cache.get('other-exp', 'model', requests[0]) is None
+    assert cache.stats('exp') == {
+        'hits': 4,
+        'misses': 1,
+        'hit_rate': 0.8,
+        'entries': 3,
+        'bytes': 24,
+    }
+    assert cache.clear('exp') == 3
+    assert cache.stats()['entries'] == 0
+
+
+def test_response_cache_size_total() -> None:
+    path = os.path.join(os.environ['DATABASE_FOLDER_PATH'], 'responses.sqlite')
+    cache = ResponseCache(path, max_bytes=1024)
+    requests = [{'messages': [{'role': 'user', 'content': c}]} for c in 'abc']
+    cache.put('exp', 'model', requests[0], ['xxxx'])
+    cache.put('exp', 'model', requests[0], ['xx'])
+    cache.put('other-exp', 'model', requests[1], ['xxxx'])
+    cache.clear('exp')
+
+    def total(cache: ResponseCache) -> int:
+        (value,) = cache.conn.execute(
+            "SELECT value FROM meta WHERE name = 'size'"
+        ).fetchone()
+        return int(value)
+
+    assert total(cache) == cache.stats()['bytes'] == 8
+    # a file written without the total gets it summed up when opened
+    cache.conn.execute('DROP TABLE meta')
+    cache.conn.commit()
+    assert total(ResponseCache(path, max_bytes=1024)) == 8
+    cache.put('exp', 'model', requests[2], ['x'])
+    assert total(cache) == cache.stats()['bytes'] == 13
+
+
+@patch('research_town.utils.model_prompting.litellm.completion')
+def test_model_prompting_response_cache(
+    mock_completion: MagicMock, monkeypatch: MonkeyPatch
+) -> None:
+    mock_completion.return_value.choices = [MagicMock()]
+    mock_completion.return_value.choices[0].message.content = 'response'
+    monkeypatch.setenv(
+        'LLM_CACHE_PATH',
+        os.path.join(os.environ['DATABASE_FOLDER_PATH'], 'responses.sqlite'),
+    )
+    messages = [{'role': 'user', 'content': 'question'}]
+
+    assert model_prompting('model', messages) == ['response']
+    assert model_prompting('model', messages) == ['response']
+    assert mock_completion.call_count == 1
+    # sampled completions are never served from the cache
+    model_prompting('model', messages, temperature=0.7)
+    model_prompting('model', messages, temperature=0.7)
+    assert mock_completion.call_count == 3
+    with response_cache_namespace('experiment'):
+        model_prompting('model', messages)
+    assert mock_completion.call_count == 4
+
+    cache = get_response_cache()
+    assert cache is not None
+    assert cache.stats('default')['hit_rate'] == 0.5
+    assert cache.stats('experiment')['entries'] == 1
+
+
+def test_response_cache_flight_claims() -> None:
+    cache = ResponseCache(
+        os.path.join(os.environ['DATABASE_FOLDER_PATH'], 'flights.sqlite'),
+        max_bytes=1024,
+    )
+    assert cache.claim('key')
+    # a request claimed by a live process is not claimed again
+    assert not cache.claim('key')
+    cache.release('key')
+    assert cache.claim('key')
+    # nor is it blocked by a process that died while holding the claim
+    cache.conn.execute("UPDATE flights SET pid = ? WHERE key = 'key'", (2**22 + 1,))
+    cache.conn.commit()
+    assert cache.claim('key')
@@ -1,9 +1,12 @@
+import subprocess
+import sys
 from unittest.mock import MagicMock, patch
 
 import torch
-from beartype.typing import Any, Dict
+from beartype.typing import Any, Dict, List
 
-from research_town.utils.retriever import get_embed, rank_topk
+from research_town.utils import retriever
+from research_town.utils.retriever import get_embed, get_embed_matrix, rank_topk
 
 
 def test_get_embed() -> None:
@@ -15,13 +18,19 @@ def test_get_embed() -> None:
         mock_tokenizer_instance = MagicMock()
         mock_tokenizer.return_value = mock_tokenizer_instance
 
-        def mock_tokenize(*args: Any, **kwargs: Any) -> Dict[str, torch.Tensor]:
+        def mock_tokenize(*args: Any, **kwargs: Any) -> Dict[str, List[List[int]]]:
             return {
                 # Example token IDs
-                'input_ids': torch.tensor([[101, 102, 103]]),
-                'attention_mask': torch.tensor([[1, 1, 1]]),
+                'input_ids': [[101, 102, 103] for _ in args[0]],
+                'attention_mask': [[1, 1, 1] for _ in args[0]],
             }
 
+        def mock_pad(
+            encoded_inputs: Dict[str, List[List[int]]], **kwargs: Any
+        ) -> Dict[str, torch.Tensor]:
+            return {key: torch.tensor(value) for key, value in encoded_inputs.items()}
+
+        mock_tokenizer_instance.pad.side_effect = mock_pad
         mock_tokenizer_instance.side_effect = mock_tokenize
 
         # Mock model instance
@@ -67,6 +76,61 @@ def test_get_embed() -> None:
         assert all(torch.equal(t1, t2) for t1, t2 in zip(result_1, result_2))
 
 
+def test_get_embed_matrix() -> None:
+    tokenizer = MagicMock()
+    tokenizer.side_effect = lambda texts, **kwargs: {
+        'input_ids': [list(range(1, len(text) + 1)) for text in texts],
+        'attention_mask': [[1] * len(text) for text in texts],
+    }
+
+    def mock_pad(
+        encoded_inputs: Dict[str, List[List[int]]], **kwargs: Any
+    ) -> Dict[str, torch.Tensor]:
+        max_length = max(len(ids) for ids in encoded_inputs['input_ids'])
+        return {
+            key: torch.tensor([ids + [0] * (max_length - len(ids)) for ids in value])
+            for key, value in encoded_inputs.items()
+        }
+
+    tokenizer.pad.side_effect = mock_pad
+
+    model = MagicMock()
+    # hidden state of a token is its id, so the pooled value is the mean id
+    model.side_effect = lambda **kwargs: {
+        'last_hidden_state': kwargs['input_ids'].unsqueeze(-1).float().repeat(1, 1, 2)
+    }
+
+    result = get_embed_matrix(['abcd', 'a', 'abc', 'ab', 'abcdef'], tokenizer, model, 2)
+    assert result.shape == (5, 2)
+    assert torch.equal(result[:, 0], torch.tensor([2.5, 1.0, 2.0, 1.5, 3.5]))
+    assert model.call_count == 3
+    assert get_embed_matrix([], tokenizer, model).shape[0] == 0
+
+
+def test_get_retriever_shared() -> None:
+    with (
+        patch('transformers.BertTokenizer.from_pretrained') as mock_tokenizer,
+        patch('transformers.BertModel.from_pretrained') as mock_model,
+        patch.dict(retriever._retrievers, clear=True),
+    ):
+        first = retriever.get_retriever()
+        second = retriever.get_retriever()
+        assert first is second
+        mock_tokenizer.assert_called_once_with('facebook/contriever')
+        mock_model.assert_called_once_with('facebook/contriever')
+
+
+def test_import_does_not_load_transformers() -> None:
+    code = (
+        'import sys; import research_town.dbs; '
+        "print([m for m in ('transformers', 'keybert') if m in sys.modules])"
+    )
+    result = subprocess.run(
+        [sys.executable, '-c', code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == '[]'
+
+
 def test_rank_topk() -> None:
     query_embed = [torch.tensor([[1.0, 2.0, 3.0]])]
     corpus_embed = [torch.tensor([[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]])]
@@ -0,0 +1,51 @@
+from unittest.mock import MagicMock, patch
+
+from research_town.data import LLMCallLog
+from research_town.dbs import LogDB
+from research_town.utils.model_prompting import model_prompting
+from research_town.utils.usage_tracker import UsageTracker, track_usage, usage_scope
+from tests.constants.config_constants import example_config
+
+
+@patch('research_town.utils.model_prompting.litellm.completion')
+def test_usage_tracker(mock_completion: MagicMock) -> None:
+    mock_completion.return_value.choices = [MagicMock()]
+    mock_completion.return_value.choices[0].message.content = 'response'
+    mock_completion.return_value.usage.prompt_tokens = 1000
+    mock_completion.return_value.usage.completion_tokens = 100
+    messages = [{'role': 'user', 'content': 'question'}]
+
+    # calls outside of a tracked block are not recorded
+    model_prompting('gpt-4o-mini', messages)
+    usage_tracker = UsageTracker()
+    with track_usage(usage_tracker), usage_scope(project_name='project'):
+        with usage_scope(env_name='proposal_writing', profile_pk='agent_a'):
+            model_prompting('gpt-4o-mini', messages)
+            model_prompting('gpt-4o-mini', messages)
+        with usage_scope(env_name='review_writing', profile_pk='agent_b'):
+            model_prompting('gpt-4o-mini', messages)
+
+    records = usage_tracker.flush()
+    assert len(records) == 3
+    assert usage_tracker.flush() == []
+    assert all(record.project_name == 'project' for record in records)
+    assert [record.profile_pk for record in records] == [
+        'agent_a',
+        'agent_a',
+        'agent_b',
+    ]
+    assert records[0].prompt_tokens == 1000
+    assert records[0].completion_tokens == 100
+    assert records[0].cost > 0
+
+    total = usage_tracker.summary()['total']
+    assert total['calls'] == 3
+    assert total['prompt_tokens'] == 3000
+    by_env = usage_tracker.summary('env_name')
+    assert by_env['proposal_writing']['calls'] == 2
+    assert by_env['review_writing']['completion_tokens'] == 100
+    assert 'review_writing: 1 calls' in usage_tracker.report()
+
+    log_db = LogDB(config=example_config.database)
+    log_db.add_many(records)
+    assert log_db.count(LLMCallLog, profile_pk='agent_a') == 2